@@ -0,0 +1,324 @@
+import os
+from contextlib import nullcontext
+
+import numpy as np
+
+MINIMIZE = 1
+MAXIMIZE = -1
+
+OPTIMAL = "optimal"
+FEASIBLE = "feasible"  # stopped on a limit with a solution
+INFEASIBLE = "infeasible"
+UNBOUNDED = "unbounded"
+NO_SOLUTION = "no_solution"
+
+# Engine used when no backend is given; LP_BACKEND=highs routes every solve away from Gurobi
+DEFAULT_BACKEND = os.environ.get("LP_BACKEND", "gurobi")
+# Tried in this order when Gurobi cannot get a license
+FALLBACK_ORDER = ["highs", "cpsat"]
+
+# CP-SAT needs finite integer bounds and integral coefficients
+CPSAT_MAX_BOUND = 10 ** 9
+CPSAT_MAX_SCALE = 10 ** 6
+
+# Gurobi error codes meaning no license could be obtained (or the model exceeds it)
+LICENSE_ERRORS = {10009, 10010, 10021, 10022, 10023, 10024, 10030, 10032}
+
+
+class BackendError(Exception):
+    pass
+
+
+class LinearProgram:
+    # Solver-neutral (mixed-integer) linear program: columns with bounds, objective and
+    # integrality, rows stored sparse as (column indices, coefficients, sense, rhs)
+    def __init__(self, name, sense=MINIMIZE):
+        self.name = name
+        self.sense = sense
+        self.obj = []
+        self.lb = []
+        self.ub = []
+        self.integer = []
+        self.var_names = []
+        self.rows = []
+        self.row_names = []
+        self.obj_constant = 0.0
+
+    @property
+    def num_vars(self):
+        return len(self.obj)
+
+    @property
+    def num_constrs(self):
+        return len(self.rows)
+
+    @property
+    def is_mip(self):
+        return any(self.integer)
+
+    def add_var(self, lb=0.0, ub=float("inf"), obj=0.0, integer=False, name=None):
+        self.obj.append(obj)
+        self.lb.append(lb)
+        self.ub.append(ub)
+        self.integer.append(integer)
+        self.var_names.append(name or f"x{len(self.obj) - 1}")
+        return len(self.obj) - 1
+
+    def add_vars(self, count, lb=0.0, ub=float("inf"), obj=0.0, integer=False, name="x"):
+        return [self.add_var(lb, ub, obj, integer, f"{name}[{i}]") for i in range(count)]
+
+    def add_binary(self, obj=0.0, name=None):
+        return self.add_var(0, 1, obj, True, name)
+
+    def add_constr(self, coeffs, sense, rhs, name=None):
+        # coeffs maps column index -> coefficient, sense is "<=", ">=" or "=="
+        if sense not in ("<=", ">=", "=="):
+            raise ValueError(f"Unknown constraint sense {sense!r}")
+        self.rows.append((list(coeffs.keys()), list(coeffs.values()), sense, rhs))
+        self.row_names.append(name or f"c{len(self.rows) - 1}")
+        return len(self.rows) - 1
+
+    def matrix(self):
+        from scipy.sparse import csr_matrix
+        indptr = [0]
+        indices = []
+        data = []
+        for cols, coefs, _, _ in self.rows:
+            indices.extend(cols)
+            data.extend(coefs)
+            indptr.append(len(indices))
+        return csr_matrix((data, indices, indptr), shape=(self.num_constrs, self.num_vars))
+
+    def objective_value(self, values):
+        return float(np.dot(self.obj, values)) + self.obj_constant
+
+
+class Solution:
+    def __init__(self, status, objective=None, values=None, backend=None, runtime=None):
+        self.status = status
+        self.objective = objective
+        self.values = values
+        self.backend = backend
+        self.runtime = runtime
+
+    @property
+    def has_values(self):
+        return self.values is not None
+
+    def __repr__(self):
+        return f"Solution({self.backend}, {self.status}, objective={self.objective})"
+
+
+class GurobiBackend:
+    name = "gurobi"
+
+    def available(self):
+        try:
+            import gurobipy  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def solve(self, program, time_limit=None, threads=None):
+        import gurobipy as gp
+        from gurobipy import GRB
+        import scheduler
+
+        m = gp.Model(program.name)
+        m.Params.OutputFlag = 0
+        if time_limit is not None:
+            m.Params.TimeLimit = time_limit
+        if threads is not None:
+            m.Params.Threads = threads
+        vtype = np.where(program.integer, GRB.INTEGER, GRB.CONTINUOUS)
+        x = m.addMVar(program.num_vars, lb=np.array(program.lb, dtype=float), ub=np.array(program.ub, dtype=float),
+                      obj=np.array(program.obj, dtype=float), vtype=vtype)
+        if program.num_constrs:
+            senses = np.array([{"<=": GRB.LESS_EQUAL, ">=": GRB.GREATER_EQUAL, "==": GRB.EQUAL}[row[2]]
+                               for row in program.rows])
+            rhs = np.array([row[3] for row in program.rows], dtype=float)
+            m.addMConstr(program.matrix(), x, senses, rhs)
+        m.ModelSense = GRB.MINIMIZE if program.sense == MINIMIZE else GRB.MAXIMIZE
+        m.ObjCon = program.obj_constant
+        m.update()
+        with scheduler.solve_slot(m, {"NumNZs": m.NumNZs, "NumIntVars": m.NumIntVars}):
+            m.optimize()
+
+        if m.SolCount == 0:
+            status = {GRB.INFEASIBLE: INFEASIBLE, GRB.UNBOUNDED: UNBOUNDED}.get(m.Status, NO_SOLUTION)
+            return Solution(status, backend=self.name, runtime=m.Runtime)
+        status = OPTIMAL if m.Status == GRB.OPTIMAL else FEASIBLE
+        return Solution(status, m.ObjVal, np.array(x.X), self.name, m.Runtime)
+
+
+class HighsBackend:
+    # HiGHS through scipy.optimize.milp
+    name = "highs"
+
+    def available(self):
+        try:
+            from scipy.optimize import milp  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def solve(self, program, time_limit=None, threads=None):
+        import time
+        from scipy.optimize import Bounds, LinearConstraint, milp
+
+        c = np.array(program.obj, dtype=float) * program.sense
+        constraints = []
+        if program.num_constrs:
+            rhs = np.array([row[3] for row in program.rows], dtype=float)
+            senses = [row[2] for row in program.rows]
+            lo = np.array([r if s in (">=", "==") else -np.inf for r, s in zip(rhs, senses)])
+            hi = np.array([r if s in ("<=", "==") else np.inf for r, s in zip(rhs, senses)])
+            constraints.append(LinearConstraint(program.matrix(), lo, hi))
+        options = {}
+        if time_limit is not None:
+            options["time_limit"] = time_limit
+        start = time.perf_counter()
+        res = milp(c, constraints=constraints, integrality=np.array(program.integer, dtype=int),
+                   bounds=Bounds(np.array(program.lb, dtype=float), np.array(program.ub, dtype=float)),
+                   options=options)
+        runtime = time.perf_counter() - start
+
+        if res.x is None:
+            status = {2: INFEASIBLE, 3: UNBOUNDED}.get(res.status, NO_SOLUTION)
+            return Solution(status, backend=self.name, runtime=runtime)
+        status = OPTIMAL if res.status == 0 else FEASIBLE
+        return Solution(status, program.objective_value(res.x), res.x, self.name, runtime)
+
+
+class CpSatBackend:
+    # OR-Tools CP-SAT; pure integer programs only. Fractional coefficients are scaled row by row
+    # to integers and unbounded variables are capped at CPSAT_MAX_BOUND.
+    name = "cpsat"
+
+    def available(self):
+        try:
+            from ortools.sat.python import cp_model  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def supports(self, program):
+        return all(program.integer)
+
+    def solve(self, program, time_limit=None, threads=None):
+        from ortools.sat.python import cp_model
+
+        if not self.supports(program):
+            raise BackendError("CP-SAT only handles programs whose variables are all integer")
+        model = cp_model.CpModel()
+        x = [model.NewIntVar(_int_bound(lb, -CPSAT_MAX_BOUND), _int_bound(ub, CPSAT_MAX_BOUND), name)
+             for lb, ub, name in zip(program.lb, program.ub, program.var_names)]
+        for cols, coefs, sense, rhs in program.rows:
+            scale = _integral_scale(coefs + [rhs])
+            expr = sum(int(round(c * scale)) * x[j] for j, c in zip(cols, coefs))
+            bound = int(round(rhs * scale))
+            if sense == "<=":
+                model.Add(expr <= bound)
+            elif sense == ">=":
+                model.Add(expr >= bound)
+            else:
+                model.Add(expr == bound)
+        scale = _integral_scale(program.obj)
+        objective = sum(int(round(c * scale)) * x[j] for j, c in enumerate(program.obj) if c)
+        if program.sense == MINIMIZE:
+            model.Minimize(objective)
+        else:
+            model.Maximize(objective)
+
+        solver = cp_model.CpSolver()
+        if time_limit is not None:
+            solver.parameters.max_time_in_seconds = time_limit
+        if threads is not None:
+            solver.parameters.num_workers = threads
+        status = solver.Solve(model)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return Solution(INFEASIBLE if status == cp_model.INFEASIBLE else NO_SOLUTION,
+                            backend=self.name, runtime=solver.WallTime())
+        values = np.array([solver.Value(v) for v in x], dtype=float)
+        return Solution(OPTIMAL if status == cp_model.OPTIMAL else FEASIBLE, program.objective_value(values),
+                        values, self.name, solver.WallTime())
+
+
+def _int_bound(value, cap):
+    if abs(value) >= abs(cap):
+        return cap
+    return int(value)
+
+
+def _integral_scale(numbers):
+    scale = 1
+    while scale <= CPSAT_MAX_SCALE:
+        if all(abs(n * scale - round(n * scale)) < 1e-9 for n in numbers):
+            return scale
+        scale *= 10
+    raise BackendError("Coefficients cannot be scaled to integers for CP-SAT")
+
+
+BACKENDS = {backend.name: backend for backend in (GurobiBackend(), HighsBackend(), CpSatBackend())}
+
+
+def get_backend(name):
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise BackendError(f"Unknown backend {name!r}, expected one of {sorted(BACKENDS)}")
+
+
+def available():
+    return [name for name, backend in BACKENDS.items() if backend.available()]
+
+
+def is_license_error(error):
+    return getattr(error, "errno", None) in LICENSE_ERRORS
+
+
+def fallback_for(program=None):
+    for name in FALLBACK_ORDER:
+        backend = BACKENDS[name]
+        if backend.available() and (program is None or not hasattr(backend, "supports") or backend.supports(program)):
+            return name
+    raise BackendError("Gurobi has no license available and no open-source backend is installed")
+
+
+def solve(program, backend=None, time_limit=None, threads=None):
+    # Solves a LinearProgram on the chosen engine, falling back to an open-source one
+    # when Gurobi cannot get a license
+    name = backend or DEFAULT_BACKEND
+    try:
+        return get_backend(name).solve(program, time_limit=time_limit, threads=threads)
+    except Exception as e:
+        if name != "gurobi" or not is_license_error(e):
+            raise
+    return get_backend(fallback_for(program)).solve(program, time_limit=time_limit, threads=threads)
+
+
+def run(backend, solve_gurobi, build_program, metrics=None):
+    # Shared solve path of the exercises. solve_gurobi() runs the exercise's own gurobipy model;
+    # build_program() returns (program, extract) where extract(solution) gives the same results.
+    # Any non-Gurobi backend, or a Gurobi license failure, goes through the neutral program.
+    name = backend or DEFAULT_BACKEND
+    if name == "gurobi":
+        try:
+            return solve_gurobi()
+        except Exception as e:
+            if not is_license_error(e):
+                raise
+            name = None
+    phase = metrics.phase if metrics is not None else (lambda _: nullcontext())
+    with phase("build"):
+        program, extract = build_program()
+    if name is None:
+        name = fallback_for(program)
+    with phase("solve"):
+        solution = get_backend(name).solve(program)
+    if metrics is not None:
+        metrics.model_stats.update(NumVars=program.num_vars, NumConstrs=program.num_constrs,
+                                   NumNZs=sum(len(row[0]) for row in program.rows))
+        metrics.solve_stats.update(Backend=name, Runtime=solution.runtime, ObjVal=solution.objective)
+    with phase("extract"):
+        return extract(solution)
@@ -0,0 +1,88 @@
+# Compares the solver backends on every exercise, on the same solver-neutral programs.
+#
+#   python -m benchmarks.backends [--scale small|medium] [--backends gurobi highs cpsat]
+#
+# Prints, per exercise and size, the fastest backend reaching the best objective, which is
+# the routing table for LP_BACKEND / the per-window backend setting.
+import time
+
+from benchmarks import common
+from benchmarks import instances
+
+import backends
+import pl1
+import pl2
+import pl3
+import pl4
+import pl5
+import pl6
+
+SIZES = {
+    "small": {"pl1": [5, 200], "pl2": [4, 24], "pl3": [7, 28], "pl4": [9, 100],
+              "pl5": [(20, 10), (200, 100)], "pl6": [(10, 30), (100, 400)]},
+    "medium": {"pl1": [1500], "pl2": [120, 300], "pl3": [100, 400], "pl4": [50, 100],
+               "pl5": [(500, 250)], "pl6": [(300, 1200), (500, 1900)]},
+    "large": {"pl1": [100000], "pl2": [2000], "pl3": [2000], "pl4": [2500],
+              "pl5": [(20000, 5000)], "pl6": [(5000, 20000)]},
+}
+
+
+def programs(name, size):
+    if name == "pl1":
+        d = instances.agriculture(size)
+        return pl1.agriculture_program(d['cultures'], d['values'], d['irrigation_water'], d['machine_hours'],
+                                       d['labor'], d['max_hectares'])
+    if name == "pl2":
+        return pl2.pl2_program(*instances.production(size))
+    if name == "pl3":
+        return pl3.pl3_program(instances.staffing(size))
+    if name == "pl4":
+        return pl4.BankBranchOptimization(**instances.bank(size)).program()
+    if name == "pl5":
+        return pl5.antenna_program(*instances.antenna(*size))
+    routers, edges = instances.network(*size)
+    return pl6.network_program(edges, routers[0], routers[-1])
+
+
+def main():
+    p = common.parser("Compare solver backends on the six exercises")
+    p.add_argument("--backends", nargs="*", default=backends.available(), help="engines to compare")
+    args = p.parse_args()
+    common.quiet_gurobi()
+
+    cases = []
+    routing = []
+    for name in sorted(SIZES[args.scale]):
+        for size in SIZES[args.scale][name]:
+            start = time.perf_counter()
+            program, _ = programs(name, size)
+            build_s = time.perf_counter() - start
+            runs = []
+            for backend in args.backends:
+                case = {"name": f"{name}:{backend}", "size": {"n": size}, "build_s": build_s}
+                try:
+                    times = []
+                    for _ in range(args.repeat):
+                        start = time.perf_counter()
+                        solution = backends.get_backend(backend).solve(program, time_limit=args.time_limit)
+                        times.append(time.perf_counter() - start)
+                    case.update(solve_s=min(times), status=solution.status, objective=solution.objective)
+                    runs.append((backend, case))
+                except Exception as e:
+                    case["error"] = str(e)
+                cases.append(case)
+            solved = [(b, c) for b, c in runs if c["status"] == backends.OPTIMAL]
+            if solved:
+                best = min(c["objective"] * program.sense for _, c in solved)
+                exact = [(c["solve_s"], b) for b, c in solved
+                         if abs(c["objective"] * program.sense - best) <= 1e-6 * max(1, abs(best))]
+                routing.append((name, size, min(exact)[1], {b: round(c["solve_s"], 6) for b, c in runs}))
+
+    common.report("backends", cases, args)
+    print("\nfastest exact backend:")
+    for name, size, backend, times in routing:
+        print(f"  {name} {size}: {backend}  {times}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# Shared helpers for the benchmark scripts: headless setup, phase timing and JSON result files.
+import os
+
+# The exercise modules import PyQt5 and matplotlib; make sure neither needs a display
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ.setdefault("MPLBACKEND", "Agg")
+# benchmarks neither read nor change the warm start library of the user (benchmarks.warmstart
+# turns it on, on a library of its own)
+os.environ["LP_WARMSTART"] = "0"
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+
+import gurobipy as gp
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+PHASES = ("build", "solve", "extract")
+
+
+def quiet_gurobi(time_limit=None):
+    # Applies to every model created afterwards in the default environment
+    gp.setParam("OutputFlag", 0)
+    if time_limit is not None:
+        gp.setParam("TimeLimit", time_limit)
+
+
+def git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(RESULTS_DIR))
+        return out.stdout.strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+
+def measure_phases(build, solve, extract, repeat=3):
+    # build() returns the state handed to solve(state) and extract(state).
+    # Timings come from plain runs; peak memory comes from one extra run under tracemalloc,
+    # which would otherwise slow the timed runs down. tracemalloc only sees Python allocations,
+    # so the process max RSS is recorded as well to cover the solver's native memory.
+    timings = {phase: [] for phase in PHASES}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        state = build()
+        built = time.perf_counter()
+        solve(state)
+        solved = time.perf_counter()
+        extract(state)
+        done = time.perf_counter()
+        timings["build"].append(built - start)
+        timings["solve"].append(solved - built)
+        timings["extract"].append(done - solved)
+        del state
+
+    peaks = {}
+    tracemalloc.start()
+    state = build()
+    peaks["build"] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.reset_peak()
+    solve(state)
+    peaks["solve"] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.reset_peak()
+    extract(state)
+    peaks["extract"] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del state
+
+    result = {}
+    for phase in PHASES:
+        result[f"{phase}_s"] = min(timings[phase])
+        result[f"{phase}_median_s"] = statistics.median(timings[phase])
+        result[f"{phase}_peak_bytes"] = peaks[phase]
+    result["max_rss_kb"] = max_rss_kb()
+    return result
+
+
+def max_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def parser(description):
+    p = argparse.ArgumentParser(description=description)
+    p.add_argument("--repeat", type=int, default=3, help="timed runs per case (the minimum is reported)")
+    p.add_argument("--scale", choices=("small", "medium", "large"), default="small",
+                   help="instance sizes; 'large' needs a full (unrestricted) Gurobi license")
+    p.add_argument("--time-limit", type=float, default=30, help="solver time limit per solve, in seconds")
+    p.add_argument("--output-dir", default=RESULTS_DIR)
+    p.add_argument("--baseline", help="earlier result file to compare against")
+    return p
+
+
+def write_results(suite, cases, output_dir=RESULTS_DIR):
+    os.makedirs(output_dir, exist_ok=True)
+    revision = git_revision()
+    payload = {
+        "suite": suite,
+        "revision": revision,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "gurobi": ".".join(str(v) for v in gp.gurobi.version()),
+        "cases": cases,
+    }
+    path = os.path.join(output_dir, f"{suite}-{revision}.json")
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+    return path
+
+
+def case_key(case):
+    return (case["name"], json.dumps(case["size"], sort_keys=True))
+
+
+def compare(cases, baseline_path, threshold=1.2):
+    # Prints the ratio current / baseline for every timing shared with the baseline
+    # and flags the ones slower than `threshold`
+    with open(baseline_path) as f:
+        baseline = {case_key(c): c for c in json.load(f)["cases"]}
+    regressions = 0
+    for case in cases:
+        old = baseline.get(case_key(case))
+        if old is None:
+            continue
+        for key, value in case.items():
+            if not key.endswith("_s") or not old.get(key):
+                continue
+            ratio = value / old[key]
+            flag = "  <-- slower" if ratio > threshold else ""
+            regressions += bool(flag)
+            print(f"{case['name']} {case['size']} {key}: {old[key]:.6f}s -> {value:.6f}s (x{ratio:.2f}){flag}")
+    return regressions
+
+
+def report(suite, cases, args):
+    for case in cases:
+        if "error" in case:
+            continue
+        timings = ", ".join(f"{k}={v:.6f}" for k, v in case.items() if k.endswith("_s") and "median" not in k)
+        print(f"{case['name']} {case['size']}: {timings}")
+    path = write_results(suite, cases, args.output_dir)
+    print(f"results written to {path}")
+    if args.baseline:
+        compare(cases, args.baseline)
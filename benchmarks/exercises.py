@@ -0,0 +1,118 @@
+# End-to-end benchmark of the six exercises: build, solve and extraction time plus peak memory.
+#
+#   python -m benchmarks.exercises [--scale small|medium|large] [--baseline results/exercises-<rev>.json]
+#
+# Results go to benchmarks/results/exercises-<git revision>.json.
+import gurobipy as gp
+
+from benchmarks import common
+from benchmarks import instances
+
+import pl1
+import pl2
+import pl3
+import pl4
+import pl5
+import pl6
+
+SIZES = {
+    # The restricted pip license of Gurobi caps models at 2000 variables and constraints,
+    # 'small' and 'medium' stay under it
+    "small": {
+        "pl1": [5, 50], "pl2": [4, 24], "pl3": [7, 28], "pl4": [9, 100],
+        "pl5": [(20, 10), (200, 100)], "pl6": [(10, 30), (100, 400)],
+    },
+    "medium": {
+        "pl1": [500, 1500], "pl2": [120, 300], "pl3": [100, 400], "pl4": [50, 100],
+        "pl5": [(500, 250), (1000, 500)], "pl6": [(300, 1200), (500, 1900)],
+    },
+    "large": {
+        "pl1": [10000, 100000], "pl2": [1000, 5000], "pl3": [5000, 20000], "pl4": [2500, 10000],
+        "pl5": [(20000, 5000), (100000, 20000)], "pl6": [(5000, 20000), (20000, 100000)],
+    },
+}
+
+
+def bench_pl1(n_crops):
+    data = instances.agriculture(n_crops)
+
+    def build():
+        return pl1.build_agriculture_model(data['cultures'], data['values'], data['irrigation_water'],
+                                           data['machine_hours'], data['labor'], data['max_hectares'])
+
+    return build, lambda s: s[0].optimize(), lambda s: pl1.extract_agriculture_results(s[0], s[1], data['cultures'])
+
+
+def bench_pl2(months):
+    args = instances.production(months)
+    return (lambda: pl2.build_pl2_model(*args), lambda s: s[0].optimize(),
+            lambda s: pl2.extract_pl2_results(s[0], s[1], months))
+
+
+def bench_pl3(cycle_length):
+    jours = instances.staffing(cycle_length)
+    return lambda: pl3.build_pl3_model(jours), lambda s: s[0].optimize(), lambda s: pl3.extract_planning(s[0], s[1])
+
+
+def bench_pl4(n_regions):
+    problem = pl4.BankBranchOptimization(**instances.bank(n_regions))
+
+    def extract(state):
+        model, branches, dabs = state
+        return model.getAttr('x', branches), model.getAttr('x', dabs)
+
+    return problem.build, lambda s: s[0].optimize(), extract
+
+
+def bench_pl5(size):
+    num_sites, coverage = instances.antenna(*size)
+    return (lambda: pl5.build_antenna_model(num_sites, coverage), lambda s: s[0].optimize(),
+            lambda s: pl5.extract_selected_sites(s[0], s[1]))
+
+
+def bench_pl6(size):
+    routers, edges = instances.network(*size)
+    src, dest = routers[0], routers[-1]
+    return (lambda: pl6.build_network_model(edges, src, dest), lambda s: s[0].optimize(),
+            lambda s: pl6.extract_path_edges(s[0], s[1]))
+
+
+BENCHMARKS = {
+    "pl1": (bench_pl1, "crops"),
+    "pl2": (bench_pl2, "months"),
+    "pl3": (bench_pl3, "cycle_length"),
+    "pl4": (bench_pl4, "regions"),
+    "pl5": (bench_pl5, ("sites", "zones")),
+    "pl6": (bench_pl6, ("nodes", "edges")),
+}
+
+
+def size_label(dims, size):
+    if isinstance(dims, tuple):
+        return dict(zip(dims, size))
+    return {dims: size}
+
+
+def main():
+    p = common.parser("Benchmark the six LP exercises")
+    p.add_argument("--only", nargs="*", choices=sorted(BENCHMARKS), help="exercises to run (default: all)")
+    args = p.parse_args()
+    common.quiet_gurobi(args.time_limit)
+
+    cases = []
+    for name in args.only or sorted(BENCHMARKS):
+        bench, dims = BENCHMARKS[name]
+        for size in SIZES[args.scale][name]:
+            build, solve, extract = bench(size)
+            case = {"name": name, "size": size_label(dims, size)}
+            try:
+                case.update(common.measure_phases(build, solve, extract, args.repeat))
+            except gp.GurobiError as e:
+                case["error"] = str(e)
+                print(f"{name} {case['size']}: {e}")
+            cases.append(case)
+    common.report("exercises", cases, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# Solution extraction: one .X per variable against the bulk reads of results.extract.
+#
+#   python -m benchmarks.extraction [--scale small|medium|large]
+#
+# The model is a chain LP (x_i + x_(i+1) >= d_i) with variables in a tupledict, as most exercises
+# build them. Each case reports the time to read the values one variable at a time and in bulk,
+# to read values, reduced costs and duals in bulk, and to format the result text. When Gurobi
+# cannot solve the instance (restricted license), the bulk path is timed on a HiGHS solution.
+import time
+
+import gurobipy as gp
+import numpy as np
+
+from benchmarks import common
+
+import backends
+import results
+
+SIZES = {
+    "small": [1000],
+    "medium": [100_000],
+    "large": [1_000_000],
+}
+
+
+def chain_lp(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(1, 10, n), rng.uniform(0, 100, n - 1)
+
+
+def best_time(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        times.append(time.perf_counter() - start)
+    return value, min(times)
+
+
+def gurobi_case(n, costs, demand, repeat):
+    m = gp.Model("extraction")
+    x = m.addVars(n, obj=costs.tolist(), name="x")
+    rows = m.addConstrs((x[i] + x[i + 1] >= demand[i] for i in range(n - 1)), name="chain")
+    m.optimize()
+
+    one_by_one, loop_s = best_time(lambda: {i: x[i].X for i in range(n)}, repeat)
+    values, bulk_s = best_time(lambda: results.read_attr(m, x), repeat)
+    if not np.allclose(values, list(one_by_one.values())):
+        raise AssertionError("Bulk and per-variable values differ")
+    result, extract_s = best_time(lambda: results.extract(m, {"x": x}, {"chain": rows}), repeat)
+    return result, {"loop_s": loop_s, "bulk_s": bulk_s, "speedup": loop_s / bulk_s, "with_duals_s": extract_s}
+
+
+def highs_case(n, costs, demand, repeat):
+    program = backends.LinearProgram("extraction")
+    x = program.add_vars(n, name="x")
+    program.obj = costs.tolist()
+    for i in range(n - 1):
+        program.add_constr({x[i]: 1.0, x[i + 1]: 1.0}, ">=", demand[i])
+    solution = backends.solve(program, "highs")
+    result, bulk_s = best_time(lambda: results.from_solution(solution, {"x": x}), repeat)
+    return result, {"bulk_s": bulk_s}
+
+
+def run_case(n, repeat):
+    costs, demand = chain_lp(n)
+    try:
+        result, case = gurobi_case(n, costs, demand, repeat)
+    except gp.GurobiError as e:
+        result, case = highs_case(n, costs, demand, repeat)
+        case["gurobi_error"] = str(e)
+    start = time.perf_counter()
+    result.format()
+    case["format_s"] = time.perf_counter() - start
+    return case
+
+
+def main():
+    p = common.parser("Time per-variable and bulk solution extraction")
+    args = p.parse_args()
+    common.quiet_gurobi(args.time_limit)
+
+    cases = []
+    for n in SIZES[args.scale]:
+        case = {"name": "extraction", "size": {"variables": n}}
+        case.update(run_case(n, args.repeat))
+        cases.append(case)
+        line = f"{n} variables: bulk {case['bulk_s'] * 1e3:.2f} ms"
+        if "loop_s" in case:
+            line += (f", one by one {case['loop_s'] * 1e3:.2f} ms ({case['speedup']:.1f}x), "
+                     f"with reduced costs and duals {case['with_duals_s'] * 1e3:.2f} ms")
+        else:
+            line += f" (HiGHS solution; gurobi: {case['gurobi_error']})"
+        print(line + f", format {case['format_s'] * 1e3:.2f} ms")
+    common.report("extraction", cases, args)
+
+
+if __name__ == "__main__":
+    main()
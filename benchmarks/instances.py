@@ -0,0 +1,200 @@
+# Synthetic, seeded instance generators for the six exercises.
+# Every generator returns data in the shape the module builders expect (plain Python, or NumPy
+# arrays for the array-based builders).
+import math
+import random
+
+import numpy as np
+
+AGRICULTURE_PARAMS = ['yield', 'price', 'labor', 'machine_time', 'water', 'labor_cost', 'fixed_cost']
+
+
+def agriculture(n_crops, seed=0):
+    # Same ranges as the default crop table of pl1, with resource limits that bind
+    rng = random.Random(seed)
+    cultures = [f"crop{i}" for i in range(n_crops)]
+    values = {}
+    for cult in cultures:
+        values[cult] = {
+            'yield': rng.uniform(45, 80), 'price': rng.uniform(45, 115), 'labor': rng.randint(1, 3),
+            'machine_time': rng.uniform(18, 32), 'water': rng.uniform(1800, 4000),
+            'labor_cost': rng.uniform(450, 750), 'fixed_cost': rng.uniform(150, 350)
+        }
+    hectares = 1000 * max(1, n_crops // 5)
+    return {
+        'cultures': cultures,
+        'values': values,
+        'irrigation_water': 2800 * hectares * 0.8,
+        'machine_hours': 25 * hectares * 0.9,
+        'labor': 2 * hectares * 0.7,
+        'max_hectares': hectares,
+    }
+
+
+def agriculture_fixed_charge(n_crops, setup_scale=1000, seed=0):
+    # agriculture() as a crop table for pl1_fixed: the fixed_cost column becomes a setup cost paid
+    # once per crop grown (setup_scale times the per-hectare one, about the margin of 50 to 250
+    # hectares), with a minimum viable area and a market limit on the area of every crop
+    data = agriculture(n_crops, seed)
+    rng = np.random.default_rng(seed)
+    table = np.array([[data['values'][cult][param] for param in AGRICULTURE_PARAMS] for cult in data['cultures']])
+    table[:, AGRICULTURE_PARAMS.index('fixed_cost')] *= setup_scale
+    return {
+        'cultures': data['cultures'],
+        'table': table,
+        'irrigation_water': data['irrigation_water'],
+        'machine_hours': data['machine_hours'],
+        'labor': data['labor'],
+        'max_hectares': data['max_hectares'],
+        'min_hectares': rng.uniform(20, 80, n_crops),
+        'max_crop_hectares': rng.uniform(150, 400, n_crops),
+    }
+
+
+def agriculture_zones(n_zones, crops_per_zone=5, seed=0):
+    # Zones with their own crop table, labor and hectare cap; water and machine hours are a
+    # regional budget covering about 70% of what the zones would use on their own
+    zones = [agriculture(crops_per_zone, seed=seed * 100003 + z) for z in range(n_zones)]
+    return {
+        'zones': zones,
+        'irrigation_water': 0.7 * sum(d['irrigation_water'] for d in zones),
+        'machine_hours': 0.7 * sum(d['machine_hours'] for d in zones),
+    }
+
+
+def production(months, seed=0):
+    # Positional arguments of pl2.build_pl2_model / ProductionOptimizationApp.PL2
+    rng = random.Random(seed)
+    demand = [rng.randint(2000, 5000) for _ in range(months)]
+    return (months, 15, 3, demand, 100, 1500, 13, 1600, 2000, 4, 160, 20, 500)
+
+
+def plants(n_skus, n_plants, periods, n_pools=None, seed=0):
+    # Keyword arguments of pl2_plants.build_plants_model; plants share labor pools two by two and
+    # start with about the crew their average demand needs
+    rng = np.random.default_rng(seed)
+    n_pools = n_pools or max(1, n_plants // 2)
+    return {
+        'demand': rng.integers(0, 200, size=(n_plants, n_skus, periods)).astype(float),
+        'raw_material_cost': rng.uniform(10, 20, n_skus),
+        'storage_cost': rng.uniform(1, 4, n_skus),
+        'hours_per_pair': rng.uniform(2, 6, n_skus),
+        'initial_stock': rng.integers(0, 100, size=(n_plants, n_skus)).astype(float),
+        'pool_of_plant': np.arange(n_plants) % n_pools,
+        'initial_workers': np.full(n_pools, math.ceil(2.5 * n_skus * n_plants / n_pools)),
+        'worker_salary': 1500,
+        'overtime_cost': 13,
+        'recruitment_cost': 1600,
+        'layoff_cost': 2000,
+        'working_hours': 160,
+        'max_overtime_hours': 20,
+    }
+
+
+def staffing(cycle_length, days_off=2, seed=0):
+    rng = random.Random(seed)
+    return [rng.randint(5, 30) for _ in range(cycle_length)]
+
+
+def staffing_stores(n_stores, n_distinct=None, cycle_length=7, seed=0):
+    # (n_stores x cycle_length) requirements; with n_distinct, stores share that many vectors
+    rng = np.random.default_rng(seed)
+    if n_distinct is None:
+        return rng.integers(5, 31, size=(n_stores, cycle_length))
+    vectors = rng.integers(5, 31, size=(n_distinct, cycle_length))
+    return vectors[rng.integers(0, n_distinct, size=n_stores)]
+
+
+def region_graph(n_regions, seed=0, rows=None):
+    # Planar-like neighbour graph: regions on a square grid, each joined to its right and
+    # lower neighbours plus an occasional diagonal. With rows, the grid is a strip of that many
+    # rows (regions along a valley or a coast), whose treewidth stays at about rows.
+    rng = random.Random(seed)
+    side = math.ceil(n_regions / rows) if rows else math.ceil(math.sqrt(n_regions))
+    edges = set()
+    for r in range(n_regions):
+        row, col = divmod(r, side)
+        candidates = [(row, col + 1), (row + 1, col)]
+        if rng.random() < 0.3:
+            candidates.append((row + 1, col + 1))
+        for nrow, ncol in candidates:
+            if ncol < side:
+                n = nrow * side + ncol
+                if n < n_regions:
+                    edges.add((r, n))
+    populations = [rng.randint(1, 10) for _ in range(n_regions)]
+    return populations, sorted(edges)
+
+
+def region_polygons(n_regions, seed=0):
+    # Regions as polygons: a square grid with jittered corners, the shape of region_graph
+    # without its diagonals. Some edges carry an extra midpoint on one side only, so neighbours
+    # do not always share the same vertices. Returns (polygons, populations, expected edges).
+    rng = np.random.default_rng(seed)
+    side = math.ceil(math.sqrt(n_regions))
+    corners = np.stack(np.meshgrid(np.arange(side + 1), np.arange(side + 1), indexing="ij"), axis=-1).astype(float)
+    corners += rng.uniform(-0.3, 0.3, corners.shape)
+    split = rng.random((n_regions, 4)) < 0.3
+    polygons, edges = [], []
+    for r in range(n_regions):
+        row, col = divmod(r, side)
+        ring = [corners[row, col], corners[row, col + 1], corners[row + 1, col + 1], corners[row + 1, col]]
+        points = []
+        for k in range(4):
+            points.append(ring[k])
+            if split[r, k]:
+                points.append((ring[k] + ring[(k + 1) % 4]) / 2)
+        polygons.append([np.array(points)])
+        if col + 1 < side and r + 1 < n_regions:
+            edges.append((r, r + 1))
+        if r + side < n_regions:
+            edges.append((r, r + side))
+    populations = rng.integers(1, 11, size=n_regions).tolist()
+    return polygons, populations, sorted(edges)
+
+
+def adjacency_matrix(n_regions, edges):
+    matrix = [[0] * n_regions for _ in range(n_regions)]
+    for i in range(n_regions):
+        matrix[i][i] = 1
+    for i, j in edges:
+        matrix[i][j] = matrix[j][i] = 1
+    return matrix
+
+
+def bank(n_regions, seed=0, rows=None):
+    # Keyword arguments of pl4.BankBranchOptimization
+    populations, edges = region_graph(n_regions, seed, rows)
+    return {
+        'populations': populations,
+        'adjacency_matrix': adjacency_matrix(n_regions, edges),
+        'budget': 4 * n_regions,
+        'branch_cost': 10,
+        'dab_cost': 4,
+        'a_coverage': 0.9,
+        'b_coverage': 0.6,
+        'c_coverage': 0.2,
+    }
+
+
+def antenna(n_sites, n_zones, sites_per_zone=5, seed=0):
+    # zone name -> indices of the sites that cover it, as built by MainApplicationWindow.site_coverage
+    rng = random.Random(seed)
+    coverage = {}
+    for z in range(n_zones):
+        coverage[f"zone{z}"] = sorted(rng.sample(range(n_sites), min(sites_per_zone, n_sites)))
+    return n_sites, coverage
+
+
+def network(n_nodes, n_edges, seed=0):
+    # Directed weighted graph keyed like Networkproblem.edges; a chain through all the
+    # routers guarantees a path from the first to the last one
+    rng = random.Random(seed)
+    routers = [f"N{i}" for i in range(n_nodes)]
+    edges = {}
+    for i in range(n_nodes - 1):
+        edges[(routers[i], routers[i + 1])] = rng.randint(1, 20)
+    while len(edges) < max(n_edges, n_nodes - 1):
+        i, j = rng.sample(range(n_nodes), 2)
+        edges.setdefault((routers[i], routers[j]), rng.randint(1, 20))
+    return routers, edges
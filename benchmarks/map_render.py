@@ -0,0 +1,109 @@
+# InteractiveMap (pl5) at scale: batched loading, hover lookups, rendering and level of detail.
+#
+#   python -m benchmarks.map_render [--scale small|medium|large] [--opengl]
+#
+# Zones are tiles of a grid, sites uniform over them. Each case reports the time to draw the
+# zones, to load the sites in one batch and one by one, a hover lookup, a frame at 1:1 and a
+# frame of the whole map (clusters), and the zone coverage the solver needs.
+import time
+
+import numpy as np
+
+from benchmarks import common
+
+from PyQt5.QtCore import QPointF
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import QApplication
+
+import pl5
+
+SIZES = {
+    "small": [(100, 1000), (500, 5000)],
+    "medium": [(2000, 20000)],
+    "large": [(10000, 100000)],
+}
+HOVER_QUERIES = 2000
+
+
+def grid_zones(n_zones, width=200, height=150):
+    columns = int(np.ceil(np.sqrt(n_zones)))
+    return {f"zone{i}": {'x': (i % columns) * width, 'y': (i // columns) * height, 'width': width,
+                         'height': height, 'color': QColor(40 + i % 200, 120, 200)} for i in range(n_zones)}
+
+
+def settle(app, view):
+    # The scene rebuilds its index from the event loop; give it a query and a turn
+    view.scene.items(QPointF(0, 0))
+    app.processEvents()
+
+
+def run_case(app, n_zones, n_sites, opengl):
+    zones = grid_zones(n_zones)
+    start = time.perf_counter()
+    view = pl5.InteractiveMap(zones, opengl=opengl)
+    view.resize(800, 600)
+    case = {"zones_s": time.perf_counter() - start}
+    settle(app, view)
+    bounds = view.scene.itemsBoundingRect()
+    rng = np.random.default_rng(0)
+    points = np.column_stack([rng.uniform(bounds.left(), bounds.right(), n_sites),
+                              rng.uniform(bounds.top(), bounds.bottom(), n_sites)]).tolist()
+
+    start = time.perf_counter()
+    view.add_sites(points)
+    case["batch_load_s"] = time.perf_counter() - start
+    settle(app, view)
+
+    single = pl5.InteractiveMap(grid_zones(n_zones))
+    settle(app, single)
+    start = time.perf_counter()
+    for x, y in points:
+        if single.is_on_boundary(QPointF(x, y)):
+            single.new_site(x, y)
+    case["single_load_s"] = time.perf_counter() - start
+    single.deleteLater()
+
+    start = time.perf_counter()
+    for x, y in points[:HOVER_QUERIES]:
+        view.is_on_boundary(QPointF(x, y))
+    case["hover_s"] = (time.perf_counter() - start) / min(HOVER_QUERIES, n_sites)
+
+    start = time.perf_counter()
+    view.grab()
+    case["frame_1to1_s"] = time.perf_counter() - start
+    start = time.perf_counter()
+    view.fit_all()
+    case["lod_switch_s"] = time.perf_counter() - start
+    start = time.perf_counter()
+    view.grab()
+    case["frame_all_s"] = time.perf_counter() - start
+    case["clusters"] = int(len(view.clusters.counts)) if view.clustered else 0
+
+    window = pl5.MainApplicationWindow()
+    window.zones = zones
+    window.map_view = view
+    start = time.perf_counter()
+    window.site_coverage()
+    case["coverage_s"] = time.perf_counter() - start
+    return case
+
+
+def main():
+    p = common.parser("InteractiveMap loading, hover and rendering at scale")
+    p.add_argument("--opengl", action="store_true", help="render through an OpenGL viewport")
+    args = p.parse_args()
+    app = QApplication.instance() or QApplication([])
+    cases = []
+    for n_zones, n_sites in SIZES[args.scale]:
+        case = {"name": "pl5:map", "size": {"zones": n_zones, "sites": n_sites, "opengl": args.opengl}}
+        case.update(run_case(app, n_zones, n_sites, args.opengl))
+        cases.append(case)
+        print(f"{n_zones} zones, {n_sites} sites: load {case['batch_load_s']:.3f} s "
+              f"(one by one {case['single_load_s']:.3f} s), hover {case['hover_s'] * 1e6:.1f} us, "
+              f"frame {case['frame_1to1_s'] * 1e3:.1f} ms / all {case['frame_all_s'] * 1e3:.1f} ms "
+              f"({case['clusters']} clusters)")
+    common.report("map_render", cases, args)
+
+
+if __name__ == "__main__":
+    main()
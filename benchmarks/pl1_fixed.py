@@ -0,0 +1,122 @@
+# Fixed-charge pl1 (setup costs paid once per crop grown) in the strong form of pl1_fixed against
+# the naive big-M form, on Gurobi and on HiGHS.
+#
+#   python -m benchmarks.pl1_fixed [--scale small|medium|large] [--setup-scale 5000]
+#
+# Every instance is solved to proven optimality (MIPGap 0 on Gurobi, HiGHS stops at its default
+# relative gap of 1e-4) in two forms:
+#   naive   x <= NAIVE_BIG_M * y, no bounds or fixings;
+#   strong  tight area bounds from the resource rows and never-grown crops fixed (solve_fixed_charge).
+# Reports the time (model build included), the branch-and-bound nodes on Gurobi and the gap of the
+# LP relaxation to the optimum. At the default setup scale the strong form is about 2x faster on
+# Gurobi, whose presolve tightens the naive model itself, and 3-4x faster on HiGHS; with
+# --setup-scale 1000 both forms need a real search and take about the same time. Gurobi cannot
+# hold the large sizes with a size-limited license.
+import time
+
+import gurobipy as gp
+
+from benchmarks import common
+from benchmarks import instances
+
+import backends
+import pl1_fixed
+from instrumentation import SolveMetrics
+
+SIZES = {
+    "small": [200, 400],
+    "medium": [800],
+    "large": [2000, 5000],
+}
+FORMS = {"naive": pl1_fixed.NAIVE_BIG_M, "strong": None}
+
+
+def relaxation_gap(data, optimum, big_m=None):
+    m = pl1_fixed.build_fixed_charge_model(*model_args(data), big_m=big_m)[0]
+    m.update()
+    relaxed = m.relax()
+    relaxed.optimize()
+    return (relaxed.ObjVal - optimum) / abs(optimum)
+
+
+def model_args(data):
+    return (data['table'], data['irrigation_water'], data['machine_hours'], data['labor'], data['max_hectares'],
+            data['min_hectares'], data['max_crop_hectares'])
+
+
+def solve_gurobi(data, big_m):
+    start = time.perf_counter()
+    if big_m is None:
+        metrics = SolveMetrics("pl1")
+        profit = pl1_fixed.solve_fixed_charge(data['cultures'], *model_args(data), backend="gurobi",
+                                              metrics=metrics)[2]
+        if metrics.solve_stats.get("Backend", "gurobi") != "gurobi":
+            raise RuntimeError("Model too large for the Gurobi license, solved by the fallback backend")
+        return {"solve_s": time.perf_counter() - start, "nodes": metrics.solve_stats.get("NodeCount"),
+                "objective": profit}
+    m = pl1_fixed.build_fixed_charge_model(*model_args(data), big_m=big_m)[0]
+    m.optimize()
+    return {"solve_s": time.perf_counter() - start, "nodes": m.NodeCount, "objective": m.ObjVal}
+
+
+def solve_highs(data, big_m):
+    start = time.perf_counter()
+    program, _ = pl1_fixed.fixed_charge_program(*model_args(data), big_m=big_m)
+    solution = backends.get_backend("highs").solve(program)
+    return {"solve_s": time.perf_counter() - start, "objective": solution.objective}
+
+
+def run_case(n_crops, setup_scale):
+    data = instances.agriculture_fixed_charge(n_crops, setup_scale)
+    rows = {}
+    for backend, solve in (("gurobi", solve_gurobi), ("highs", solve_highs)):
+        for form, big_m in FORMS.items():
+            try:
+                rows[f"{backend}:{form}"] = solve(data, big_m)
+            except Exception as e:
+                # a size-limited license cannot hold the larger instances
+                rows[f"{backend}:{form}"] = {"error": str(e)}
+
+    solved = [row for row in rows.values() if "error" not in row]
+    optimum = max(row["objective"] for row in solved)
+    for name, row in rows.items():
+        if "error" not in row and abs(row["objective"] - optimum) > 1e-4 * abs(optimum):
+            raise AssertionError(f"{name} found {row['objective']}, the best form {optimum}")
+    for form, big_m in FORMS.items():
+        try:
+            gap = relaxation_gap(data, optimum, big_m)
+        except Exception:
+            continue
+        for backend in ("gurobi", "highs"):
+            rows[f"{backend}:{form}"]["relaxation_gap"] = gap
+    return rows
+
+
+def main():
+    p = common.parser("Strong against naive big-M fixed-charge crop selection")
+    p.add_argument("--setup-scale", type=float, default=5000,
+                   help="setup cost of a crop as a multiple of its per-hectare fixed_cost")
+    args = p.parse_args()
+    common.quiet_gurobi(args.time_limit)
+    gp.setParam("MIPGap", 0)
+    # first solves pay for starting Gurobi and importing scipy
+    run_case(50, args.setup_scale)
+
+    cases = []
+    for n_crops in SIZES[args.scale]:
+        size = {"crops": n_crops, "setup_scale": args.setup_scale}
+        for name, row in run_case(n_crops, args.setup_scale).items():
+            case = {"name": f"pl1:{name}", "size": size}
+            case.update(row)
+            cases.append(case)
+            if "error" in row:
+                print(f"{n_crops} crops {name}: {row['error']}")
+                continue
+            print(f"{n_crops} crops {name}: {row['solve_s']:.3f} s"
+                  + (f", {row['nodes']:.0f} nodes" if row.get("nodes") is not None else "")
+                  + (f", LP relaxation gap {row['relaxation_gap']:.2e}" if "relaxation_gap" in row else ""))
+    common.report("pl1_fixed", cases, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# Time to a first usable pl2 plan, and how fast the gap closes, with pl2_anytime.
+#
+#   python -m benchmarks.pl2_anytime [--scale small|medium|large]
+#
+# Every horizon is solved once by solve_pl2_anytime run to the optimum (MIPGap 0, --time-limit),
+# recording when each update arrives: the rounded LP preview, the first MIP incumbent, and the
+# first update within 1% and 0.1% of the bound. The plain Gurobi solve of the same model, at the
+# same MIPGap, is timed for comparison. The large horizons need a full Gurobi license.
+import time
+
+from benchmarks import common
+from benchmarks import instances
+
+import pl2
+import pl2_anytime
+from instrumentation import SolveMetrics
+
+SIZES = {
+    "small": [60, 120, 240],
+    "medium": [300],
+    "large": [1200, 2400],
+}
+GAPS = (0.01, 0.001)
+
+
+def run_case(months, time_limit):
+    args = instances.production(months)
+    updates = []
+    pl2_anytime.solve_pl2_anytime(*args, mip_gap=0.0, time_limit=time_limit, on_update=updates.append,
+                                  metrics=SolveMetrics("pl2"))
+    case = {}
+    preview = next((u for u in updates if u["stage"] == pl2_anytime.PREVIEW), None)
+    if preview is not None:
+        case.update(preview_s=preview["elapsed_s"], preview_gap=preview["gap"])
+    incumbent = next((u for u in updates if u["stage"] == pl2_anytime.INCUMBENT), None)
+    if incumbent is not None:
+        case["first_incumbent_s"] = incumbent["elapsed_s"]
+    for gap in GAPS:
+        within = next((u for u in updates if u["gap"] is not None and u["gap"] <= gap), None)
+        if within is not None:
+            case[f"gap_{gap:g}_s"] = within["elapsed_s"]
+    final = updates[-1]
+    case.update(final_s=final["elapsed_s"], final_gap=final["gap"], updates=len(updates))
+
+    start = time.perf_counter()
+    m, _ = pl2.build_pl2_model(*args)
+    m.Params.MIPGap = 0.0
+    SolveMetrics("pl2").optimize(m)
+    case["plain_s"] = time.perf_counter() - start
+    m.dispose()
+    return case
+
+
+def main():
+    p = common.parser("Time to a first pl2 plan and to closing the gap with the anytime solver")
+    args = p.parse_args()
+    common.quiet_gurobi(args.time_limit)
+    # the first solve pays for starting Gurobi
+    run_case(4, args.time_limit)
+
+    cases = []
+    for months in SIZES[args.scale]:
+        case = {"name": "pl2:anytime", "size": {"months": months}}
+        try:
+            case.update(run_case(months, args.time_limit))
+        except Exception as e:
+            # a size-limited license cannot hold the longer horizons
+            case["error"] = str(e)
+            print(f"{months} months: {e}")
+            cases.append(case)
+            continue
+        cases.append(case)
+        line = f"{months} months: "
+        if "preview_s" in case:
+            line += f"preview {case['preview_s'] * 1e3:.1f} ms (gap {case['preview_gap']:.2%}), "
+        for gap in GAPS:
+            if f"gap_{gap:g}_s" in case:
+                line += f"within {gap:.1%} {case[f'gap_{gap:g}_s'] * 1e3:.1f} ms, "
+        line += (f"final {case['final_s'] * 1e3:.1f} ms (gap {case['final_gap'] or 0:.2e}), "
+                 f"plain MIP {case['plain_s'] * 1e3:.1f} ms")
+        print(line)
+    common.report("pl2_anytime", cases, args)
+
+
+if __name__ == "__main__":
+    main()
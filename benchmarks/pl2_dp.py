@@ -0,0 +1,84 @@
+# Specialized pl2 solver (LP start, production greedy, workforce DP) against the Gurobi MIP.
+#
+#   python -m benchmarks.pl2_dp [--scale small|medium|large] [--instances 5]
+#
+# Each horizon runs several random instances through solve_pl2 with both backends and reports
+# the mean time of each and the gap of the specialized solver to Gurobi's objective and to its
+# own LP bound. The heuristic plan is solved again by the MIP when its gap to the LP bound is
+# above pl2_dp.DP_GAP_TOLERANCE; the fallbacks are counted and their time is part of dp_s, and
+# gap_to_bound is the gap of the heuristic plan before any fallback.
+import time
+
+from benchmarks import common
+from benchmarks import instances
+
+import pl2
+from instrumentation import SolveMetrics
+
+SIZES = {
+    "small": [12, 24, 60, 120],
+    "medium": [240, 600],
+    "large": [1200, 5000],
+}
+
+
+def timed(args, backend):
+    metrics = SolveMetrics("pl2")
+    start = time.perf_counter()
+    if backend == "gurobi":
+        # straight to the MIP: solve_pl2 would fall back to HiGHS when the license is too small
+        m, _ = pl2.build_pl2_model(*args)
+        metrics.optimize(m)
+    else:
+        pl2.solve_pl2(*args, backend=backend, metrics=metrics)
+    return time.perf_counter() - start, metrics.solve_stats
+
+
+def run_case(months, count):
+    case = {"gurobi_s": 0.0, "dp_s": 0.0, "gap_to_gurobi": 0.0, "gap_to_bound": 0.0, "fallbacks": 0}
+    for seed in range(count):
+        args = instances.production(months, seed=seed)
+        dp_s, dp = timed(args, "dp")
+        case["dp_s"] += dp_s / count
+        case["gap_to_bound"] = max(case["gap_to_bound"], dp.get("DPGap", dp["MIPGap"]))
+        case["fallbacks"] += int(dp["DPFallback"])
+        try:
+            gurobi_s, gurobi = timed(args, "gurobi")
+        except Exception as e:
+            # a size-limited license cannot hold the longer horizons
+            case["error"] = str(e)
+            continue
+        case["gurobi_s"] += gurobi_s / count
+        gap = (dp["ObjVal"] - gurobi["ObjVal"]) / abs(gurobi["ObjVal"])
+        case["gap_to_gurobi"] = max(case["gap_to_gurobi"], gap)
+    if "error" in case:
+        del case["gurobi_s"], case["gap_to_gurobi"]
+    return case
+
+
+def main():
+    p = common.parser("Compare the specialized pl2 solver with the Gurobi MIP")
+    p.add_argument("--instances", type=int, default=5, help="random instances per horizon")
+    args = p.parse_args()
+    common.quiet_gurobi(args.time_limit)
+    # first solves pay for importing scipy and starting Gurobi
+    timed(instances.production(4), "dp")
+    timed(instances.production(4), "gurobi")
+
+    cases = []
+    for months in SIZES[args.scale]:
+        case = {"name": "pl2:dp", "size": {"months": months}}
+        case.update(run_case(months, args.instances))
+        cases.append(case)
+        line = (f"{months} months: dp {case['dp_s'] * 1e3:.2f} ms (gap to bound {case['gap_to_bound']:.2e}, "
+                f"{case['fallbacks']}/{args.instances} solved again by the MIP)")
+        if "error" in case:
+            line += f", gurobi: {case['error']}"
+        else:
+            line += f", gurobi {case['gurobi_s'] * 1e3:.2f} ms (worst gap to gurobi {case['gap_to_gurobi']:.2e})"
+        print(line)
+    common.report("pl2_dp", cases, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# Batch staffing of many stores (pl3_batch) against one solve_pl3 call per store.
+#
+#   python -m benchmarks.pl3_batch [--scale small|medium|large] [--workers N]
+#
+# Each case solves n_stores random requirement vectors, either all different or drawn from a
+# smaller set of shared vectors, and reports the batch time, the stores per second and the time
+# of the per-store loop it replaces (on a sample of stores when there are many).
+import time
+
+from benchmarks import common
+from benchmarks import instances
+
+import pl3
+import pl3_batch
+from instrumentation import SolveMetrics
+
+SIZES = {
+    "small": [(1000, None), (1000, 50)],
+    "medium": [(10000, None), (10000, 500)],
+    "large": [(100000, None), (100000, 5000)],
+}
+# Stores solved one by one for the per-store timing
+LOOP_SAMPLE = 2000
+
+
+def run_case(n_stores, n_distinct, workers, backend):
+    demand = instances.staffing_stores(n_stores, n_distinct)
+    metrics = SolveMetrics("pl3")
+    start = time.perf_counter()
+    schedule, totals = pl3_batch.solve_pl3_batch(demand, backend=backend, workers=workers, metrics=metrics)
+    batch_s = time.perf_counter() - start
+
+    sample = demand[:LOOP_SAMPLE]
+    start = time.perf_counter()
+    for k, jours in enumerate(sample):
+        result, total = pl3.solve_pl3(jours.tolist(), backend=backend)
+        if total != totals[k] or list(result) != schedule[k].tolist():
+            raise AssertionError(f"Store {k}: batch and single solves disagree")
+    loop_s = (time.perf_counter() - start) * n_stores / len(sample)
+    return {"batch_s": batch_s, "loop_s": loop_s, "stores_per_second": n_stores / batch_s,
+            "distinct": metrics.solve_stats["DistinctStores"]}
+
+
+def main():
+    p = common.parser("Batch pl3 staffing throughput")
+    p.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    p.add_argument("--backend", default="cyclic", help="solve_pl3 backend used for every store")
+    args = p.parse_args()
+    common.quiet_gurobi(args.time_limit)
+
+    cases = []
+    for n_stores, n_distinct in SIZES[args.scale]:
+        case = {"name": "pl3:batch", "size": {"stores": n_stores, "distinct": n_distinct}}
+        case.update(run_case(n_stores, n_distinct, args.workers, args.backend))
+        cases.append(case)
+        print(f"{n_stores} stores ({case['distinct']} distinct): batch {case['batch_s']:.3f} s "
+              f"({case['stores_per_second']:.0f} stores/s), one by one {case['loop_s']:.3f} s")
+    common.report("pl3_batch", cases, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Combinatorial (days-off window) pl3 solver against the Gurobi MIP.
+#
+#   python -m benchmarks.pl3_cyclic [--scale small|medium|large] [--instances 1000]
+#
+# Every random instance is solved both ways; the totals must agree and the cyclic schedule must
+# cover every day. Reports the mean time per instance of each solver and the instances per second.
+import random
+import time
+
+import numpy as np
+
+from benchmarks import common
+
+import pl3
+import pl3_cyclic
+from instrumentation import SolveMetrics
+
+SIZES = {
+    "small": [(7, 2), (7, 1), (5, 2)],
+    "medium": [(7, 2), (14, 4), (28, 8)],
+    "large": [(28, 8), (91, 26), (365, 104)],
+}
+
+
+def random_requirements(n, rng):
+    high = rng.choice([5, 30, 300])
+    return [rng.randint(0, high) for _ in range(n)]
+
+
+def run_case(n, days_off, count, seed=0):
+    rng = random.Random(seed)
+    requirements = [random_requirements(n, rng) for _ in range(count)]
+    mat = pl3.pattern_matrix(n, days_off)
+
+    start = time.perf_counter()
+    solutions = [pl3_cyclic.cyclic_staffing(jours, days_off) for jours in requirements]
+    cyclic_s = (time.perf_counter() - start) / count
+
+    gurobi_s = 0.0
+    mismatches = 0
+    for jours, (x, total) in zip(requirements, solutions):
+        if min(x) < 0 or (mat @ np.array(x) < jours).any():
+            raise AssertionError(f"Cyclic schedule {x} does not cover {jours}")
+        metrics = SolveMetrics("pl3")
+        started = time.perf_counter()
+        m, _ = pl3.build_pl3_model(jours, days_off)
+        metrics.optimize(m)
+        gurobi_s += (time.perf_counter() - started) / count
+        if round(m.ObjVal) != total:
+            mismatches += 1
+    return {"cyclic_s": cyclic_s, "gurobi_s": gurobi_s, "mismatches": mismatches,
+            "cyclic_per_second": 1 / cyclic_s}
+
+
+def main():
+    p = common.parser("Compare the combinatorial pl3 solver with the Gurobi MIP")
+    p.add_argument("--instances", type=int, default=1000, help="random instances per cycle length")
+    args = p.parse_args()
+    common.quiet_gurobi(args.time_limit)
+
+    cases = []
+    for n, days_off in SIZES[args.scale]:
+        case = {"name": "pl3:cyclic", "size": {"days": n, "days_off": days_off}}
+        case.update(run_case(n, days_off, args.instances))
+        cases.append(case)
+        print(f"{n} days, {days_off} off: cyclic {case['cyclic_s'] * 1e6:.1f} us "
+              f"({case['cyclic_per_second']:.0f}/s), gurobi {case['gurobi_s'] * 1e3:.2f} ms, "
+              f"{case['mismatches']} mismatches")
+    common.report("pl3_cyclic", cases, args)
+
+
+if __name__ == "__main__":
+    main()
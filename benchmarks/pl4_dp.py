@@ -0,0 +1,97 @@
+# Tree-decomposition DP for pl4 against the Gurobi MIP.
+#
+#   python -m benchmarks.pl4_dp [--scale small|medium|large] [--instances 5]
+#
+# Region maps of each shape (the 9 regions of the problem statement, square maps and strips of
+# three rows) run through BankBranchOptimization.run with the "dp" and "gurobi" backends, with a
+# budget of one unit per region. Reports the min-fill width, the DP work estimate, the mean time
+# of each backend, the worst objective gap between them and which one the automatic choice
+# (backend None) picked.
+import time
+
+from benchmarks import common
+from benchmarks import instances
+
+import pl4
+import templates
+import warmstart
+from instrumentation import SolveMetrics
+
+SIZES = {
+    # (shape, regions); strips have three rows
+    "small": [("statement", 9), ("square", 30), ("square", 60), ("strip", 60), ("strip", 150)],
+    "medium": [("square", 100), ("strip", 300), ("strip", 600)],
+    "large": [("square", 1000), ("strip", 3000)],
+}
+
+
+def problem(shape, n_regions, seed):
+    if shape == "statement":
+        kwargs = dict(instances.bank(9, seed), populations=pl4.populations, adjacency_matrix=pl4.adjacency_matrix)
+    else:
+        kwargs = instances.bank(n_regions, seed, rows=3 if shape == "strip" else None)
+    kwargs["budget"] = n_regions
+    return pl4.BankBranchOptimization(**kwargs)
+
+
+def timed(optimization, backend):
+    # every map is new to the template cache
+    templates.clear()
+    metrics = SolveMetrics("pl4")
+    start = time.perf_counter()
+    optimization.run(metrics, backend)
+    return time.perf_counter() - start, metrics.solve_stats
+
+
+def run_case(shape, n_regions, count):
+    case = {"dp_s": 0.0, "gurobi_s": 0.0, "gap": 0.0, "width": 0, "work": 0, "auto_dp": 0}
+    for seed in range(count):
+        optimization = problem(shape, n_regions, seed)
+        dp_s, dp = timed(optimization, "dp")
+        case["dp_s"] += dp_s / count
+        case["width"] = max(case["width"], dp["Width"])
+        case["work"] = max(case["work"], dp["DPWork"])
+        _, auto = timed(optimization, None)
+        case["auto_dp"] += auto.get("Backend") == "dp"
+        try:
+            gurobi_s, gurobi = timed(optimization, "gurobi")
+        except Exception as e:
+            case["error"] = str(e)
+            continue
+        if gurobi.get("Backend"):
+            # fell back to an open-source solver: a size-limited license cannot hold the MIP
+            case["error"] = f"solved by {gurobi['Backend']}"
+        case["gurobi_s"] += gurobi_s / count
+        case["gap"] = max(case["gap"], abs(dp["ObjVal"] - gurobi["ObjVal"]) / max(1.0, abs(gurobi["ObjVal"])))
+    return case
+
+
+def main():
+    p = common.parser("Compare the pl4 tree-decomposition DP with the Gurobi MIP")
+    p.add_argument("--instances", type=int, default=5, help="random maps per shape and size")
+    args = p.parse_args()
+    common.quiet_gurobi(args.time_limit)
+    # every map is new to the warm-start library anyway
+    warmstart.ENABLED = False
+    # first solves pay for importing scipy and starting Gurobi
+    timed(problem("statement", 9, 0), "dp")
+    timed(problem("statement", 9, 0), "gurobi")
+
+    cases = []
+    for shape, n_regions in SIZES[args.scale]:
+        case = {"name": f"pl4:dp:{shape}", "size": {"regions": n_regions}}
+        case.update(run_case(shape, n_regions, args.instances))
+        cases.append(case)
+        line = (f"{shape} {n_regions} regions: width {case['width']}, work {case['work']:.2e}, "
+                f"dp {case['dp_s'] * 1e3:.2f} ms, auto picked dp {case['auto_dp']}/{args.instances}")
+        if "error" in case:
+            line += f", gurobi: {case['error']}"
+        else:
+            line += (f", gurobi {case['gurobi_s'] * 1e3:.2f} ms (x{case['gurobi_s'] / case['dp_s']:.1f}, "
+                     f"worst gap {case['gap']:.1e})")
+        print(line)
+    common.report("pl4_dp", cases, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# Neighbour graph construction for pl4 from region polygons (pl4_geometry).
+#
+#   python -m benchmarks.pl4_geometry [--scale small|medium|large]
+#
+# Regions are jittered grid cells (instances.region_polygons), whose neighbours are known, so
+# every run also checks the edge list. Reports the construction time per region count, split
+# into the exact edge test and the conversion to pl4's neighbour pairs.
+import time
+
+from benchmarks import common
+from benchmarks import instances
+
+import pl4
+import pl4_geometry
+
+SIZES = {
+    "small": [100, 1000, 5000],
+    "medium": [10000, 25000],
+    "large": [50000, 100000],
+}
+
+
+def run_case(n_regions, repeat):
+    polygons, _, expected = instances.region_polygons(n_regions)
+    timings = {"edges_s": [], "pairs_s": []}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        edges = pl4_geometry.adjacency_edges(polygons)
+        built = time.perf_counter()
+        pairs = pl4.neighbor_pairs(pl4_geometry.sparse_adjacency(n_regions, edges))
+        done = time.perf_counter()
+        timings["edges_s"].append(built - start)
+        timings["pairs_s"].append(done - built)
+    if list(pairs) != expected:
+        raise AssertionError(f"{n_regions} regions: wrong neighbour pairs")
+    case = {name: min(values) for name, values in timings.items()}
+    case["edges"] = len(edges)
+    case["regions_per_second"] = n_regions / case["edges_s"]
+    return case
+
+
+def main():
+    args = common.parser("Neighbour graph construction from region polygons").parse_args()
+    cases = []
+    for n_regions in SIZES[args.scale]:
+        case = {"name": "pl4:geometry", "size": {"regions": n_regions}}
+        case.update(run_case(n_regions, args.repeat))
+        cases.append(case)
+        print(f"{n_regions} regions: {case['edges']} edges in {case['edges_s']:.3f} s "
+              f"({case['regions_per_second']:.0f} regions/s), pairs {case['pairs_s']:.3f} s")
+    common.report("pl4_geometry", cases, args)
+
+
+if __name__ == "__main__":
+    main()
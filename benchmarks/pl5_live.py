@@ -0,0 +1,86 @@
+# Live pl5 re-solve: clicking sites one by one into the persistent model of pl5_live against
+# rebuilding and solving build_antenna_model from scratch after every click.
+#
+#   python -m benchmarks.pl5_live [--scale small|medium|large] [--clicks 200]
+#
+# Zones are tiles of a grid, sites uniform over them. Both ways must reach the same number of
+# sites after the last click. Reports the mean time per click of each.
+import time
+
+import numpy as np
+
+from benchmarks import common
+
+import pl5
+from pl5_live import LiveCoverModel
+from instrumentation import SolveMetrics
+
+SIZES = {
+    "small": [(20, 100), (100, 300)],
+    "medium": [(400, 1000)],
+    "large": [(2000, 10000)],
+}
+
+
+def grid_zones(n_zones, width=200, height=150):
+    columns = int(np.ceil(np.sqrt(n_zones)))
+    return {f"zone{i}": {'x': (i % columns) * width, 'y': (i // columns) * height, 'width': width,
+                         'height': height} for i in range(n_zones)}
+
+
+def run_case(n_zones, n_sites, clicks, seed=0):
+    zones = grid_zones(n_zones)
+    extent = np.array([max(z['x'] + z['width'] for z in zones.values()),
+                       max(z['y'] + z['height'] for z in zones.values())])
+    rng = np.random.default_rng(seed)
+    points = rng.random((n_sites, 2)) * extent
+    base, clicked = points[:n_sites - clicks], points[n_sites - clicks:]
+
+    live = LiveCoverModel(zones)
+    live.add_sites(base)
+    live.set_start()
+    live.model.optimize()
+    live.store([v.X for v in live.sites])
+    start = time.perf_counter()
+    for point in clicked:
+        live.add_sites([point])
+        live.set_start()
+        live.model.optimize()
+        live.store([v.X for v in live.sites])
+    live_s = (time.perf_counter() - start) / clicks
+
+    start = time.perf_counter()
+    for k in range(len(base) + 1, n_sites + 1):
+        coverage = {name: np.flatnonzero(pl5.zone_covers(info, points[:k])).tolist()
+                    for name, info in zones.items()}
+        coverage = {name: sites for name, sites in coverage.items() if sites}
+        selected = pl5.solve_antenna(k, coverage, metrics=SolveMetrics("pl5"))
+    scratch_s = (time.perf_counter() - start) / clicks
+
+    live_count = int(live.incumbent.sum())
+    # zones without any site are left uncovered by the live model and dropped from the rebuilt one
+    if live_count != len(selected):
+        raise AssertionError(f"Live model selects {live_count} sites, rebuilt model {len(selected)}")
+    return {"live_s": live_s, "scratch_s": scratch_s, "sites_selected": live_count,
+            "speedup": scratch_s / live_s}
+
+
+def main():
+    p = common.parser("Compare incremental and from-scratch pl5 re-solves after each new site")
+    p.add_argument("--clicks", type=int, default=50, help="sites added one at a time after the initial ones")
+    args = p.parse_args()
+    common.quiet_gurobi(args.time_limit)
+
+    cases = []
+    for n_zones, n_sites in SIZES[args.scale]:
+        clicks = min(args.clicks, n_sites)
+        case = {"name": "pl5:live", "size": {"zones": n_zones, "sites": n_sites, "clicks": clicks}}
+        case.update(run_case(n_zones, n_sites, clicks))
+        cases.append(case)
+        print(f"{n_zones} zones, {n_sites} sites: live {case['live_s'] * 1e3:.2f} ms/click, "
+              f"from scratch {case['scratch_s'] * 1e3:.2f} ms/click ({case['speedup']:.1f}x)")
+    common.report("pl5_live", cases, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# Memory per worker and query throughput of parallel pl6 path queries on a shared graph store.
+#
+#   python -m benchmarks.pl6_graph [--scale small|medium|large] [--workers 1,2,4]
+#
+# Every case answers the same random (src, dest) queries on one network with a growing number
+# of worker processes, in two modes:
+#   shared  pl6_graph.QueryPool: the workers map the CSR segments of one GraphStore;
+#   copied  every worker gets its own pickled copy of the edges dict (what a pool of
+#           solve_network workers needs) and builds its own arrays from it.
+# Memory comes from /proc/<pid>/smaps_rollup of each worker once it has answered queries: RSS
+# counts the mapped segments in full in every worker, PSS splits shared pages between the
+# processes mapping them, and private memory is what that worker alone holds. The store is then
+# updated twice (new travel times, then one new edge) to time the copy-on-write versions.
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks import common
+from benchmarks import instances
+
+import pl6_graph
+
+SIZES = {
+    # (routers, edges, queries)
+    "small": [(20_000, 100_000, 2000)],
+    "medium": [(200_000, 1_000_000, 1000)],
+    "large": [(1_000_000, 5_000_000, 200)],
+}
+WORKERS = [1, 2, 4]
+
+_copied = {}
+
+
+def _copy_graph(edges):
+    _copied["edges"] = edges
+    _copied["view"] = pl6_graph.GraphView(pl6_graph.edge_arrays(edges))
+
+
+def _answer_copied(queries):
+    return _copied["view"].shortest_paths(queries)
+
+
+def worker_memory(pid):
+    # (rss, pss, private) in KiB
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return fields["Rss"], fields["Pss"], fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+
+
+def run_mode(mode, edges, store, queries, workers):
+    chunks = [queries[i:i + pl6_graph.QUERIES_PER_TASK] for i in range(0, len(queries), pl6_graph.QUERIES_PER_TASK)]
+    start = time.perf_counter()
+    if mode == "shared":
+        pool = pl6_graph.QueryPool(store, workers)
+        executor = pool._pool
+        paths = pool.shortest_paths(queries)
+    else:
+        executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=_copy_graph, initargs=(edges,))
+        paths = [path for chunk in executor.map(_answer_copied, chunks) for path in chunk]
+    done = time.perf_counter()
+    try:
+        memory = [worker_memory(pid) for pid in executor._processes]
+    except OSError:
+        memory = []
+    executor.shutdown()
+    # workers start with the first queries, so their startup is part of the time
+    result = {"queries_s": done - start, "queries_per_second": len(queries) / (done - start),
+              "paths": sum(p is not None for p in paths)}
+    if memory:
+        for k, key in enumerate(("rss_kb", "pss_kb", "private_kb")):
+            result[f"worker_{key}"] = sum(m[k] for m in memory) / len(memory)
+    return result, paths
+
+
+def run_case(n_nodes, n_edges, n_queries, worker_counts):
+    routers, edges = instances.network(n_nodes, n_edges)
+    rng = random.Random(0)
+    queries = [(rng.choice(routers), rng.choice(routers)) for _ in range(n_queries)]
+    cases = []
+    with pl6_graph.GraphStore.from_edges(edges) as store:
+        reference = None
+        for workers in worker_counts:
+            for mode in ("shared", "copied"):
+                case = {"name": f"pl6:{mode}", "size": {"routers": n_nodes, "edges": n_edges,
+                                                        "queries": n_queries, "workers": workers}}
+                result, paths = run_mode(mode, edges, store, queries, workers)
+                reference = reference or paths
+                if [p is None for p in paths] != [p is None for p in reference]:
+                    raise AssertionError(f"{mode} with {workers} workers found other paths")
+                case.update(result)
+                case["store_bytes"] = store.nbytes()
+                cases.append(case)
+
+        weights = {edge: w + 1 for edge, w in edges.items()}
+        start = time.perf_counter()
+        handle = store.update(weights)
+        weights_s = time.perf_counter() - start
+        added = dict(weights)
+        added[(routers[0], routers[-1])] = 1
+        start = time.perf_counter()
+        store.update(added)
+        topology_s = time.perf_counter() - start
+        for case in cases:
+            case.update(update_weights_s=weights_s, update_topology_s=topology_s,
+                        version_bytes=store.nbytes())
+        print(f"update: new travel times {weights_s:.3f} s (version {handle.version}), "
+              f"new edge {topology_s:.3f} s, store {store.nbytes() / 2**20:.1f} MiB")
+    return cases
+
+
+def main():
+    p = common.parser("Memory per worker and throughput of pl6 path queries on a shared graph store")
+    p.add_argument("--workers", default=",".join(str(w) for w in WORKERS),
+                   help="comma-separated worker counts")
+    args = p.parse_args()
+    worker_counts = [int(w) for w in args.workers.split(",")]
+
+    cases = []
+    for n_nodes, n_edges, n_queries in SIZES[args.scale]:
+        for case in run_case(n_nodes, n_edges, n_queries, worker_counts):
+            cases.append(case)
+            memory = (f", per worker RSS {case['worker_rss_kb'] / 1024:.0f} MiB, "
+                      f"PSS {case['worker_pss_kb'] / 1024:.0f} MiB, private {case['worker_private_kb'] / 1024:.0f} MiB"
+                      if "worker_rss_kb" in case else "")
+            print(f"{case['name']} {n_nodes} routers {n_edges} edges, {case['size']['workers']} workers: "
+                  f"{case['queries_per_second']:.0f} queries/s"
+                  + memory)
+    common.report("pl6_graph", cases, args)
+
+
+if __name__ == "__main__":
+    main()
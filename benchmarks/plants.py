@@ -0,0 +1,70 @@
+# Multi-plant, multi-SKU production model: build time and size up to 500 SKUs x 10 plants x 52 weeks.
+#
+#   python -m benchmarks.plants [--scale small|medium|large] [--relax]
+#
+# Build, solve and extraction are timed with common.measure_phases; the build time per nonzero
+# should stay flat as the instances grow. Solving needs a license able to hold the model, a
+# size-limited one only gets through the smallest case.
+import gurobipy as gp
+
+from benchmarks import common
+from benchmarks import instances
+
+import pl2_plants
+
+SIZES = {
+    # (SKUs, plants, weeks)
+    "small": [(5, 2, 12), (50, 2, 52)],
+    "medium": [(100, 5, 52), (250, 10, 52)],
+    "large": [(500, 10, 52)],
+}
+
+
+def run_case(size, integer, repeat):
+    data = instances.plants(*size)
+    stats = {}
+
+    def build():
+        m, variables = pl2_plants.build_plants_model(**data, integer=integer)
+        m.update()
+        stats.update(vars=m.NumVars, constrs=m.NumConstrs, nonzeros=m.NumNZs)
+        return m, variables
+
+    def solve(state):
+        state[0].optimize()
+
+    def extract(state):
+        m, variables = state
+        if m.SolCount:
+            pl2_plants.extract_plants_results(m, variables)
+
+    try:
+        case = common.measure_phases(build, solve, extract, repeat)
+    except gp.GurobiError as e:
+        # build only: the license refused to optimize the model
+        case = common.measure_phases(build, lambda state: None, lambda state: None, repeat)
+        case["error"] = str(e)
+    case.update(stats)
+    case["build_per_nonzero_us"] = case["build_s"] / stats["nonzeros"] * 1e6
+    return case
+
+
+def main():
+    p = common.parser("Build and solve the multi-plant production model")
+    p.add_argument("--relax", action="store_true", help="continuous variables instead of integers")
+    args = p.parse_args()
+    common.quiet_gurobi(args.time_limit)
+
+    cases = []
+    for size in SIZES[args.scale]:
+        case = {"name": "plants:lp" if args.relax else "plants:mip",
+                "size": dict(zip(("skus", "plants", "weeks"), size))}
+        case.update(run_case(size, not args.relax, args.repeat))
+        cases.append(case)
+        print(f"{size}: {case['nonzeros']} nonzeros, build {case['build_s']:.3f}s "
+              f"({case['build_per_nonzero_us']:.2f} us/nonzero)" + (f", {case['error']}" if "error" in case else ""))
+    common.report("plants", cases, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Throughput of concurrent solves with and without the core scheduler.
+#
+#   python -m benchmarks.scheduler [--scale small|medium|large] [--clients 8]
+#
+# A mixed workload of pl2, pl4 and pl5 models is solved by several client threads at once, as
+# when planners and batch jobs share a machine. Without the scheduler every solve uses all cores;
+# with it, solves share the cores and queue when they are all busy. Reports jobs per minute,
+# the mean time a job takes from submission to result, and the mean queueing time.
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import common
+from benchmarks import instances
+
+import pl2
+import pl4
+import pl5
+import scheduler
+from instrumentation import SolveMetrics
+
+# (exercise, instance size) jobs of each workload; repeated to fill --jobs
+WORKLOADS = {
+    "small": [("pl5", (200, 100)), ("pl4", 60), ("pl2", 24), ("pl5", (400, 150))],
+    "medium": [("pl5", (1500, 400)), ("pl4", 200), ("pl2", 120), ("pl5", (800, 300))],
+    "large": [("pl5", (20000, 5000)), ("pl4", 2500), ("pl2", 1000), ("pl5", (5000, 1500))],
+}
+
+
+def build(exercise, size):
+    if exercise == "pl2":
+        m, _ = pl2.build_pl2_model(*instances.production(size))
+    elif exercise == "pl4":
+        m, _, _ = pl4.BankBranchOptimization(**instances.bank(size)).build()
+    else:
+        m, _ = pl5.build_antenna_model(*instances.antenna(*size))
+    return m
+
+
+def run_job(job):
+    exercise, size = job
+    submitted = time.perf_counter()
+    model = build(exercise, size)
+    metrics = SolveMetrics(exercise)
+    metrics.optimize(model)
+    model.dispose()
+    queue = metrics.phases.get("queue", {}).get("wall_s", 0.0)
+    return time.perf_counter() - submitted, queue
+
+
+def run_case(jobs, clients, enabled):
+    scheduler.ENABLED = enabled
+    scheduler.configure(scheduler.CORES)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        done = list(pool.map(run_job, jobs))
+    elapsed = time.perf_counter() - start
+    return {"total_s": elapsed, "jobs_per_minute": 60 * len(jobs) / elapsed,
+            "latency_s": sum(d for d, _ in done) / len(done), "queue_s": sum(q for _, q in done) / len(done)}
+
+
+def main():
+    p = common.parser("Throughput of concurrent solves with and without the core scheduler")
+    p.add_argument("--clients", type=int, default=8, help="solves submitted at once")
+    p.add_argument("--jobs", type=int, default=32, help="solves in the workload")
+    args = p.parse_args()
+    common.quiet_gurobi(args.time_limit)
+
+    workload = WORKLOADS[args.scale]
+    jobs = [workload[k % len(workload)] for k in range(args.jobs)]
+    cases = []
+    for enabled in (False, True):
+        case = {"name": "scheduler:" + ("on" if enabled else "off"),
+                "size": {"jobs": len(jobs), "clients": args.clients, "cores": scheduler.CORES}}
+        try:
+            case.update(run_case(jobs, args.clients, enabled))
+        except Exception as e:
+            case["error"] = str(e)
+            print(f"{case['name']}: {e}")
+            continue
+        cases.append(case)
+        print(f"{case['name']}: {case['jobs_per_minute']:.0f} jobs/min, latency {case['latency_s']:.3f}s, "
+              f"queued {case['queue_s']:.3f}s on {scheduler.CORES} cores (load average {os.getloadavg()[0]:.1f})")
+    common.report("scheduler", cases, args)
+
+
+if __name__ == "__main__":
+    main()
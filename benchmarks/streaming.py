@@ -0,0 +1,143 @@
+# Peak memory of the streaming pl5/pl6 model builders against the expression-based ones.
+#
+#   python -m benchmarks.streaming [--scale small|medium|large]
+#
+# Every measurement runs in a fresh process, so its max RSS is its own. Coverage pairs and arcs
+# are generated chunk by chunk, as a loader reading them from disk would. Each case reports the
+# build time, the Python peak (tracemalloc) and the process max RSS of:
+#   expressions  pl5.build_antenna_model / pl6.NetworkTemplate on in-memory dicts;
+#   csr          streaming.antenna_model, fed to Gurobi in CSR row slices (pl5);
+#   file         streaming.write_antenna_lp / write_network_mps, written straight to disk.
+# The file writer runs with two chunk sizes: its peak follows the chunk, not the instance.
+import multiprocessing
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks import common
+
+SIZES = {
+    # (pl5 sites, zones, sites per zone), (pl6 nodes, arcs)
+    "small": [((20_000, 20_000, 10), (20_000, 100_000))],
+    "medium": [((200_000, 200_000, 10), (200_000, 1_000_000))],
+    "large": [((1_000_000, 1_000_000, 10), (1_000_000, 5_000_000))],
+}
+CHUNKS = [100_000, 1_000_000]
+# Expression builds above this many nonzeros take minutes; they are skipped
+MAX_EXPRESSION_NONZEROS = 2_000_000
+
+
+def coverage_stream(n_sites, n_zones, per_zone, chunk, seed=0):
+    rng = np.random.default_rng(seed)
+    zones_per_chunk = max(1, chunk // per_zone)
+    for first in range(0, n_zones, zones_per_chunk):
+        count = min(zones_per_chunk, n_zones - first)
+        yield (np.repeat(np.arange(first, first + count), per_zone),
+               np.sort(rng.integers(0, n_sites, (count, per_zone)), axis=1).reshape(-1))
+
+
+def arc_stream(n_nodes, n_arcs, chunk, seed=0):
+    # a chain through every node keeps node 0 -> node n-1 reachable
+    rng = np.random.default_rng(seed)
+    chain = n_nodes - 1
+    for first in range(0, n_arcs, chunk):
+        count = min(chunk, n_arcs - first)
+        index = np.arange(first, first + count)
+        tails = np.where(index < chain, index, rng.integers(0, n_nodes, count))
+        heads = np.where(index < chain, index + 1, rng.integers(0, n_nodes, count))
+        yield tails, heads, rng.integers(1, 20, count).astype(float)
+
+
+def build(kind, exercise, size, chunk, path):
+    import streaming
+    streaming.CHUNK_NONZEROS = chunk
+    if exercise == "pl5":
+        n_sites, n_zones, per_zone = size
+        if kind == "file":
+            streaming.write_antenna_lp(path, n_sites, n_zones, coverage_stream(*size, chunk))
+        elif kind == "csr":
+            model, _ = streaming.antenna_model(n_sites, n_zones, coverage_stream(*size, chunk))
+            model.update()
+            model.dispose()
+        else:
+            import pl5
+            coverage = {}
+            for zones, sites in coverage_stream(*size, chunk):
+                for k, row in zip(zones[::per_zone].tolist(), sites.reshape(-1, per_zone).tolist()):
+                    coverage[f"zone{k}"] = row
+            model, _ = pl5.build_antenna_model(n_sites, coverage)
+            model.update()
+            model.dispose()
+    else:
+        n_nodes, n_arcs = size
+        if kind == "file":
+            streaming.write_network_mps(path, n_nodes, arc_stream(n_nodes, n_arcs, chunk), 0, n_nodes - 1)
+        else:
+            import pl6
+            edges = {}
+            for tails, heads, weights in arc_stream(n_nodes, n_arcs, chunk):
+                edges.update(zip(zip(tails.tolist(), heads.tolist()), weights.tolist()))
+            pl6.NetworkTemplate(tuple(edges)).dispose()
+
+
+def measure(kind, exercise, size, chunk, queue):
+    # One timed build, then one under tracemalloc (which slows allocations down) for the peak
+    fd, path = tempfile.mkstemp(suffix=".lp" if exercise == "pl5" else ".mps")
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        build(kind, exercise, size, chunk, path)
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        build(kind, exercise, size, chunk, path)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        queue.put({"build_s": elapsed, "python_peak_bytes": peak, "max_rss_kb": common.max_rss_kb(),
+                   "file_bytes": os.path.getsize(path) if kind == "file" else None})
+    except Exception as e:
+        queue.put({"error": str(e)})
+    finally:
+        os.remove(path)
+
+
+def run(kind, exercise, size, chunk):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=measure, args=(kind, exercise, size, chunk, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    p = common.parser("Peak memory of streaming and expression-based pl5/pl6 model builds")
+    args = p.parse_args()
+    common.quiet_gurobi(args.time_limit)
+
+    cases = []
+    for pl5_size, pl6_size in SIZES[args.scale]:
+        runs = [("pl5", pl5_size, pl5_size[1] * pl5_size[2]), ("pl6", pl6_size, 2 * pl6_size[1])]
+        for exercise, size, nonzeros in runs:
+            kinds = [("file", chunk) for chunk in CHUNKS] + ([("csr", CHUNKS[-1])] if exercise == "pl5" else [])
+            if nonzeros <= MAX_EXPRESSION_NONZEROS:
+                kinds.append(("expressions", CHUNKS[-1]))
+            for kind, chunk in kinds:
+                case = {"name": f"{exercise}:{kind}", "size": {"instance": list(size), "nonzeros": nonzeros,
+                                                                 "chunk": chunk}}
+                case.update(run(kind, exercise, size, chunk))
+                cases.append(case)
+                if "error" in case:
+                    print(f"{case['name']} {size}: {case['error']}")
+                    continue
+                print(f"{case['name']} {size} chunk {chunk}: {case['build_s']:.2f}s, "
+                      f"python peak {case['python_peak_bytes'] / 2**20:.1f} MiB, "
+                      f"max RSS {case['max_rss_kb'] / 1024:.0f} MiB")
+    common.report("streaming", cases, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Per-solve overhead of rebuilding every model versus patching a cached template.
+#
+#   python -m benchmarks.templates [--scale small|medium] [--solves 20]
+#
+# Each case runs the same sequence of instances (same shape, changing coefficients) through the
+# solve_* entry points with templates off and on, and reports the mean build phase and total time.
+import time
+
+from benchmarks import common
+from benchmarks import instances
+
+import pl1
+import pl2
+import pl3
+import pl4
+import pl6
+import templates
+from instrumentation import SolveMetrics
+
+SIZES = {
+    "small": {"pl1": [50], "pl2": [24], "pl3": [28], "pl4": [100], "pl6": [(100, 400)]},
+    "medium": {"pl1": [1500], "pl2": [300], "pl3": [400], "pl4": [100], "pl6": [(500, 1900)]},
+    "large": {"pl1": [100000], "pl2": [5000], "pl3": [5000], "pl4": [2500],
+              "pl6": [(20000, 100000)]},
+}
+
+
+def solver(name, size, k):
+    # Returns a function solving the k-th instance of the sequence with the given metrics
+    if name == "pl1":
+        d = instances.agriculture(size, seed=k)
+        return lambda metrics: pl1.solve_agriculture(d['cultures'], d['values'], d['irrigation_water'],
+                                                     d['machine_hours'], d['labor'], d['max_hectares'],
+                                                     metrics=metrics)
+    if name == "pl2":
+        args = instances.production(size, seed=k)
+        return lambda metrics: pl2.solve_pl2(*args, metrics=metrics)
+    if name == "pl3":
+        jours = instances.staffing(size, seed=k)
+        return lambda metrics: pl3.solve_pl3(jours, metrics=metrics)
+    if name == "pl4":
+        data = instances.bank(size)
+        data['budget'] += k
+        data['branch_cost'] += k % 3
+        problem = pl4.BankBranchOptimization(**data)
+        return lambda metrics: problem.run(metrics)
+    routers, edges = instances.network(*size)
+    edges = {e: 1 + (w * (k + 1)) % 17 for e, w in edges.items()}
+    return lambda metrics: pl6.solve_network(edges, routers[k % len(routers)], routers[-1], metrics=metrics)
+
+
+def run_sequence(name, size, solves):
+    build = []
+    total = []
+    for k in range(solves):
+        solve = solver(name, size, k)
+        metrics = SolveMetrics(name)
+        start = time.perf_counter()
+        solve(metrics)
+        total.append(time.perf_counter() - start)
+        build.append(metrics.phases["build"]["wall_s"])
+    # the first solve of a template pays for compiling it
+    return {"first_build_s": build[0], "build_s": sum(build[1:]) / max(1, solves - 1),
+            "total_s": sum(total[1:]) / max(1, solves - 1)}
+
+
+def main():
+    p = common.parser("Compare rebuilt models with patched templates")
+    p.add_argument("--solves", type=int, default=20, help="instances solved per sequence")
+    args = p.parse_args()
+    common.quiet_gurobi(args.time_limit)
+
+    cases = []
+    for name in sorted(SIZES[args.scale]):
+        for size in SIZES[args.scale][name]:
+            for enabled in (False, True):
+                templates.clear()
+                templates.ENABLED = enabled
+                case = {"name": f"{name}:{'template' if enabled else 'rebuild'}", "size": {"n": size}}
+                case.update(run_sequence(name, size, args.solves))
+                cases.append(case)
+            rebuild, template = cases[-2], cases[-1]
+            print(f"{name} {size}: build per solve {rebuild['build_s'] * 1e3:.3f} ms -> "
+                  f"{template['build_s'] * 1e3:.3f} ms, total {rebuild['total_s'] * 1e3:.3f} ms -> "
+                  f"{template['total_s'] * 1e3:.3f} ms")
+    common.report("templates", cases, args)
+
+
+if __name__ == "__main__":
+    main()
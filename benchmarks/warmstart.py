@@ -0,0 +1,164 @@
+# Time to first incumbent and to optimality of pl4/pl5 solves with and without the warm-start library.
+#
+#   python -m benchmarks.warmstart [--scale small|medium|large] [--changes 0.02]
+#
+# Each case solves a base instance once to store its solution in a fresh library, then solves a
+# similar instance (the same map after an edit: a few neighbour pairs gone and populations moved
+# for pl4, a few sites added for pl5) cold, without the library, and warm, started from the
+# repaired stored solution. The library is restored before every warm solve so that it never
+# holds the similar instance itself. Reports the time and objective of the first incumbent, the
+# time the final incumbent was found, the solve time (to proven optimality) and the objective;
+# the first incumbent of a warm solve is the repaired start.
+import json
+import os
+import random
+import statistics
+import tempfile
+
+from gurobipy import GRB
+
+from benchmarks import common
+from benchmarks import instances
+
+import pl4
+import pl5
+import templates
+import warmstart
+from instrumentation import SolveMetrics
+
+SIZES = {
+    # pl4 regions, pl5 (sites, zones)
+    "small": [("pl4", 300), ("pl5", (600, 250))],
+    "medium": [("pl4", 600), ("pl5", (1500, 500))],
+    "large": [("pl4", 5000), ("pl5", (20000, 5000))],
+}
+
+
+class IncumbentMetrics(SolveMetrics):
+    # Also records (time, objective) of every incumbent; the first one is the MIP start when it is accepted
+    def callback(self):
+        record = super().callback()
+        self.incumbents = []
+
+        def incumbent(model, where):
+            record(model, where)
+            if where == GRB.Callback.MIPSOL:
+                self.incumbents.append((model.cbGet(GRB.Callback.RUNTIME), model.cbGet(GRB.Callback.MIPSOL_OBJ)))
+
+        return incumbent
+
+
+def similar_bank(kwargs, changes, seed):
+    # The same regions with a share of the neighbour pairs removed and populations moved by up to 10%
+    rng = random.Random(seed)
+    adjacency = [list(row) for row in kwargs["adjacency_matrix"]]
+    pairs = pl4.neighbor_pairs(adjacency)
+    for i, j in rng.sample(pairs, max(1, int(changes * len(pairs)))):
+        adjacency[i][j] = adjacency[j][i] = 0
+    populations = [p * rng.uniform(0.9, 1.1) for p in kwargs["populations"]]
+    return dict(kwargs, adjacency_matrix=adjacency, populations=populations)
+
+
+def similar_antenna(num_sites, coverage, changes, seed):
+    # A share of new sites, appended as the GUI does, each covering three zones
+    rng = random.Random(seed)
+    coverage = {zone: list(sites) for zone, sites in coverage.items()}
+    added = max(1, int(changes * num_sites))
+    for site in range(num_sites, num_sites + added):
+        for zone in rng.sample(list(coverage), 3):
+            coverage[zone].append(site)
+    return num_sites + added, coverage
+
+
+def solve(exercise, instance):
+    templates.clear()
+    metrics = IncumbentMetrics(exercise)
+    if exercise == "pl4":
+        pl4.BankBranchOptimization(**instance).run(metrics)
+    else:
+        pl5.solve_antenna(*instance, metrics=metrics)
+    objective = metrics.solve_stats.get("ObjVal")
+    incumbents = getattr(metrics, "incumbents", [])
+    first = incumbents[0] if incumbents else (None, None)
+    # found when the first incumbent as good as the final one came in
+    final = next((t for t, value in incumbents if objective is not None
+                  and abs(value - objective) <= 1e-6 * max(1.0, abs(objective))), None)
+    return {"first_incumbent_s": first[0], "first_objective": first[1], "final_incumbent_s": final,
+            "solve_s": metrics.phases["solve"]["wall_s"], "objective": objective,
+            "status": metrics.solve_stats.get("Status"), "warm_start": metrics.warm_start}
+
+
+def run_case(exercise, size, changes, repeat):
+    if exercise == "pl4":
+        base = instances.bank(size)
+        similar = similar_bank(base, changes, seed=1)
+    else:
+        base = instances.antenna(*size)
+        similar = similar_antenna(*base, changes, seed=1)
+
+    warmstart.ENABLED = True
+    solve(exercise, base)
+    if not os.path.exists(warmstart.LIBRARY_PATH):
+        raise RuntimeError("the base instance was not solved by Gurobi, nothing was stored")
+    with open(warmstart.LIBRARY_PATH) as f:
+        stored = json.load(f)
+
+    runs = {"cold": [], "warm": []}
+    for _ in range(repeat):
+        warmstart.ENABLED = False
+        runs["cold"].append(solve(exercise, similar))
+        warmstart.ENABLED = True
+        with open(warmstart.LIBRARY_PATH, "w") as f:
+            json.dump(stored, f)
+        runs["warm"].append(solve(exercise, similar))
+
+    case = {}
+    for mode, rows in runs.items():
+        for key in ("first_incumbent_s", "final_incumbent_s", "solve_s"):
+            values = [row[key] for row in rows if row[key] is not None]
+            case[f"{mode}_{key}"] = statistics.median(values) if values else None
+        case[f"{mode}_first_objective"] = rows[0]["first_objective"]
+        case[f"{mode}_objective"] = rows[0]["objective"]
+    case["warm_start"] = runs["warm"][0]["warm_start"]
+    return case
+
+
+def main():
+    p = common.parser("Time to first incumbent and optimality with and without the warm-start library")
+    p.add_argument("--changes", type=float, default=0.02,
+                   help="share of the structure edited between the stored and the solved instance")
+    args = p.parse_args()
+    common.quiet_gurobi(args.time_limit)
+
+    fd, warmstart.LIBRARY_PATH = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    cases = []
+    try:
+        for exercise, size in SIZES[args.scale]:
+            case = {"name": f"{exercise}:warmstart", "size": {"instance": size, "changes": args.changes}}
+            if os.path.exists(warmstart.LIBRARY_PATH):
+                os.remove(warmstart.LIBRARY_PATH)
+            try:
+                case.update(run_case(exercise, size, args.changes, args.repeat))
+            except Exception as e:
+                case["error"] = str(e)
+                print(f"{case['name']} {size}: {e}")
+                continue
+            cases.append(case)
+            for mode in ("cold", "warm"):
+                first = case[f"{mode}_first_incumbent_s"]
+                print(f"{case['name']} {size} {mode}: first incumbent "
+                      + (f"{first:.4f}s ({case[f'{mode}_first_objective']:.2f})" if first is not None else "none")
+                      + (f", final incumbent {case[f'{mode}_final_incumbent_s']:.4f}s"
+                         if case[f"{mode}_final_incumbent_s"] is not None else "")
+                      + f", solved in {case[f'{mode}_solve_s']:.4f}s ({case[f'{mode}_objective']})")
+            print(f"  started from {case['warm_start']}")
+    finally:
+        for path in (warmstart.LIBRARY_PATH, warmstart.LIBRARY_PATH + ".lock"):
+            if os.path.exists(path):
+                os.remove(path)
+    common.report("warmstart", cases, args)
+
+
+if __name__ == "__main__":
+    main()
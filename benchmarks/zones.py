@@ -0,0 +1,63 @@
+# Multi-zone agriculture: one monolithic LP versus Dantzig-Wolfe decomposition.
+#
+#   python -m benchmarks.zones [--scale small|medium|large] [--workers 4]
+#
+# Both methods solve the same instances; the case records the time, the objective and, for the
+# decomposition, the iterations and the final Lagrangian gap.
+import time
+
+from benchmarks import common
+from benchmarks import instances
+
+import pl1_zones
+from instrumentation import SolveMetrics
+
+SIZES = {
+    "small": [10, 50],
+    "medium": [100, 300],
+    "large": [1000],
+}
+METHODS = ["monolithic", "dantzig-wolfe"]
+
+
+def run_case(n_zones, method, workers):
+    data = instances.agriculture_zones(n_zones)
+    zones = [pl1_zones.make_zone(d['cultures'], d['values'], d['labor'], d['max_hectares']) for d in data['zones']]
+    metrics = SolveMetrics("pl1_zones")
+    start = time.perf_counter()
+    try:
+        result = pl1_zones.solve_zones(zones, data['irrigation_water'], data['machine_hours'], method, workers,
+                                       metrics)
+    except Exception as e:
+        # a size-limited Gurobi license stops the monolithic model first
+        return {"error": str(e), "total_s": time.perf_counter() - start}
+    case = {"total_s": time.perf_counter() - start, "objective": result['profit'],
+            "phases": {name: t["wall_s"] for name, t in metrics.phases.items()}}
+    if 'bounds' in result:
+        objective, bound = result['bounds'][-1]
+        case.update(iterations=len(result['bounds']), gap=(bound - objective) / max(1.0, abs(objective)),
+                    converged=result['converged'], fallback=metrics.solve_stats["DWFallback"])
+    return case
+
+
+def main():
+    p = common.parser("Compare the monolithic and decomposed multi-zone agriculture models")
+    p.add_argument("--workers", type=int, default=None, help="pricing processes (default: one per CPU)")
+    args = p.parse_args()
+    common.quiet_gurobi(args.time_limit)
+
+    cases = []
+    for n_zones in SIZES[args.scale]:
+        for method in METHODS:
+            case = {"name": f"zones:{method}", "size": {"zones": n_zones}}
+            case.update(run_case(n_zones, method, args.workers))
+            cases.append(case)
+            if "error" in case:
+                print(f"{n_zones} zones, {method}: {case['error']}")
+            else:
+                print(f"{n_zones} zones, {method}: {case['total_s']:.3f}s, objective {case['objective']:.2f}")
+    common.report("zones", cases, args)
+
+
+if __name__ == "__main__":
+    main()
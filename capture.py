@@ -0,0 +1,192 @@
+import json
+import os
+import time
+
+import numpy as np
+
+# Set LP_CAPTURE=<directory> to write every Gurobi model solved through SolveMetrics.optimize to a
+# local corpus, so that a slow production solve can be reproduced away from the GUI. One
+# directory per solve, <corpus>/<exercise>/<time>-<pid>-<n>/, holds:
+#   model.mps    the model as handed to optimize(), written before solving;
+#   params.prm   the parameters it was solved with (stored tuning profile included);
+#   inputs.json  the exercise inputs, in the jobs.py form, when the solve path recorded them;
+#   solve.json   model and solve statistics, written once optimize() returns.
+CAPTURE_DIR = os.environ.get("LP_CAPTURE", "")
+
+_count = 0
+
+
+def enabled():
+    return bool(CAPTURE_DIR)
+
+
+def _plain(value):
+    # JSON form of the inputs; scipy sparse matrices keep their sparsity
+    if hasattr(value, "tocoo"):
+        coo = value.tocoo()
+        return {"sparse": list(coo.shape), "row": coo.row.tolist(), "col": coo.col.tolist(),
+                "data": coo.data.tolist()}
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    return value
+
+
+def restore(value):
+    # Inverse of _plain for the sparse matrices
+    if isinstance(value, dict) and "sparse" in value:
+        from scipy.sparse import coo_matrix
+        return coo_matrix((value["data"], (value["row"], value["col"])), shape=tuple(value["sparse"])).tocsr()
+    if isinstance(value, dict):
+        return {k: restore(v) for k, v in value.items()}
+    return value
+
+
+def start(metrics, model, corpus=None):
+    # Writes the model, its parameters and the inputs; returns the capture directory
+    global _count
+    corpus = corpus or CAPTURE_DIR
+    _count += 1
+    path = os.path.join(corpus, metrics.exercise, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{_count}")
+    os.makedirs(path, exist_ok=True)
+    model.write(os.path.join(path, "model.mps"))
+    model.write(os.path.join(path, "params.prm"))
+    if metrics.inputs is not None:
+        with open(os.path.join(path, "inputs.json"), "w") as f:
+            json.dump(_plain(metrics.inputs), f)
+    return path
+
+
+def finish(metrics, path):
+    with open(os.path.join(path, "solve.json"), "w") as f:
+        json.dump({"exercise": metrics.exercise, "model": metrics.model_stats, "solve": metrics.solve_stats},
+                  f, default=str, indent=2)
+
+
+def read_params(path):
+    # Parameter file (one "Name value" per line, # comments) -> {name: value}
+    params = {}
+    with open(path) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            name, value = line.split()[:2]
+            for kind in (int, float, str):
+                try:
+                    params[name] = kind(value)
+                    break
+                except ValueError:
+                    pass
+    return params
+
+
+def instances(corpus, exercise=None):
+    # Capture directories of the corpus, oldest first, each as a dict of its files
+    found = []
+    exercises = [exercise] if exercise else sorted(os.listdir(corpus)) if os.path.isdir(corpus) else []
+    for name in exercises:
+        root = os.path.join(corpus, name)
+        if not os.path.isdir(root):
+            continue
+        for entry in sorted(os.listdir(root)):
+            path = os.path.join(root, entry)
+            if not os.path.isfile(os.path.join(path, "model.mps")):
+                continue
+            found.append({"exercise": name, "path": path})
+    for instance in found:
+        solve_path = os.path.join(instance["path"], "solve.json")
+        if os.path.isfile(solve_path):
+            with open(solve_path) as f:
+                instance["captured"] = json.load(f)
+    return found
+
+
+def solve_instance(path, params=None, time_limit=None, use_captured_params=True):
+    # Re-solves one captured model headlessly; returns its status, runtime, objective and work
+    import gurobipy as gp
+    model = gp.read(os.path.join(path, "model.mps"))
+    try:
+        model.Params.OutputFlag = 0
+        prm = os.path.join(path, "params.prm")
+        if use_captured_params and os.path.isfile(prm):
+            model.read(prm)
+            model.Params.OutputFlag = 0
+        for name, value in (params or {}).items():
+            model.setParam(name, value)
+        if time_limit is not None:
+            model.Params.TimeLimit = time_limit
+        model.optimize()
+        return {"status": model.Status, "runtime": model.Runtime, "work": model.Work,
+                "objective": model.ObjVal if model.SolCount else None, "vars": model.NumVars}
+    finally:
+        model.dispose()
+
+
+def replay(corpus, exercise=None, params=None, time_limit=None, from_inputs=False):
+    # Re-solves every captured instance, from the MPS file or, with from_inputs, through the
+    # current solve path of the exercise (jobs._solve) on the captured inputs
+    rows = []
+    for instance in instances(corpus, exercise):
+        row = {"exercise": instance["exercise"], "path": instance["path"]}
+        captured = instance.get("captured", {}).get("solve", {})
+        row["captured_runtime"] = captured.get("Runtime")
+        try:
+            if from_inputs:
+                row.update(_replay_inputs(instance))
+            else:
+                row.update(solve_instance(instance["path"], params, time_limit))
+        except Exception as e:
+            row["error"] = str(e)
+        rows.append(row)
+    return rows
+
+
+def _replay_inputs(instance):
+    global CAPTURE_DIR
+    from jobs import _solve
+    inputs_path = os.path.join(instance["path"], "inputs.json")
+    if not os.path.isfile(inputs_path):
+        raise ValueError("No inputs captured for this solve")
+    with open(inputs_path) as f:
+        inputs = restore(json.load(f))
+    # the replayed solve is not captured again
+    corpus, CAPTURE_DIR = CAPTURE_DIR, ""
+    try:
+        started = time.perf_counter()
+        _, metrics = _solve(instance["exercise"], inputs, None)
+    finally:
+        CAPTURE_DIR = corpus
+    solve = metrics["solve"]
+    return {"status": solve.get("Status"), "runtime": time.perf_counter() - started,
+            "objective": solve.get("ObjVal")}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    parser = argparse.ArgumentParser(description="Re-solve a corpus of captured models")
+    parser.add_argument("corpus")
+    parser.add_argument("--exercise")
+    parser.add_argument("--time-limit", type=float)
+    parser.add_argument("--from-inputs", action="store_true",
+                        help="re-run the captured inputs through the exercise instead of the MPS files")
+    args = parser.parse_args()
+    import gurobipy as gp
+    gp.setParam("OutputFlag", 0)
+    # through the module the solve path imports, so that its capture switch is the one turned off
+    from capture import replay
+    for row in replay(args.corpus, args.exercise, time_limit=args.time_limit, from_inputs=args.from_inputs):
+        if "error" in row:
+            print(f"{row['path']}: {row['error']}")
+            continue
+        captured = row["captured_runtime"]
+        print(f"{row['path']}: status {row['status']}, {row['runtime']:.3f}s"
+              + (f" (captured {float(captured):.3f}s)" if captured is not None else "")
+              + f", objective {row['objective']}")
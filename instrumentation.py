@@ -0,0 +1,228 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from gurobipy import GRB
+
+import capture
+import scheduler
+import tuning
+
+# Set LP_PROFILE_BUILD=1 to run every build phase under cProfile
+PROFILE_BUILD = os.environ.get("LP_PROFILE_BUILD", "") not in ("", "0")
+
+# Model attributes read before and after optimize()
+MODEL_STATS = ["NumVars", "NumConstrs", "NumNZs", "NumIntVars", "NumBinVars", "NumQNZs"]
+SOLVE_STATS = ["Status", "Runtime", "NodeCount", "IterCount", "SolCount", "ObjVal", "ObjBound", "MIPGap"]
+
+# Callbacks only reached once presolve is over
+SEARCH_CALLBACKS = (GRB.Callback.SIMPLEX, GRB.Callback.BARRIER, GRB.Callback.MIP, GRB.Callback.MIPSOL,
+                    GRB.Callback.MIPNODE)
+
+# Most recent solves, oldest first
+HISTORY_SIZE = 200
+_history = deque(maxlen=HISTORY_SIZE)
+_solve_counts = {}
+_lock = threading.Lock()
+
+
+class SolveMetrics:
+    def __init__(self, exercise, profile_build=None):
+        self.exercise = exercise
+        self.started = time.time()
+        self.phases = {}
+        self.model_stats = {}
+        self.solve_stats = {}
+        # (seconds since optimize() started, nodes explored, incumbent, best bound, gap)
+        self.gap_trace = []
+        self.presolve_s = None
+        self.profile_build = PROFILE_BUILD if profile_build is None else profile_build
+        self.build_profile = None
+        # Exercise inputs in the jobs.py form, written next to captured models (see capture.py)
+        self.inputs = None
+        # Stored tuning profile the solve ran with (see tuning.py)
+        self.tuning_profile = {}
+        # Stored solution the solve was started from (see warmstart.py)
+        self.warm_start = None
+
+    @contextmanager
+    def phase(self, name):
+        profiler = None
+        if name == "build" and self.profile_build:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield self
+        finally:
+            entry = self.phases.setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0})
+            entry["wall_s"] += time.perf_counter() - wall
+            entry["cpu_s"] += time.process_time() - cpu
+            if profiler is not None:
+                profiler.disable()
+                out = io.StringIO()
+                pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(30)
+                self.build_profile = out.getvalue()
+
+    def record_model(self, model):
+        # Pending modifications are not counted until the model is updated
+        model.update()
+        for attr in MODEL_STATS:
+            try:
+                self.model_stats[attr] = model.getAttr(attr)
+            except Exception:
+                pass
+
+    def callback(self):
+        # Records presolve time and the MIP gap each time the incumbent or the bound moves
+        last = [None, None]
+
+        def record(model, where):
+            if where not in SEARCH_CALLBACKS:
+                return
+            if self.presolve_s is None:
+                self.presolve_s = model.cbGet(GRB.Callback.RUNTIME)
+            if where != GRB.Callback.MIP:
+                return
+            best = model.cbGet(GRB.Callback.MIP_OBJBST)
+            bound = model.cbGet(GRB.Callback.MIP_OBJBND)
+            if [best, bound] == last:
+                return
+            last[:] = [best, bound]
+            gap = abs(best - bound) / abs(best) if 0 < abs(best) < GRB.INFINITY else None
+            self.gap_trace.append((model.cbGet(GRB.Callback.RUNTIME), model.cbGet(GRB.Callback.MIP_NODCNT),
+                                   best, bound, gap))
+
+        return record
+
+    def optimize(self, model, callback=None):
+        # Drop-in for model.optimize() that fills the model statistics, the solve phase and the gap trace.
+        # An extra callback is chained after the recording one. The stored tuning profile of the
+        # exercise and size class is applied first, after the model is captured when LP_CAPTURE is set.
+        # The solve waits for cores and gets its Threads from the scheduler.
+        self.record_model(model)
+        # captured before the profile, so that re-tuning measures candidates against the caller's
+        # own parameters and not on top of the profile it is about to replace
+        captured = capture.start(self, model) if capture.enabled() else None
+        self.tuning_profile = tuning.apply(self.exercise, model, self.model_stats.get("NumVars", 0))
+        record = self.callback()
+        if callback is not None:
+            def chained(m, where):
+                record(m, where)
+                callback(m, where)
+        else:
+            chained = record
+        # cores are shared with the other solves of the process (see scheduler.py)
+        with scheduler.solve_slot(model, self.model_stats, self), self.phase("solve"):
+            model.optimize(chained)
+        for attr in SOLVE_STATS:
+            try:
+                self.solve_stats[attr] = model.getAttr(attr)
+            except Exception:
+                pass
+        if self.presolve_s is not None:
+            self.phases["presolve"] = {"wall_s": self.presolve_s, "cpu_s": None}
+        if captured is not None:
+            capture.finish(self, captured)
+
+    def finish(self):
+        with _lock:
+            _history.append(self)
+            _solve_counts[self.exercise] = _solve_counts.get(self.exercise, 0) + 1
+        return self
+
+    def to_dict(self):
+        return {
+            "exercise": self.exercise,
+            "started": self.started,
+            "phases": self.phases,
+            "model": self.model_stats,
+            "solve": self.solve_stats,
+            "gap_trace": [dict(zip(("time_s", "nodes", "incumbent", "bound", "gap"), point))
+                          for point in self.gap_trace],
+            "build_profile": self.build_profile,
+            "tuning_profile": self.tuning_profile,
+            "warm_start": self.warm_start,
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), default=_json_default)
+
+    def summary(self):
+        parts = [f"{name}={t['wall_s']:.4f}s" for name, t in self.phases.items()]
+        parts += [f"{attr}={self.model_stats[attr]}" for attr in ("NumVars", "NumConstrs", "NumNZs")
+                  if attr in self.model_stats]
+        if "NodeCount" in self.solve_stats:
+            parts.append(f"nodes={int(self.solve_stats['NodeCount'])}")
+        return f"[{self.exercise}] " + ", ".join(parts)
+
+
+def _json_default(value):
+    # GRB.INFINITY and NaN are not valid JSON
+    return str(value)
+
+
+def recent(exercise=None):
+    with _lock:
+        return [m for m in _history if exercise is None or m.exercise == exercise]
+
+
+def last(exercise):
+    found = recent(exercise)
+    return found[-1] if found else None
+
+
+def export_json(path=None):
+    payload = json.dumps([m.to_dict() for m in recent()], default=_json_default, indent=2)
+    if path is not None:
+        with open(path, "w") as f:
+            f.write(payload)
+    return payload
+
+
+def export_prometheus():
+    # Gauges describe the latest solve of each exercise, lp_solves_total counts all of them
+    latest = {}
+    for metrics in recent():
+        latest[metrics.exercise] = metrics
+    lines = [
+        "# HELP lp_solves_total Solves recorded per exercise.",
+        "# TYPE lp_solves_total counter",
+    ]
+    with _lock:
+        counts = dict(_solve_counts)
+    for exercise, count in sorted(counts.items()):
+        lines.append(f'lp_solves_total{{exercise="{exercise}"}} {count}')
+
+    lines += [
+        "# HELP lp_phase_wall_seconds Wall time of each phase of the latest solve.",
+        "# TYPE lp_phase_wall_seconds gauge",
+    ]
+    for exercise, metrics in sorted(latest.items()):
+        for phase, t in metrics.phases.items():
+            lines.append(f'lp_phase_wall_seconds{{exercise="{exercise}",phase="{phase}"}} {t["wall_s"]}')
+    lines += [
+        "# HELP lp_phase_cpu_seconds CPU time of each phase of the latest solve.",
+        "# TYPE lp_phase_cpu_seconds gauge",
+    ]
+    for exercise, metrics in sorted(latest.items()):
+        for phase, t in metrics.phases.items():
+            if t["cpu_s"] is not None:
+                lines.append(f'lp_phase_cpu_seconds{{exercise="{exercise}",phase="{phase}"}} {t["cpu_s"]}')
+
+    gauges = [("lp_model_vars", "NumVars", "model_stats"), ("lp_model_constraints", "NumConstrs", "model_stats"),
+              ("lp_model_nonzeros", "NumNZs", "model_stats"), ("lp_solve_nodes", "NodeCount", "solve_stats"),
+              ("lp_solve_mip_gap", "MIPGap", "solve_stats")]
+    for metric, attr, source in gauges:
+        lines.append(f"# TYPE {metric} gauge")
+        for exercise, metrics in sorted(latest.items()):
+            value = getattr(metrics, source).get(attr)
+            if value is not None:
+                lines.append(f'{metric}{{exercise="{exercise}"}} {value}')
+    return "\n".join(lines) + "\n"
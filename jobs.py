@@ -0,0 +1,415 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from urllib.parse import parse_qs, urlparse
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+DEFAULT_DB = os.environ.get("LP_JOBS_DB", "jobs.sqlite")
+# One worker process per Gurobi license seat
+DEFAULT_SEATS = int(os.environ.get("LP_LICENSE_SEATS", "2"))
+DEFAULT_PORT = 8765
+# LP_JOBS=1 makes the windows that support it (pl3) solve through the queue of their process
+ENABLED = os.environ.get("LP_JOBS", "") not in ("", "0")
+
+EXERCISES = ("pl1", "pl2", "pl3", "pl4", "pl5", "pl6")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+# ===================WORKER (runs in the process pool)
+
+def _solve(exercise, inputs, backend):
+    # Maps a JSON job onto the solve_* entry point of the exercise and returns JSON-ready results
+    from instrumentation import SolveMetrics
+
+    metrics = SolveMetrics(exercise)
+    if exercise == "pl1":
+        import pl1
+        hectares, total, profit = pl1.solve_agriculture(backend=backend, metrics=metrics, **inputs)
+        result = {"hectares": hectares, "total": total, "profit": profit}
+    elif exercise == "pl2":
+        import pl2
+        result = pl2.solve_pl2(backend=backend, metrics=metrics, **inputs)
+    elif exercise == "pl3":
+        import pl3
+        planning, total = pl3.solve_pl3(backend=backend, metrics=metrics, **inputs)
+        result = {"planning": planning, "total": total}
+    elif exercise == "pl4":
+        import pl4
+        branches, dabs = pl4.BankBranchOptimization(**inputs).run(metrics, backend)
+        result = {"branches": list(branches), "dabs": list(dabs)}
+    elif exercise == "pl5":
+        import pl5
+        result = pl5.solve_antenna(inputs["num_sites"], inputs["coverage"], backend, metrics)
+    elif exercise == "pl6":
+        import pl6
+        # JSON has no tuple keys: edges come as [src, dest, weight] triples
+        edges = {(src, dest): weight for src, dest, weight in inputs["edges"]}
+        path = pl6.solve_network(edges, inputs["src"], inputs["dest"], backend, metrics)
+        result = None if path is None else [list(e) for e in path]
+    else:
+        raise ValueError(f"Unknown exercise {exercise!r}")
+    return result, metrics.to_dict()
+
+
+def execute(exercise, inputs, backend=None):
+    import gurobipy as gp
+    gp.setParam("OutputFlag", 0)
+    result, metrics = _solve(exercise, inputs, backend)
+    return json.dumps(result, default=str), json.dumps(metrics, default=str)
+
+
+# ===================STORE
+
+def job_key(exercise, inputs, backend=None):
+    # Identical inputs give identical ids, which is what deduplicates submissions
+    canonical = json.dumps([exercise, inputs, backend], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:32]
+
+
+class ResultStore:
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                exercise TEXT NOT NULL,
+                backend TEXT,
+                inputs TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                metrics TEXT,
+                submitted_at REAL,
+                started_at REAL,
+                finished_at REAL
+            )""")
+        self._db.commit()
+
+    def insert(self, job_id, exercise, inputs, backend):
+        with self._lock:
+            self._db.execute("INSERT OR IGNORE INTO jobs (id, exercise, backend, inputs, status, submitted_at) "
+                             "VALUES (?, ?, ?, ?, ?, ?)",
+                             (job_id, exercise, backend, json.dumps(inputs, default=str), QUEUED, time.time()))
+            self._db.commit()
+
+    def requeue(self, job_id):
+        with self._lock:
+            self._db.execute("UPDATE jobs SET status = ?, result = NULL, error = NULL, submitted_at = ?, "
+                             "started_at = NULL, finished_at = NULL WHERE id = ?", (QUEUED, time.time(), job_id))
+            self._db.commit()
+
+    def update(self, job_id, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+            self._db.commit()
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_dict(row) if row else None
+
+    def list(self, status=None, limit=100):
+        query = "SELECT * FROM jobs"
+        params = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY submitted_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [_row_dict(row) for row in rows]
+
+    def unfinished(self):
+        with self._lock:
+            rows = self._db.execute("SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY submitted_at",
+                                    (QUEUED, RUNNING)).fetchall()
+        return [_row_dict(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def _row_dict(row):
+    job = dict(row)
+    for name in ("inputs", "result", "metrics"):
+        if job[name] is not None:
+            job[name] = json.loads(job[name])
+    return job
+
+
+# ===================QUEUE
+
+class JobQueue:
+    # Solve jobs on a process pool sized to the license seats, driven by an asyncio loop running
+    # in a background thread so Qt windows and the HTTP handlers can use it from their own threads.
+    def __init__(self, store=None, seats=DEFAULT_SEATS):
+        self.store = store if store is not None else ResultStore()
+        self.seats = seats
+        self.loop = None
+        self._thread = None
+        self._pool = None
+        self._tasks = {}
+        self._subscribers = {}
+        self._ready = threading.Event()
+
+    def start(self):
+        # each worker solves on its share of the cores
+        import scheduler
+        self._pool = ProcessPoolExecutor(self.seats, mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=scheduler.configure,
+                                         initargs=(scheduler.share_per_worker(self.seats),))
+        self._thread = threading.Thread(target=self._run_loop, name="lp-jobs", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        # Jobs left queued or running by a previous process are run again
+        for job in self.store.unfinished():
+            self.store.requeue(job["id"])
+            self._call(self._schedule, job["id"], job["exercise"], job["inputs"], job["backend"])
+        return self
+
+    def stop(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+            self.loop = None
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def _run_loop(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._seats = asyncio.Semaphore(self.seats)
+        self._ready.set()
+        self.loop.run_forever()
+
+    def _call(self, fn, *args):
+        # Runs fn on the loop thread and returns its result to the calling thread
+        return asyncio.run_coroutine_threadsafe(_as_coroutine(fn, *args), self.loop).result()
+
+    def submit(self, exercise, inputs, backend=None):
+        # Returns the job id; identical submissions share one job and its stored result
+        if exercise not in EXERCISES:
+            raise ValueError(f"Unknown exercise {exercise!r}, expected one of {list(EXERCISES)}")
+        if not isinstance(inputs, dict):
+            raise ValueError("inputs must be an object of solve arguments")
+        job_id = job_key(exercise, inputs, backend)
+        job = self.store.get(job_id)
+        if job is None:
+            self.store.insert(job_id, exercise, inputs, backend)
+        elif job["status"] == FAILED:
+            self.store.requeue(job_id)
+        elif job["status"] == DONE:
+            return job_id
+        # no-op when the job is already scheduled in this process
+        self._call(self._schedule, job_id, exercise, inputs, backend)
+        return job_id
+
+    def _schedule(self, job_id, exercise, inputs, backend):
+        # the status is read again here, on the loop thread: a job that finished after submit()
+        # read it is no longer in _tasks and must not run a second time
+        job = self.store.get(job_id)
+        if job is None or job["status"] not in (QUEUED, RUNNING):
+            return
+        if job_id not in self._tasks:
+            self._tasks[job_id] = self.loop.create_task(self._run(job_id, exercise, inputs, backend))
+
+    async def _run(self, job_id, exercise, inputs, backend):
+        async with self._seats:
+            self.store.update(job_id, status=RUNNING, started_at=time.time())
+            try:
+                result, metrics = await self.loop.run_in_executor(self._pool, execute, exercise, inputs, backend)
+                self.store.update(job_id, status=DONE, result=result, metrics=metrics, finished_at=time.time())
+            except Exception as e:
+                self.store.update(job_id, status=FAILED, error=f"{type(e).__name__}: {e}", finished_at=time.time())
+        del self._tasks[job_id]
+        job = self.store.get(job_id)
+        for callback in self._subscribers.pop(job_id, []):
+            callback(job)
+
+    def status(self, job_id):
+        return self.store.get(job_id)
+
+    def subscribe(self, job_id, callback):
+        # callback(job) is called once the job is finished, on the queue thread
+        # (immediately, on the caller's thread, if it already is)
+        def add():
+            job = self.store.get(job_id)
+            if job is not None and job["status"] in (DONE, FAILED):
+                return job
+            self._subscribers.setdefault(job_id, []).append(callback)
+            return None
+
+        job = self._call(add)
+        if job is not None:
+            callback(job)
+
+    def unsubscribe(self, job_id, callback):
+        def remove():
+            callbacks = self._subscribers.get(job_id, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+            if not callbacks:
+                self._subscribers.pop(job_id, None)
+
+        self._call(remove)
+
+    def wait(self, job_id, timeout=None):
+        # None for an unknown job, which would otherwise leave a subscriber that is never called
+        if self.store.get(job_id) is None:
+            return None
+        finished = threading.Event()
+        callback = lambda job: finished.set()
+        self.subscribe(job_id, callback)
+        if not finished.wait(timeout):
+            self.unsubscribe(job_id, callback)
+        return self.store.get(job_id)
+
+
+async def _as_coroutine(fn, *args):
+    return fn(*args)
+
+
+class JobWatcher(QObject):
+    # Delivers job completion to a Qt window: connect to finished, then watch(job_id).
+    # The signal crosses from the queue thread to the GUI thread through Qt's event loop.
+    finished = pyqtSignal(dict)
+
+    def __init__(self, queue, parent=None):
+        super().__init__(parent)
+        self.queue = queue
+
+    def watch(self, job_id):
+        self.queue.subscribe(job_id, self.finished.emit)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_queue():
+    # The queue of this process, started on first use; the windows submit to it
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = JobQueue().start()
+        return _shared
+
+
+# ===================HTTP API
+#   POST /jobs            {"exercise": "pl3", "inputs": {...}, "backend": null} -> {"id": ...}
+#   GET  /jobs            latest jobs, ?status=done
+#   GET  /jobs/<id>       job row, ?wait=<seconds> blocks until it is finished
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    queue = None
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            return self._send(404, {"error": "not found"})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("the body must be a JSON object")
+            job_id = self.queue.submit(body["exercise"], body["inputs"], body.get("backend"))
+        except KeyError as e:
+            return self._send(400, {"error": f"missing field {e}"})
+        except (TypeError, ValueError) as e:
+            return self._send(400, {"error": str(e)})
+        self._send(202, {"id": job_id})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = [p for p in url.path.split("/") if p]
+        if parts == ["jobs"]:
+            return self._send(200, self.queue.store.list(query.get("status", [None])[0]))
+        if len(parts) == 2 and parts[0] == "jobs":
+            if "wait" in query:
+                try:
+                    timeout = float(query["wait"][0])
+                except ValueError:
+                    return self._send(400, {"error": f"wait must be a number of seconds, not {query['wait'][0]!r}"})
+                job = self.queue.wait(parts[1], timeout)
+            else:
+                job = self.queue.status(parts[1])
+            return self._send(200, job) if job else self._send(404, {"error": "unknown job"})
+        self._send(404, {"error": "not found"})
+
+    def _send(self, code, payload):
+        data = json.dumps(payload, default=str).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self):
+        # Unix socket clients have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) and self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        pass
+
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("unix", 0)
+
+
+def make_server(queue, port=DEFAULT_PORT, unix_path=None):
+    handler = type("BoundJobRequestHandler", (JobRequestHandler,), {"queue": queue})
+    if unix_path:
+        if os.path.exists(unix_path):
+            os.unlink(unix_path)
+        return UnixHTTPServer(unix_path, handler)
+    # Local machine only
+    return ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+
+def serve(db=DEFAULT_DB, seats=DEFAULT_SEATS, port=DEFAULT_PORT, unix_path=None):
+    queue = JobQueue(ResultStore(db), seats).start()
+    server = make_server(queue, port, unix_path)
+    print(f"serving jobs on {unix_path or f'http://127.0.0.1:{port}'} with {seats} seats, results in {db}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        queue.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local solve job queue for the LP exercises")
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--seats", type=int, default=DEFAULT_SEATS)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="listen on this Unix socket instead of TCP")
+    args = parser.parse_args()
+    serve(args.db, args.seats, args.port, args.unix)
@@ -1,11 +1,265 @@
+import csv
+import os
 import sys
 from gurobipy import Model, GRB, quicksum
-from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget,
-                             QGridLayout, QPushButton, QLineEdit, QLabel, QMessageBox)
+import numpy as np
+import backends
+import results
+import templates
+from backends import LinearProgram, MAXIMIZE
+from instrumentation import SolveMetrics
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QGridLayout, QPushButton, QLineEdit, QLabel,
+                             QMessageBox, QTableView, QFileDialog, QHeaderView, QCheckBox)
+
+# Costs that do not depend on the crop table
+MACHINE_HOUR_COST = 30
+WATER_COST = 0.1
+MAX_HECTARES = 1000
+
+# Columns of a crop table: one row per crop, one column per parameter
+PARAMS = ['yield', 'price', 'labor', 'machine_time', 'water', 'labor_cost', 'fixed_cost']
+RESOURCE_COLUMNS = [PARAMS.index('labor'), PARAMS.index('machine_time'), PARAMS.index('water')]
+
+
+def crop_margin(v):
+    # Profit per hectare of a crop
+    return (v['yield'] * v['price'] - v['labor'] * v['labor_cost'] - v['machine_time'] * MACHINE_HOUR_COST -
+            v['water'] * WATER_COST - v['fixed_cost'])
+
+
+def crop_margins(table):
+    # crop_margin for every row of a crop table at once
+    v = {param: table[:, i] for i, param in enumerate(PARAMS)}
+    return crop_margin(v)
+
+
+def crop_table(cultures, values):
+    # values[cult][param] -> (crops x PARAMS) array
+    return np.array([[values[cult][param] for param in PARAMS] for cult in cultures], dtype=float).reshape(-1, len(PARAMS))
+
+
+def table_values(cultures, table):
+    # Inverse of crop_table, for the dict-based model builders
+    return {cult: dict(zip(PARAMS, row.tolist())) for cult, row in zip(cultures, table)}
+
+
+def check_crop_table(cultures, table):
+    # Same rules as the cell editor: finite, non-negative numbers and one row per crop
+    table = np.asarray(table, dtype=float)
+    if table.ndim != 2 or table.shape != (len(cultures), len(PARAMS)):
+        raise ValueError(f"Expected {len(cultures)} rows of {len(PARAMS)} parameters, got shape {table.shape}")
+    bad = np.argwhere(~np.isfinite(table) | (table < 0))
+    if len(bad):
+        r, c = bad[0]
+        raise ValueError(f"Value for {PARAMS[c]} in {cultures[r]} must be a non-negative number.")
+    return table
+
+
+def load_crop_table(path):
+    # Reads (cultures, table) from a CSV or Excel file whose first column holds the crop names and
+    # whose header names the PARAMS columns (in any order)
+    if os.path.splitext(path)[1].lower() in ('.xlsx', '.xls'):
+        import pandas as pd
+        frame = pd.read_excel(path)
+        header = [str(c) for c in frame.columns]
+        rows = frame.values.tolist()
+    else:
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            rows = [row for row in reader if row]
+    missing = [param for param in PARAMS if param not in header]
+    if missing:
+        raise ValueError(f"Missing columns in {os.path.basename(path)}: {', '.join(missing)}")
+    order = [header.index(param) for param in PARAMS]
+    cultures = [str(row[0]) for row in rows]
+    try:
+        table = np.array([[float(row[i]) for i in order] for row in rows], dtype=float).reshape(-1, len(PARAMS))
+    except ValueError as e:
+        raise ValueError(f"Non-numeric value in {os.path.basename(path)}: {e}")
+    return cultures, check_crop_table(cultures, table)
+
+
+def save_crop_table(path, cultures, table):
+    if os.path.splitext(path)[1].lower() in ('.xlsx', '.xls'):
+        import pandas as pd
+        frame = pd.DataFrame(table, columns=PARAMS)
+        frame.insert(0, 'culture', cultures)
+        frame.to_excel(path, index=False)
+        return
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['culture'] + PARAMS)
+        for cult, row in zip(cultures, table.tolist()):
+            writer.writerow([cult] + [repr(v) for v in row])
+
+
+def build_agriculture_model(cultures, values, irrigation_water, machine_hours, labor, max_hectares=MAX_HECTARES):
+    # Create a new model
+    m = Model("agriculture")
+
+    # Create variables
+    x = m.addVars(cultures, name="cultures")
+
+    # Set the objective
+    m.setObjective(quicksum(x[cult] * crop_margin(values[cult]) for cult in cultures), GRB.MAXIMIZE)
+
+    # Add constraints
+    m.addConstr(quicksum(x[cult] * values[cult]['labor'] for cult in cultures) <= labor, "Labor")
+    m.addConstr(quicksum(x[cult] * values[cult]['machine_time'] for cult in cultures) <= machine_hours, "MachineHours")
+    m.addConstr(quicksum(x[cult] * values[cult]['water'] for cult in cultures) <= irrigation_water, "IrrigationWater")
+
+    # Additional constraint to limit total hectares
+    m.addConstr(quicksum(x[cult] for cult in cultures) <= max_hectares, "TotalHectares")
+    return m, x
+
+
+def extract_agriculture_results(m, x, cultures):
+    hectares = results.extract(m, {"cultures": x})["cultures"]
+    return {cult: hectares[cult] for cult in cultures}, hectares.total(), m.objVal
+
+
+class AgricultureTemplate(templates.ModelTemplate):
+    # build_agriculture_model compiled once per number of crops; the crop table and the
+    # resource limits are patched in place
+    def build(self):
+        n = self.key
+        self.model = Model("agriculture")
+        self.x = self.model.addMVar(n, name="cultures")
+        self.model.ModelSense = GRB.MAXIMIZE
+        # Labor, MachineHours, IrrigationWater, TotalHectares
+        self.rows = self.model.addMConstr(np.ones((4, n)), self.x, GRB.LESS_EQUAL, np.zeros(4))
+        self.model.update()
+        self.constrs = self.rows.tolist()
+        self.vars = self.x.tolist()
+        self.coeffs = np.ones((len(RESOURCE_COLUMNS), n))
+
+    def patch(self, cultures, table, irrigation_water, machine_hours, labor, max_hectares=MAX_HECTARES):
+        self.cultures = cultures
+        self.x.Obj = crop_margins(table)
+        coeffs = table[:, RESOURCE_COLUMNS].T
+        self.coeffs = templates.change_coeffs(self.model, self.constrs, self.vars, self.coeffs, coeffs)
+        self.rows.RHS = [labor, machine_hours, irrigation_water, max_hectares]
+
+    def results(self):
+        x = results.read_attr(self.model, self.x)
+        return dict(zip(self.cultures, x.tolist())), float(x.sum()), self.model.ObjVal
+
+
+def agriculture_program(cultures, values, irrigation_water, machine_hours, labor, max_hectares=MAX_HECTARES):
+    # Same model as build_agriculture_model for the non-Gurobi backends
+    program = LinearProgram("agriculture", MAXIMIZE)
+    x = {cult: program.add_var(obj=crop_margin(values[cult]), name=f"cultures[{cult}]") for cult in cultures}
+    program.add_constr({x[cult]: values[cult]['labor'] for cult in cultures}, "<=", labor, "Labor")
+    program.add_constr({x[cult]: values[cult]['machine_time'] for cult in cultures}, "<=", machine_hours, "MachineHours")
+    program.add_constr({x[cult]: values[cult]['water'] for cult in cultures}, "<=", irrigation_water, "IrrigationWater")
+    program.add_constr({x[cult]: 1 for cult in cultures}, "<=", max_hectares, "TotalHectares")
+
+    def extract(solution):
+        if not solution.has_values:
+            raise Exception('No optimal solution found')
+        hectares = {cult: float(solution.values[x[cult]]) for cult in cultures}
+        return hectares, sum(hectares.values()), solution.objective
+
+    return program, extract
+
+
+def solve_agriculture(cultures, values, irrigation_water, machine_hours, labor, max_hectares=MAX_HECTARES,
+                      backend=None, metrics=None):
+    # Returns (hectares per crop, total hectares, profit) using the given backend (default: Gurobi)
+    return solve_crop_table(cultures, crop_table(cultures, values), irrigation_water, machine_hours, labor,
+                            max_hectares, backend, metrics)
+
+
+def solve_crop_table(cultures, table, irrigation_water, machine_hours, labor, max_hectares=MAX_HECTARES,
+                     backend=None, metrics=None):
+    # solve_agriculture for a (crops x PARAMS) array, as edited in the crop table
+    if metrics is None:
+        metrics = SolveMetrics("pl1")
+
+    def solve_gurobi():
+        if templates.ENABLED:
+            return templates.solve(AgricultureTemplate, len(cultures), metrics, cultures, table, irrigation_water,
+                                   machine_hours, labor, max_hectares)
+        with metrics.phase("build"):
+            m, x = build_agriculture_model(cultures, table_values(cultures, table), irrigation_water, machine_hours,
+                                           labor, max_hectares)
+        metrics.optimize(m)
+        with metrics.phase("extract"):
+            return extract_agriculture_results(m, x, cultures)
+
+    return backends.run(backend, solve_gurobi, lambda: agriculture_program(
+        cultures, table_values(cultures, table), irrigation_water, machine_hours, labor, max_hectares),
+        metrics)
+
+
+class CropTableModel(QAbstractTableModel):
+    # Editable view over a (crops x PARAMS) array. Only the visible cells are ever rendered, and
+    # each edit is validated on its own: rejected values leave the array untouched.
+    editRejected = pyqtSignal(str)
+
+    def __init__(self, cultures, table, parent=None):
+        super().__init__(parent)
+        self.cultures = list(cultures)
+        self.table = check_crop_table(self.cultures, table).copy()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.cultures)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(PARAMS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return f"{self.table[index.row(), index.column()]:.12g}"
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignRight | Qt.AlignVCenter
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or not index.isValid():
+            return False
+        cult, param = self.cultures[index.row()], PARAMS[index.column()]
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            self.editRejected.emit(f"Value for {param} in {cult} must be a number.")
+            return False
+        if not np.isfinite(number) or number < 0:
+            self.editRejected.emit(f"Value for {param} in {cult} cannot be negative.")
+            return False
+        self.table[index.row(), index.column()] = number
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+        return True
+
+    def flags(self, index):
+        return Qt.ItemIsSelectable | Qt.ItemIsEnabled | Qt.ItemIsEditable
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        return PARAMS[section] if orientation == Qt.Horizontal else self.cultures[section]
+
+    def set_table(self, cultures, table):
+        table = check_crop_table(cultures, table)
+        self.beginResetModel()
+        self.cultures = list(cultures)
+        self.table = table.copy()
+        self.endResetModel()
+
+
+# Fields of the window used by the fixed-charge mode only
+FIXED_CHARGE_FIELDS = ('Minimum area per crop (ha)', 'Maximum area per crop (ha, 0 = none)')
+
 
 class AgriculturalZoneOptimizationUI(QMainWindow):
     def __init__(self):
         super().__init__()
+        # Solver backend name, None for the default one
+        self.backend = None
         self.initUI()
 
     def initUI(self):
@@ -19,10 +273,7 @@ class AgriculturalZoneOptimizationUI(QMainWindow):
         self.gridLayout = QGridLayout(self.centralWidget)
 
         # Parameters and cultures
-        self.params = ['yield', 'price', 'labor', 'machine_time', 'water', 'labor_cost', 'fixed_cost']
-        self.cultures = ['Blé', 'Orge', 'Mais', 'Bet-sucr', 'Tournesol']
-        self.entries = {}
-        self.additional_entries = {}
+        self.params = PARAMS
         self.default_values = {
             'Blé': {'yield': 75, 'price': 60, 'labor': 2, 'machine_time': 30, 'water': 3000, 'labor_cost': 500, 'fixed_cost': 250},
             'Orge': {'yield': 60, 'price': 50, 'labor': 1, 'machine_time': 24, 'water': 2000, 'labor_cost': 500, 'fixed_cost': 180},
@@ -33,69 +284,89 @@ class AgriculturalZoneOptimizationUI(QMainWindow):
         self.additional_defaults = {
             'Irrigation water (m3)': "25000000",
             'Machine hours': "24000",
-            'Labor': "3000"
+            'Labor': "3000",
+            'Minimum area per crop (ha)': "0",
+            'Maximum area per crop (ha, 0 = none)': "0"
         }
 
-        # Create input fields for each parameter and culture
-        for i, param in enumerate(self.params):
-            for j, cult in enumerate(self.cultures):
-                # Add label for the culture if it's the first parameter row
-                if i == 0:
-                    label = QLabel(cult)
-                    self.gridLayout.addWidget(label, i, j+1)
-
-                # Add label for the parameter
-                label = QLabel(param)
-                self.gridLayout.addWidget(label, i+1, 0)
-
-                # Create a line edit for each parameter for each culture
-                line_edit = QLineEdit()
-                self.gridLayout.addWidget(line_edit, i+1, j+1)
-                self.entries.setdefault(cult, {})[param] = line_edit
+        # Crop table: one row per crop, one column per parameter
+        cultures = list(self.default_values)
+        self.crop_model = CropTableModel(cultures, crop_table(cultures, self.default_values), self)
+        self.crop_model.editRejected.connect(self.show_error_popup)
+        self.tableView = QTableView()
+        self.tableView.setModel(self.crop_model)
+        self.tableView.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.gridLayout.addWidget(self.tableView, 0, 0, 1, 3)
 
         # Additional inputs for global constraints
-        self.additional_labels = ['Irrigation water (m3)', 'Machine hours', 'Labor']
-
-        for i, label_text in enumerate(self.additional_labels, len(self.params) + 2):
-            label = QLabel(label_text)
-            line_edit = QLineEdit()
-            self.gridLayout.addWidget(label, i, 0)
-            self.gridLayout.addWidget(line_edit, i, 1)
-            self.additional_entries[label_text] = line_edit
-
-        for cult, params in self.default_values.items():
-            for param, value in params.items():
-                line_edit = QLineEdit(str(value))
-                self.gridLayout.addWidget(line_edit, self.params.index(param)+1, self.cultures.index(cult)+1)
-                self.entries.setdefault(cult, {})[param] = line_edit
-
-        # Set default values for additional entries
-        for i, (label_text, default) in enumerate(self.additional_defaults.items(), len(self.params) + 2):
+        self.additional_labels = list(self.additional_defaults)
+        self.additional_entries = {}
+        for i, (label_text, default) in enumerate(self.additional_defaults.items(), 1):
+            self.gridLayout.addWidget(QLabel(label_text), i, 0)
             line_edit = QLineEdit(default)
-            self.gridLayout.addWidget(line_edit, i, 1)
+            self.gridLayout.addWidget(line_edit, i, 1, 1, 2)
             self.additional_entries[label_text] = line_edit
 
-        # Solve button (doesn't do anything yet)
+        row = len(self.additional_labels) + 1
+        self.importButton = QPushButton('Import table')
+        self.importButton.clicked.connect(self.import_table)
+        self.gridLayout.addWidget(self.importButton, row, 0)
+        self.exportButton = QPushButton('Export table')
+        self.exportButton.clicked.connect(self.export_table)
+        self.gridLayout.addWidget(self.exportButton, row, 1)
         self.solveButton = QPushButton('Solve LP')
-        self.gridLayout.addWidget(self.solveButton, len(self.params) + len(self.additional_labels) + 3, 0, 1, len(self.cultures) + 1)
         self.solveButton.clicked.connect(self.solve_agriculture_problem)
+        self.gridLayout.addWidget(self.solveButton, row, 2)
+        self.riskButton = QPushButton('Evaluate risk')
+        self.riskButton.clicked.connect(self.evaluate_risk)
+        self.gridLayout.addWidget(self.riskButton, row + 1, 0, 1, 3)
+        # fixed_cost paid once per crop grown (pl1_fixed) instead of per hectare
+        self.setupCostBox = QCheckBox('Fixed cost paid once per crop grown')
+        self.gridLayout.addWidget(self.setupCostBox, row + 2, 0, 1, 3)
+        # the per-crop areas only apply to that mode, so they can only be edited in it
+        for label_text in FIXED_CHARGE_FIELDS:
+            self.additional_entries[label_text].setEnabled(False)
+            self.setupCostBox.toggled.connect(self.additional_entries[label_text].setEnabled)
+        # (cultures, crop table, hectares, resources, fixed cost per crop) of the last solve, evaluated by evaluate_risk
+        self.last_plan = None
 
-    # Placeholder for the solveLP function
-    def solve_agriculture_problem(self):
+    @property
+    def cultures(self):
+        return self.crop_model.cultures
+
+    def import_table(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import crop table", "", "Crop tables (*.csv *.xlsx *.xls)")
+        if not path:
+            return
         try:
-            # Check for negative values in the main entries
-            for cult, params in self.entries.items():
-                for param, line_edit in params.items():
-                    value = float(line_edit.text())
-                    if value < 0:
-                        raise ValueError(f"Value for {param} in {cult} cannot be negative.")
-
-            # Check for negative values in the additional entries
-            for label_text, line_edit in self.additional_entries.items():
+            self.crop_model.set_table(*load_crop_table(path))
+        except Exception as e:
+            self.show_error_popup(f"Could not import {path}: {e}")
+
+    def export_table(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export crop table", "crops.csv", "CSV (*.csv);;Excel (*.xlsx)")
+        if not path:
+            return
+        try:
+            save_crop_table(path, self.crop_model.cultures, self.crop_model.table)
+        except Exception as e:
+            self.show_error_popup(f"Could not export {path}: {e}")
+
+    def read_resources(self):
+        # The only text fields left; the crop table is validated cell by cell as it is edited
+        resources = {}
+        for label_text, line_edit in self.additional_entries.items():
+            try:
                 value = float(line_edit.text())
-                if value < 0:
-                    raise ValueError(f"Value for {label_text} cannot be negative.")
+            except ValueError:
+                raise ValueError(f"Value for {label_text} must be a number.")
+            if value < 0:
+                raise ValueError(f"Value for {label_text} cannot be negative.")
+            resources[label_text] = value
+        return resources
 
+    def solve_agriculture_problem(self):
+        try:
             # Call the solver function if inputs are valid
             result_text = self.run_solver()
             # Display the result in a pop-up window
@@ -107,44 +378,55 @@ class AgriculturalZoneOptimizationUI(QMainWindow):
             self.show_error_popup(f"An unexpected error occurred: {e}")
 
     def run_solver(self):
-        # Retrieve values from the entries
-        values = {cult: {param: float(self.entries[cult][param].text()) for param in self.params} for cult in self.cultures}
-        irrigation_water = float(self.additional_entries['Irrigation water (m3)'].text())
-        machine_hours = float(self.additional_entries['Machine hours'].text())
-        labor = float(self.additional_entries['Labor'].text())
-
-        # Create a new model
-        m = Model("agriculture")
-
-        # Create variables
-        x = m.addVars(self.cultures, name="cultures")
-
-        # Set the objective
-        m.setObjective(
-            quicksum(
-                x[cult] * (values[cult]['yield'] * values[cult]['price'] -
-                           values[cult]['labor'] * values[cult]['labor_cost'] -
-                           values[cult]['machine_time'] * 30 -
-                           values[cult]['water'] * 0.1 - values[cult]['fixed_cost'])
-                for cult in self.cultures), GRB.MAXIMIZE)
-
-        # Add constraints
-        m.addConstr(quicksum(x[cult] * values[cult]['labor'] for cult in self.cultures) <= labor, "Labor")
-        m.addConstr(quicksum(x[cult] * values[cult]['machine_time'] for cult in self.cultures) <= machine_hours, "MachineHours")
-        m.addConstr(quicksum(x[cult] * values[cult]['water'] for cult in self.cultures) <= irrigation_water, "IrrigationWater")
-        
-        # Additional constraint to limit total hectares to 1000
-        m.addConstr(quicksum(x[cult] for cult in self.cultures) <= 1000, "TotalHectares")
-
-        # Optimize model
-        m.optimize()
+        metrics = SolveMetrics("pl1")
+        with metrics.phase("parse"):
+            resources = self.read_resources()
+        cultures = self.crop_model.cultures
+        if self.setupCostBox.isChecked():
+            from pl1_fixed import solve_fixed_charge
+            hectares, total, profit = solve_fixed_charge(cultures, self.crop_model.table,
+                                                         resources['Irrigation water (m3)'], resources['Machine hours'],
+                                                         resources['Labor'],
+                                                         min_hectares=resources['Minimum area per crop (ha)'],
+                                                         max_crop_hectares=(resources['Maximum area per crop (ha, 0 = none)']
+                                                                            or None),
+                                                         backend=self.backend, metrics=metrics)
+        else:
+            hectares, total, profit = solve_crop_table(cultures, self.crop_model.table,
+                                                       resources['Irrigation water (m3)'], resources['Machine hours'],
+                                                       resources['Labor'], backend=self.backend, metrics=metrics)
+        self.last_plan = (list(cultures), self.crop_model.table.copy(), hectares, resources,
+                          self.setupCostBox.isChecked())
 
         # Display results
-        result = "\n".join(f"{cult} hectares: {x[cult].X}" for cult in self.cultures)
-        result += f"\nTotal cultivated hectares: {quicksum(x[cult] for cult in self.cultures).getValue()}"
-        result += f"\nOptimal profit: {m.objVal}"
+        with metrics.phase("format"):
+            result = "\n".join(f"{cult} hectares: {hectares[cult]}" for cult in cultures)
+            result += f"\nTotal cultivated hectares: {total}"
+            result += f"\nOptimal profit: {profit}"
+        self.last_metrics = metrics.finish()
         return result
 
+    def evaluate_risk(self):
+        from pl1_risk import evaluate_plan
+        if self.last_plan is None:
+            self.show_error_popup("Solve the LP first: the risk is evaluated for the last optimal plan.")
+            return
+        cultures, table, hectares, resources, setup_costs = self.last_plan
+        try:
+            # under the cost model the plan was optimized for
+            risk = evaluate_plan([hectares[cult] for cult in cultures], table, resources['Irrigation water (m3)'],
+                                 setup_costs=setup_costs)
+        except Exception as e:
+            self.show_error_popup(f"An unexpected error occurred: {e}")
+            return
+        level = int(round(risk['alpha'] * 100))
+        result = f"Scenarios: {risk['scenarios']}"
+        result += f"\nExpected profit: {risk['expected_profit']:.2f} (std {risk['profit_std']:.2f})"
+        result += f"\nVaR {level}% (profit): {risk['value_at_risk']:.2f}"
+        result += f"\nCVaR {level}% (profit): {risk['cvar']:.2f}"
+        result += f"\nProbability of exceeding the water supply: {risk['water_violation_probability']:.4f}"
+        self.show_result_popup(result)
+
     def show_result_popup(self, result_text):
         msg = QMessageBox()
         msg.setWindowTitle("Agriculture Result")
@@ -192,6 +474,12 @@ def main():
             border-radius: 8px;
             font-size: 12pt;
         }
+        QTableView, QHeaderView::section {
+            color: #fff;
+            background: #262D37;
+            gridline-color: #5A6270;
+            font-size: 11pt;
+        }
     """)
     ex = AgriculturalZoneOptimizationUI()
     ex.show()
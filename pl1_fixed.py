@@ -0,0 +1,128 @@
+import numpy as np
+from gurobipy import Model, GRB
+
+import backends
+import results
+from backends import LinearProgram, MAXIMIZE
+from instrumentation import SolveMetrics
+from pl1 import MAX_HECTARES, PARAMS, RESOURCE_COLUMNS, crop_margins
+
+# Big-M of the naive formulation, an arbitrary "large enough" area bound
+NAIVE_BIG_M = 1e6
+
+
+# pl1 with the fixed cost of a crop paid once when the crop is grown instead of per hectare, and
+# a minimum viable area for every crop grown. Each crop gets a binary y (grown) next to its area x:
+#     max  sum (margin + fixed_cost) x - fixed_cost y
+#          labor, machine hours, water and hectares as in pl1
+#          min_area y <= x <= U y
+# The strength of the model comes from U. Instead of a big-M, U is the largest area the resource
+# rows allow the crop on its own, and crops that can never pay off (no margin, or a minimum area
+# above U) are fixed to not grown. This closes most of the gap of the LP relaxation left by
+# NAIVE_BIG_M (see benchmarks.pl1_fixed), which matters most to the backends without Gurobi's
+# presolve.
+
+def fixed_charge_data(table, irrigation_water, machine_hours, labor, max_hectares=MAX_HECTARES, min_hectares=0,
+                      max_crop_hectares=None):
+    # (variable margins, setup costs, resource rows, limits, minimum areas, area bounds U) of a
+    # (crops x PARAMS) table. min_hectares and max_crop_hectares (market or rotation limits) are
+    # one value or one per crop.
+    fixed = table[:, PARAMS.index('fixed_cost')]
+    margins = crop_margins(table) + fixed
+    # Labor, MachineHours, IrrigationWater, TotalHectares, as in pl1
+    rows = np.vstack([table[:, RESOURCE_COLUMNS].T, np.ones(len(table))])
+    limits = np.array([labor, machine_hours, irrigation_water, max_hectares], dtype=float)
+    minimum = np.broadcast_to(np.asarray(min_hectares, dtype=float), margins.shape).copy()
+    with np.errstate(divide="ignore"):
+        bounds = np.where(rows > 0, limits[:, None] / rows, np.inf).min(axis=0)
+    if max_crop_hectares is not None:
+        bounds = np.minimum(bounds, max_crop_hectares)
+    return margins, fixed, rows, limits, minimum, bounds
+
+
+def never_grown(margins, fixed, minimum, bounds):
+    # Crops no optimal plan grows: no positive margin, or a minimum area the resources cannot host
+    return (margins <= 0) | (minimum > bounds) | ((margins * bounds <= fixed) & (fixed > 0))
+
+
+def build_fixed_charge_model(table, irrigation_water, machine_hours, labor, max_hectares=MAX_HECTARES,
+                             min_hectares=0, max_crop_hectares=None, big_m=None):
+    # Returns (model, x, y). big_m gives the naive model: x <= big_m y and nothing else,
+    # kept to measure the strong one against
+    margins, fixed, rows, limits, minimum, bounds = fixed_charge_data(table, irrigation_water, machine_hours, labor,
+                                                                      max_hectares, min_hectares, max_crop_hectares)
+    n = len(margins)
+    m = Model("agriculture_fixed_charge")
+    x = m.addMVar(n, name="cultures")
+    y = m.addMVar(n, vtype=GRB.BINARY, name="grown")
+    m.setObjective(margins @ x - fixed @ y, GRB.MAXIMIZE)
+    m.addMConstr(rows, x, GRB.LESS_EQUAL, limits, name="resources")
+    if big_m is not None:
+        if max_crop_hectares is not None:
+            x.UB = np.broadcast_to(np.asarray(max_crop_hectares, dtype=float), (n,))
+        m.addConstr(x <= big_m * y, name="area")
+    else:
+        x.UB = bounds
+        y.UB = np.where(never_grown(margins, fixed, minimum, bounds), 0.0, 1.0)
+        m.addConstr(x <= bounds * y, name="area")
+    if (minimum > 0).any():
+        m.addConstr(x >= minimum * y, name="minimum_area")
+    return m, x, y
+
+
+def fixed_charge_program(table, irrigation_water, machine_hours, labor, max_hectares=MAX_HECTARES, min_hectares=0,
+                         max_crop_hectares=None, big_m=None):
+    # Same model for the non-Gurobi backends; big_m gives the naive one
+    margins, fixed, rows, limits, minimum, bounds = fixed_charge_data(table, irrigation_water, machine_hours, labor,
+                                                                      max_hectares, min_hectares, max_crop_hectares)
+    n = len(margins)
+    allowed = ~never_grown(margins, fixed, minimum, bounds)
+    if big_m is not None:
+        caps = np.inf if max_crop_hectares is None else max_crop_hectares
+        bounds = np.full(n, float(big_m))
+        allowed = np.ones(n, dtype=bool)
+    else:
+        caps = bounds
+    caps = np.broadcast_to(np.asarray(caps, dtype=float), (n,))
+    program = LinearProgram("agriculture_fixed_charge", MAXIMIZE)
+    x = [program.add_var(ub=float(caps[i]), obj=float(margins[i]), name=f"cultures[{i}]") for i in range(n)]
+    y = [program.add_var(ub=1.0 if allowed[i] else 0.0, obj=-float(fixed[i]), integer=True, name=f"grown[{i}]")
+         for i in range(n)]
+    for r, name in enumerate(["Labor", "MachineHours", "IrrigationWater", "TotalHectares"]):
+        program.add_constr({x[i]: float(rows[r, i]) for i in range(n)}, "<=", float(limits[r]), name)
+    for i in range(n):
+        program.add_constr({x[i]: 1.0, y[i]: -float(bounds[i])}, "<=", 0.0, f"area[{i}]")
+        if minimum[i] > 0:
+            program.add_constr({x[i]: 1.0, y[i]: -float(minimum[i])}, ">=", 0.0, f"minimum_area[{i}]")
+
+    def extract(solution):
+        if not solution.has_values:
+            raise Exception('No optimal solution found')
+        hectares = np.array([solution.values[col] for col in x], dtype=float)
+        return hectares, solution.objective
+
+    return program, extract
+
+
+def solve_fixed_charge(cultures, table, irrigation_water, machine_hours, labor, max_hectares=MAX_HECTARES,
+                       min_hectares=0, max_crop_hectares=None, backend=None, metrics=None):
+    # Returns (hectares per crop, total hectares, profit) like pl1.solve_crop_table, with the
+    # fixed_cost column paid once per crop grown, min_hectares for every crop grown and at most
+    # max_crop_hectares of any crop (both one value, or one per crop)
+    if metrics is None:
+        metrics = SolveMetrics("pl1")
+    table = np.asarray(table, dtype=float)
+    args = (table, irrigation_water, machine_hours, labor, max_hectares, min_hectares, max_crop_hectares)
+
+    def solve_gurobi():
+        with metrics.phase("build"):
+            m, x, y = build_fixed_charge_model(*args)
+        metrics.optimize(m)
+        if m.SolCount == 0:
+            raise Exception('No optimal solution found')
+        with metrics.phase("extract"):
+            return results.read_attr(m, x), m.ObjVal
+
+    hectares, profit = backends.run(backend, solve_gurobi, lambda: fixed_charge_program(*args), metrics)
+    hectares = np.asarray(hectares, dtype=float)
+    return dict(zip(cultures, hectares.tolist())), float(hectares.sum()), profit
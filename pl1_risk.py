@@ -0,0 +1,184 @@
+import numpy as np
+from gurobipy import Model, GRB
+from scipy.sparse import csr_matrix, hstack, identity
+
+import backends
+from backends import LinearProgram, MAXIMIZE
+from instrumentation import SolveMetrics
+from pl1 import PARAMS, MACHINE_HOUR_COST, WATER_COST, MAX_HECTARES
+
+# Relative spread (coefficient of variation) of the uncertain crop parameters
+YIELD_CV = 0.15
+PRICE_CV = 0.10
+WATER_CV = 0.10
+# Share of the yield variance coming from a weather shock common to every crop
+YIELD_CORRELATION = 0.5
+
+# Scenario arrays of one chunk are kept under this size
+CHUNK_BYTES = 64 * 2 ** 20
+DEFAULT_SCENARIOS = 1_000_000
+ALPHA = 0.95
+
+YIELD, PRICE, LABOR = PARAMS.index('yield'), PARAMS.index('price'), PARAMS.index('labor')
+MACHINE, WATER = PARAMS.index('machine_time'), PARAMS.index('water')
+LABOR_COST, FIXED_COST = PARAMS.index('labor_cost'), PARAMS.index('fixed_cost')
+
+
+def _lognormal(rng, shape, cv, common=None, correlation=0.0):
+    # Multiplicative noise with mean 1; `common` is a standard normal shared along axis 1
+    sigma = np.sqrt(np.log1p(cv ** 2))
+    z = rng.standard_normal(shape)
+    if common is not None:
+        z = np.sqrt(correlation) * common[:, None] + np.sqrt(1 - correlation) * z
+    return np.exp(sigma * z - sigma ** 2 / 2)
+
+
+def sample_scenarios(table, n, rng, yield_cv=YIELD_CV, price_cv=PRICE_CV, water_cv=WATER_CV,
+                     correlation=YIELD_CORRELATION):
+    # n draws of (yield, price, water) per crop around the values of a (crops x PARAMS) table,
+    # each an (n x crops) array
+    crops = table.shape[0]
+    weather = rng.standard_normal(n)
+    yields = table[:, YIELD] * _lognormal(rng, (n, crops), yield_cv, weather, correlation)
+    prices = table[:, PRICE] * _lognormal(rng, (n, crops), price_cv)
+    water = table[:, WATER] * _lognormal(rng, (n, crops), water_cv)
+    return yields, prices, water
+
+
+def fixed_margins(table):
+    # Part of the margin per hectare that does not depend on the scenario
+    return -(table[:, LABOR] * table[:, LABOR_COST] + table[:, MACHINE] * MACHINE_HOUR_COST + table[:, FIXED_COST])
+
+
+def scenario_margins(table, yields, prices, water):
+    # (n x crops) profit per hectare in every scenario
+    return yields * prices - water * WATER_COST + fixed_margins(table)
+
+
+def chunk_size(crops):
+    # three (chunk x crops) float arrays plus the margins computed from them
+    return max(1, CHUNK_BYTES // (4 * 8 * max(1, crops)))
+
+
+def evaluate_plan(hectares, table, irrigation_water, n_scenarios=DEFAULT_SCENARIOS, alpha=ALPHA, seed=None,
+                  metrics=None, setup_costs=False, **spread):
+    # Profit distribution of a fixed allocation (hectares per crop, in table order) over sampled
+    # yields, prices and water needs. Scenarios are drawn chunk by chunk; only the worst
+    # (1 - alpha) share of the profits is kept, which is all VaR and CVaR need.
+    # value_at_risk is the (1 - alpha) quantile of the profit, cvar the mean profit below it.
+    # setup_costs charges fixed_cost once per crop grown, as pl1_fixed plans it, instead of per hectare.
+    if metrics is None:
+        metrics = SolveMetrics("pl1_risk")
+    hectares = np.asarray(hectares, dtype=float)
+    # scenario_margins charges fixed_cost per hectare; moved to once per grown crop here. A crop
+    # counts as grown above solver noise, so a 1e-9 ha leftover in the plan is not charged.
+    offset = 0.0
+    if setup_costs:
+        offset = table[:, FIXED_COST] @ hectares - table[:, FIXED_COST] @ (hectares > 1e-6)
+    rng = np.random.default_rng(seed)
+    tail_size = max(1, int(np.ceil((1 - alpha) * n_scenarios)))
+    tail = np.empty(0)
+    total = 0.0
+    total_sq = 0.0
+    violations = 0
+    step = chunk_size(len(hectares))
+    with metrics.phase("simulate"):
+        for start in range(0, n_scenarios, step):
+            n = min(step, n_scenarios - start)
+            yields, prices, water = sample_scenarios(table, n, rng, **spread)
+            profits = scenario_margins(table, yields, prices, water) @ hectares + offset
+            total += profits.sum()
+            total_sq += profits @ profits
+            violations += int(np.count_nonzero(water @ hectares > irrigation_water))
+            tail = np.concatenate([tail, profits])
+            if len(tail) > tail_size:
+                tail = np.partition(tail, tail_size - 1)[:tail_size]
+    mean = total / n_scenarios
+    result = {
+        'scenarios': n_scenarios,
+        'alpha': alpha,
+        'expected_profit': float(mean),
+        'profit_std': float(np.sqrt(max(0.0, total_sq / n_scenarios - mean ** 2))),
+        'value_at_risk': float(tail.max()),
+        'cvar': float(tail.mean()),
+        'water_violation_probability': violations / n_scenarios,
+    }
+    metrics.solve_stats.update(result)
+    return result
+
+
+# ===================CVaR LP
+
+def build_cvar_model(table, margins, water, irrigation_water, machine_hours, labor, max_hectares=MAX_HECTARES,
+                     alpha=ALPHA, expectation_weight=0.0):
+    # Rockafellar-Uryasev: maximize eta - E[(eta - profit)^+] / (1 - alpha), the CVaR of the
+    # profit over the sampled scenarios, blended with the expected profit by expectation_weight.
+    # Water has to suffice in every sampled scenario; labor and machine hours are certain.
+    s, crops = margins.shape
+    weight = (1 - expectation_weight) / ((1 - alpha) * s)
+    m = Model("agriculture_cvar")
+    x = m.addMVar(crops, obj=expectation_weight * margins.mean(axis=0), name="cultures")
+    eta = m.addMVar(1, lb=-GRB.INFINITY, obj=1 - expectation_weight, name="eta")
+    shortfall = m.addMVar(s, obj=-weight, name="shortfall")
+    m.ModelSense = GRB.MAXIMIZE
+    # shortfall_s >= eta - profit_s
+    m.addMConstr(hstack([csr_matrix(margins), -np.ones((s, 1)), identity(s)], format="csr"),
+                 None, GRB.GREATER_EQUAL, np.zeros(s), name="Shortfall")
+    m.addMConstr(water, x, GRB.LESS_EQUAL, np.full(s, float(irrigation_water)), name="IrrigationWater")
+    m.addConstr(table[:, LABOR] @ x <= labor, name="Labor")
+    m.addConstr(table[:, MACHINE] @ x <= machine_hours, name="MachineHours")
+    m.addConstr(x.sum() <= max_hectares, name="TotalHectares")
+    return m, x, eta
+
+
+def cvar_program(table, margins, water, irrigation_water, machine_hours, labor, max_hectares=MAX_HECTARES,
+                 alpha=ALPHA, expectation_weight=0.0):
+    # Same model as build_cvar_model for the non-Gurobi backends
+    s, crops = margins.shape
+    weight = (1 - expectation_weight) / ((1 - alpha) * s)
+    program = LinearProgram("agriculture_cvar", MAXIMIZE)
+    x = [program.add_var(obj=expectation_weight * v, name=f"cultures[{c}]")
+         for c, v in enumerate(margins.mean(axis=0))]
+    eta = program.add_var(lb=-float("inf"), obj=1 - expectation_weight, name="eta")
+    shortfall = program.add_vars(s, obj=-weight, name="shortfall")
+    for k in range(s):
+        coeffs = dict(zip(x, margins[k]))
+        coeffs[shortfall[k]] = 1
+        coeffs[eta] = -1
+        program.add_constr(coeffs, ">=", 0, f"Shortfall[{k}]")
+        program.add_constr(dict(zip(x, water[k])), "<=", irrigation_water, f"IrrigationWater[{k}]")
+    program.add_constr(dict(zip(x, table[:, LABOR])), "<=", labor, "Labor")
+    program.add_constr(dict(zip(x, table[:, MACHINE])), "<=", machine_hours, "MachineHours")
+    program.add_constr({j: 1 for j in x}, "<=", max_hectares, "TotalHectares")
+
+    def extract(solution):
+        if not solution.has_values:
+            raise Exception('No optimal solution found')
+        return solution.values[x], solution.objective
+
+    return program, extract
+
+
+def solve_cvar(cultures, table, irrigation_water, machine_hours, labor, max_hectares=MAX_HECTARES, n_scenarios=500,
+               alpha=ALPHA, expectation_weight=0.0, seed=None, backend=None, metrics=None, **spread):
+    # CVaR-optimal allocation on a subsample of n_scenarios draws. Returns (hectares per crop,
+    # total hectares, CVaR objective); evaluate_plan gives its out-of-sample risk.
+    if metrics is None:
+        metrics = SolveMetrics("pl1_risk")
+    with metrics.phase("sample"):
+        yields, prices, water = sample_scenarios(table, n_scenarios, np.random.default_rng(seed), **spread)
+        margins = scenario_margins(table, yields, prices, water)
+    args = (table, margins, water, irrigation_water, machine_hours, labor, max_hectares, alpha, expectation_weight)
+
+    def solve_gurobi():
+        with metrics.phase("build"):
+            m, x, _ = build_cvar_model(*args)
+        metrics.optimize(m)
+        if m.Status != GRB.OPTIMAL:
+            raise Exception('No optimal solution found')
+        with metrics.phase("extract"):
+            return x.X, m.ObjVal
+
+    values, objective = backends.run(backend, solve_gurobi, lambda: cvar_program(*args), metrics)
+    hectares = {cult: float(v) for cult, v in zip(cultures, values)}
+    return hectares, float(np.sum(values)), objective
@@ -0,0 +1,198 @@
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from gurobipy import Model, GRB, GurobiError
+from scipy.optimize import linprog
+from scipy.sparse import block_diag, csr_matrix
+
+from instrumentation import SolveMetrics
+from pl1 import crop_margin
+
+# Dantzig-Wolfe stops when no zone can improve the master by more than this (relative to its objective)
+DW_TOLERANCE = 1e-7
+DW_MAX_ITERATIONS = 200
+# Zones priced per task sent to a worker process
+ZONES_PER_TASK = 64
+
+
+def make_zone(cultures, values, labor, max_hectares):
+    # One irrigation zone from a pl1 crop table: its own labor pool and hectare cap, while water
+    # and machine hours come from the shared regional budget
+    return {
+        'cultures': list(cultures),
+        'margin': np.array([crop_margin(values[cult]) for cult in cultures], dtype=float),
+        'labor': np.array([values[cult]['labor'] for cult in cultures], dtype=float),
+        'machine_time': np.array([values[cult]['machine_time'] for cult in cultures], dtype=float),
+        'water': np.array([values[cult]['water'] for cult in cultures], dtype=float),
+        'labor_limit': float(labor),
+        'max_hectares': float(max_hectares),
+    }
+
+
+def zone_results(zones, x_per_zone, profit):
+    hectares = [{cult: float(v) for cult, v in zip(zone['cultures'], x)} for zone, x in zip(zones, x_per_zone)]
+    return {'hectares': hectares, 'profit': profit}
+
+
+# ===================MONOLITHIC
+
+def build_multizone_model(zones, irrigation_water, machine_hours):
+    m = Model("agriculture_zones")
+    sizes = [len(zone['cultures']) for zone in zones]
+    x = m.addMVar(sum(sizes), name="cultures")
+    m.setObjective(np.concatenate([zone['margin'] for zone in zones]) @ x, GRB.MAXIMIZE)
+
+    # Local rows, block diagonal: labor and hectares of each zone
+    local = block_diag([np.vstack([zone['labor'], np.ones(len(zone['cultures']))]) for zone in zones], format="csr")
+    local_rhs = np.concatenate([[zone['labor_limit'], zone['max_hectares']] for zone in zones])
+    m.addMConstr(local, x, GRB.LESS_EQUAL, local_rhs, name="zone")
+
+    # Coupling rows: regional water allocation and machine pool
+    coupling = csr_matrix(np.vstack([np.concatenate([zone['water'] for zone in zones]),
+                                     np.concatenate([zone['machine_time'] for zone in zones])]))
+    m.addMConstr(coupling, x, GRB.LESS_EQUAL, np.array([irrigation_water, machine_hours], dtype=float),
+                 name="shared")
+    offsets = np.cumsum([0] + sizes)
+    return m, x, offsets
+
+
+def solve_monolithic(zones, irrigation_water, machine_hours, metrics=None):
+    if metrics is None:
+        metrics = SolveMetrics("pl1_zones")
+    with metrics.phase("build"):
+        m, x, offsets = build_multizone_model(zones, irrigation_water, machine_hours)
+    metrics.optimize(m)
+    if m.Status != GRB.OPTIMAL:
+        raise Exception('No optimal solution found')
+    with metrics.phase("extract"):
+        values = x.X
+        return zone_results(zones, [values[offsets[z]:offsets[z + 1]] for z in range(len(zones))], m.ObjVal)
+
+
+# ===================DANTZIG-WOLFE
+
+def price_zone(zone, water_price, machine_price):
+    # Zone subproblem: best plan once shared water and machine hours are charged at the master's
+    # dual prices. Returns (reduced profit, plan).
+    reduced = zone['margin'] - water_price * zone['water'] - machine_price * zone['machine_time']
+    if not (reduced > 0).any():
+        return 0.0, np.zeros(len(reduced))
+    res = linprog(-reduced, A_ub=np.vstack([zone['labor'], np.ones(len(reduced))]),
+                  b_ub=[zone['labor_limit'], zone['max_hectares']], bounds=(0, None), method="highs")
+    if res.status != 0:
+        raise Exception(f"Zone subproblem failed: {res.message}")
+    return -res.fun, res.x
+
+
+_worker_zones = None
+
+
+def _init_worker(zones):
+    global _worker_zones
+    _worker_zones = zones
+
+
+def _price_chunk(indices, water_price, machine_price):
+    return [price_zone(_worker_zones[z], water_price, machine_price) for z in indices]
+
+
+def _solve_master(columns, n_zones, irrigation_water, machine_hours):
+    # Restricted master LP over the proposals collected so far: one convex combination per zone.
+    # Returns (weights, objective, water price, machine price, zone prices).
+    profit = np.array([c[1] for c in columns])
+    usage = csr_matrix(np.array([[c[2] for c in columns], [c[3] for c in columns]]))
+    zone_of = np.array([c[0] for c in columns])
+    convexity = csr_matrix((np.ones(len(columns)), (zone_of, np.arange(len(columns)))), shape=(n_zones, len(columns)))
+    res = linprog(-profit, A_ub=usage, b_ub=[irrigation_water, machine_hours], A_eq=convexity,
+                  b_eq=np.ones(n_zones), bounds=(0, None), method="highs")
+    if res.status != 0:
+        raise Exception(f"Master problem failed: {res.message}")
+    # HiGHS marginals are for the minimization of -profit
+    water_price, machine_price = -res.ineqlin.marginals
+    return res.x, -res.fun, water_price, machine_price, -res.eqlin.marginals
+
+
+def solve_dantzig_wolfe(zones, irrigation_water, machine_hours, workers=None, metrics=None,
+                        tolerance=DW_TOLERANCE, max_iterations=DW_MAX_ITERATIONS, fallback=True):
+    # Column generation: the master prices the shared resources, zone subproblems answer with
+    # their best plan at those prices, in parallel worker processes when workers != 1.
+    # The run also records the Lagrangian upper bound, so the gap is known at every iteration.
+    # If max_iterations runs out while a zone still has a positive reduced cost, the last master
+    # is not optimal: a warning is issued and, with fallback, the monolithic model is solved
+    # instead (solve_stats["DWFallback"]); when that model is too large for the license the
+    # unconverged plan is returned. Either way result['converged'] and result['gap'] tell.
+    if metrics is None:
+        metrics = SolveMetrics("pl1_zones")
+    n = len(zones)
+    workers = workers or os.cpu_count() or 1
+    # (zone, profit, water, machine hours, plan); the empty plan keeps the first master feasible
+    columns = [(z, 0.0, 0.0, 0.0, np.zeros(len(zone['cultures']))) for z, zone in enumerate(zones)]
+    chunks = [list(range(i, min(i + ZONES_PER_TASK, n))) for i in range(0, n, ZONES_PER_TASK)]
+    pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(zones,)) if workers > 1 else None
+    history = []
+    converged, reduced_gap = False, 0.0
+    try:
+        for iteration in range(max_iterations):
+            with metrics.phase("master"):
+                weights, objective, water_price, machine_price, zone_prices = _solve_master(
+                    columns, n, irrigation_water, machine_hours)
+            with metrics.phase("pricing"):
+                if pool is None:
+                    priced = [price_zone(zone, water_price, machine_price) for zone in zones]
+                else:
+                    futures = [pool.submit(_price_chunk, chunk, water_price, machine_price) for chunk in chunks]
+                    priced = [p for future in futures for p in future.result()]
+            bound = water_price * irrigation_water + machine_price * machine_hours + sum(v for v, _ in priced)
+            history.append((objective, bound))
+            added = 0
+            # largest reduced profit a zone still offers the master: 0 at the optimum
+            reduced_gap = float(max(0.0, max(value - zone_prices[z] for z, (value, _) in enumerate(priced))))
+            for z, (value, plan) in enumerate(priced):
+                if value - zone_prices[z] > tolerance * max(1.0, abs(objective)):
+                    zone = zones[z]
+                    columns.append((z, float(zone['margin'] @ plan), float(zone['water'] @ plan),
+                                    float(zone['machine_time'] @ plan), plan))
+                    added += 1
+            if not added:
+                converged = True
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    with metrics.phase("extract"):
+        x_per_zone = [np.zeros(len(zone['cultures'])) for zone in zones]
+        for weight, (z, _, _, _, plan) in zip(weights, columns):
+            if weight > 0:
+                x_per_zone[z] += weight * plan
+        metrics.solve_stats.update(Iterations=len(history), Columns=len(columns), ObjVal=objective,
+                                   ObjBound=history[-1][1], Converged=converged, ReducedCostGap=reduced_gap,
+                                   DWFallback=False)
+        result = zone_results(zones, x_per_zone, objective)
+        result.update(bounds=history, converged=converged, gap=reduced_gap)
+    if converged:
+        return result
+
+    warnings.warn(f"Dantzig-Wolfe stopped after {len(history)} iterations without converging "
+                  f"(reduced-cost gap {reduced_gap:.3g})", RuntimeWarning)
+    if not fallback:
+        return result
+    try:
+        exact = solve_monolithic(zones, irrigation_water, machine_hours, metrics)
+    except GurobiError:
+        # model too large for the license: keep the decomposed plan, flagged as not converged
+        return result
+    metrics.solve_stats.update(DWObjVal=objective, DWFallback=True)
+    exact.update(bounds=history, converged=True, gap=0.0)
+    return exact
+
+
+def solve_zones(zones, irrigation_water, machine_hours, method="monolithic", workers=None, metrics=None):
+    # method: "monolithic" (one Gurobi LP) or "dantzig-wolfe" (decomposed, solved with HiGHS)
+    if method == "monolithic":
+        return solve_monolithic(zones, irrigation_water, machine_hours, metrics)
+    if method == "dantzig-wolfe":
+        return solve_dantzig_wolfe(zones, irrigation_water, machine_hours, workers, metrics)
+    raise ValueError(f"Unknown method {method!r}")
@@ -1,14 +1,227 @@
 import sys
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QGridLayout, QPushButton,
-                             QLineEdit, QLabel, QTextEdit, QVBoxLayout, QMessageBox)
+                             QLineEdit, QLabel, QVBoxLayout, QMessageBox, QSplitter)
+from PyQt5.QtCore import Qt
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+from matplotlib.figure import Figure
 from gurobipy import Model, GRB, quicksum
+import numpy as np
+import backends
+import results
+import templates
+from backends import LinearProgram, OPTIMAL
+from instrumentation import SolveMetrics
+from result_views import ResultTable
+
+# Parameter names of solve_pl2, the keys of its JSON inputs
+PL2_INPUTS = ["months_number", "raw_material_cost", "storage_cost", "demand", "initial_workers", "worker_salary",
+              "overtime_cost", "recruitment_cost", "layoff_cost", "hours_per_pair", "working_hours",
+              "max_overtime_hours", "initial_stock"]
+RESULT_FIELDS = ["Production", "Workers", "Stock", "Hired", "Laid_Off", "Overtime"]
+
+
+def build_pl2_model(months_number, raw_material_cost, storage_cost, demand, initial_workers, worker_salary, overtime_cost, recruitment_cost, layoff_cost, hours_per_pair, working_hours, max_overtime_hours, initial_stock):
+    m = Model('PL2')
+
+    # Decision Variables
+    production = m.addVars(months_number, vtype=GRB.INTEGER, name="Production")
+    workers = m.addVars(months_number, vtype=GRB.INTEGER, name="Workers")
+    stock = m.addVars(months_number, vtype=GRB.INTEGER, lb=0, name="Stock")
+    hired = m.addVars(months_number-1, vtype=GRB.INTEGER, lb=0, name="Hired")
+    laid_off = m.addVars(months_number-1, vtype=GRB.INTEGER, lb=0, name="Laid_Off")
+    overtime = m.addVars(months_number, vtype=GRB.INTEGER, lb=0, name="Overtime")
+
+    # Objective Function
+    m.setObjective(
+        quicksum(raw_material_cost * production[t] for t in range(months_number)) +
+        quicksum(storage_cost * stock[t] for t in range(months_number)) +
+        quicksum(worker_salary * workers[t] for t in range(months_number)) +
+        quicksum(overtime_cost * overtime[t] for t in range(months_number)) +
+        quicksum(recruitment_cost * hired[t] for t in range(months_number-1)) +
+        quicksum(layoff_cost * laid_off[t] for t in range(months_number-1)),
+        GRB.MINIMIZE
+    )
+
+    # Constraints
+    # Stock and production must meet demand
+    for mu in range(months_number):
+        m.addConstr(stock[mu] + production[mu] == demand[mu] + (stock[mu-1] if mu > 0 else initial_stock))
+
+    # Workers balance
+    for mi in range(1, months_number):
+        m.addConstr(workers[mi] == workers[mi-1] + hired[mi-1] - laid_off[mi-1])
+
+    # Initial number of workers
+    m.addConstr(workers[0] == initial_workers)
+
+    # Overtime per worker
+    for mp in range(months_number):
+        m.addConstr(overtime[mp] <= max_overtime_hours * workers[mp])
+
+    # Production capacity
+    for mo in range(months_number):
+        m.addConstr(production[mo] * hours_per_pair <= working_hours * workers[mo] + overtime[mo])
+
+    for mo in range(months_number):
+        m.addConstr(stock[mo] >= 0)
+
+    variables = {
+        "Production": production,
+        "Workers": workers,
+        "Stock": stock,
+        "Hired": hired,
+        "Laid_Off": laid_off,
+        "Overtime": overtime
+    }
+    return m, variables
+
+
+def extract_pl2_results(m, variables, months_number):
+    if m.status != GRB.OPTIMAL:
+        raise Exception('No optimal solution found')
+    return monthly_results(results.extract(m, variables), months_number)
+
+
+def monthly_results(result, months_number):
+    # results.Result of the PL2 groups -> the PL2 result dictionary; Hired and Laid_Off have no
+    # value in the last month
+    values = {name: result[name].values.tolist() for name in RESULT_FIELDS}
+    return {f"Month {month+1}": {name: (values[name][month] if month < len(values[name]) else None)
+                                 for name in RESULT_FIELDS}
+            for month in range(months_number)}
+
+
+class PL2Template(templates.ModelTemplate):
+    # build_pl2_model compiled once per horizon length; costs, demand, initial state and the
+    # hours/overtime coefficients are patched in place
+    def build(self):
+        n = self.key
+        m = self.model = Model('PL2')
+        self.production = m.addVars(n, vtype=GRB.INTEGER, name="Production")
+        self.workers = m.addVars(n, vtype=GRB.INTEGER, name="Workers")
+        self.stock = m.addVars(n, vtype=GRB.INTEGER, lb=0, name="Stock")
+        self.hired = m.addVars(n-1, vtype=GRB.INTEGER, lb=0, name="Hired")
+        self.laid_off = m.addVars(n-1, vtype=GRB.INTEGER, lb=0, name="Laid_Off")
+        self.overtime = m.addVars(n, vtype=GRB.INTEGER, lb=0, name="Overtime")
+        self.groups = [self.production, self.workers, self.stock, self.hired, self.laid_off, self.overtime]
+
+        # RHS: demand (plus initial stock in the first month)
+        self.balance = [m.addConstr(self.stock[t] + self.production[t] - (self.stock[t-1] if t > 0 else 0) == 0)
+                        for t in range(n)]
+        for t in range(1, n):
+            m.addConstr(self.workers[t] == self.workers[t-1] + self.hired[t-1] - self.laid_off[t-1])
+        self.initial_workers = m.addConstr(self.workers[0] == 0)
+        # coefficient of workers[t] is -max_overtime_hours
+        self.overtime_cap = [m.addConstr(self.overtime[t] - self.workers[t] <= 0) for t in range(n)]
+        # coefficients hours_per_pair on production[t] and -working_hours on workers[t]
+        self.capacity = [m.addConstr(self.production[t] - self.workers[t] - self.overtime[t] <= 0) for t in range(n)]
+        m.update()
+        self.coeffs = (1.0, 1.0, 1.0)
+
+    def patch(self, months_number, raw_material_cost, storage_cost, demand, initial_workers, worker_salary, overtime_cost, recruitment_cost, layoff_cost, hours_per_pair, working_hours, max_overtime_hours, initial_stock):
+        n = self.key
+        m = self.model
+        costs = [raw_material_cost, worker_salary, storage_cost, recruitment_cost, layoff_cost, overtime_cost]
+        for group, cost in zip(self.groups, costs):
+            if len(group):
+                m.setAttr("Obj", list(group.values()), [cost] * len(group))
+        rhs = [float(d) for d in demand[:n]]
+        rhs[0] += initial_stock
+        m.setAttr("RHS", self.balance, rhs)
+        self.initial_workers.RHS = initial_workers
+
+        coeffs = (float(max_overtime_hours), float(hours_per_pair), float(working_hours))
+        if coeffs[0] != self.coeffs[0]:
+            for t in range(n):
+                m.chgCoeff(self.overtime_cap[t], self.workers[t], -coeffs[0])
+        if coeffs[1] != self.coeffs[1]:
+            for t in range(n):
+                m.chgCoeff(self.capacity[t], self.production[t], coeffs[1])
+        if coeffs[2] != self.coeffs[2]:
+            for t in range(n):
+                m.chgCoeff(self.capacity[t], self.workers[t], -coeffs[2])
+        self.coeffs = coeffs
+
+    def results(self):
+        if self.model.status != GRB.OPTIMAL:
+            raise Exception('No optimal solution found')
+        return monthly_results(results.extract(self.model, dict(zip(RESULT_FIELDS, self.groups))), self.key)
+
+
+def pl2_program(months_number, raw_material_cost, storage_cost, demand, initial_workers, worker_salary, overtime_cost, recruitment_cost, layoff_cost, hours_per_pair, working_hours, max_overtime_hours, initial_stock):
+    # Same model as build_pl2_model for the non-Gurobi backends
+    program = LinearProgram('PL2')
+    production = program.add_vars(months_number, obj=raw_material_cost, integer=True, name="Production")
+    workers = program.add_vars(months_number, obj=worker_salary, integer=True, name="Workers")
+    stock = program.add_vars(months_number, obj=storage_cost, integer=True, name="Stock")
+    hired = program.add_vars(months_number-1, obj=recruitment_cost, integer=True, name="Hired")
+    laid_off = program.add_vars(months_number-1, obj=layoff_cost, integer=True, name="Laid_Off")
+    overtime = program.add_vars(months_number, obj=overtime_cost, integer=True, name="Overtime")
+
+    for t in range(months_number):
+        if t > 0:
+            program.add_constr({stock[t]: 1, production[t]: 1, stock[t-1]: -1}, "==", demand[t])
+        else:
+            program.add_constr({stock[t]: 1, production[t]: 1}, "==", demand[t] + initial_stock)
+    for t in range(1, months_number):
+        program.add_constr({workers[t]: 1, workers[t-1]: -1, hired[t-1]: -1, laid_off[t-1]: 1}, "==", 0)
+    program.add_constr({workers[0]: 1}, "==", initial_workers)
+    for t in range(months_number):
+        program.add_constr({overtime[t]: 1, workers[t]: -max_overtime_hours}, "<=", 0)
+    for t in range(months_number):
+        program.add_constr({production[t]: hours_per_pair, workers[t]: -working_hours, overtime[t]: -1}, "<=", 0)
+
+    def extract(solution):
+        if solution.status != OPTIMAL:
+            raise Exception('No optimal solution found')
+        groups = [production, workers, stock, hired, laid_off, overtime]
+        return monthly_results(results.from_solution(solution, dict(zip(RESULT_FIELDS, groups))), months_number)
+
+    return program, extract
+
+
+def solve_pl2(months_number, raw_material_cost, storage_cost, demand, initial_workers, worker_salary, overtime_cost, recruitment_cost, layoff_cost, hours_per_pair, working_hours, max_overtime_hours, initial_stock, backend=None, metrics=None):
+    # Result dictionary of ProductionOptimizationApp.PL2 using the given backend (default: Gurobi);
+    # backend "dp" is the specialized lot-sizing/workforce solver of pl2_dp
+    if metrics is None:
+        metrics = SolveMetrics("pl2")
+    args = (months_number, raw_material_cost, storage_cost, demand, initial_workers, worker_salary, overtime_cost, recruitment_cost, layoff_cost, hours_per_pair, working_hours, max_overtime_hours, initial_stock)
+    metrics.inputs = dict(zip(PL2_INPUTS, args))
+    if backend == "dp":
+        from pl2_dp import solve_pl2_dp
+        return solve_pl2_dp(*args, metrics=metrics)
+
+    def solve_gurobi():
+        if templates.ENABLED:
+            return templates.solve(PL2Template, months_number, metrics, *args)
+        with metrics.phase("build"):
+            m, variables = build_pl2_model(*args)
+        metrics.optimize(m)
+        with metrics.phase("extract"):
+            return extract_pl2_results(m, variables, months_number)
+
+    return backends.run(backend, solve_gurobi, lambda: pl2_program(*args), metrics)
+
+
+def results_arrays(results):
+    # PL2 result dictionary -> one array per field plus the month numbers; Hired and Laid_Off
+    # are NaN in the last month, where PL2 gives None
+    months = list(results.values())
+    columns = {"Month": np.arange(1, len(months) + 1)}
+    for field in RESULT_FIELDS:
+        # + 0.0 turns the -0.0 some solvers report into 0
+        columns[field] = np.array([np.nan if month[field] is None else month[field] for month in months],
+                                  dtype=float) + 0.0
+    return columns
 
 
 class ProductionOptimizationApp(QMainWindow):
     def __init__(self):
         super().__init__()
+        # Solver backend name, None for the default one
+        self.backend = None
         self.setWindowTitle("Production Optimization")
-        self.setGeometry(100, 100, 400, 600)
+        self.setGeometry(100, 100, 600, 800)
         self.initUI()
 
     def initUI(self):
@@ -41,103 +254,71 @@ class ProductionOptimizationApp(QMainWindow):
             grid.addWidget(entry, i, 1)
             self.inputs[label_text.split()[0]] = entry
 
+        # Anytime solve (Gurobi): optional stopping gap and time limit, progress and a stop button
+        limits = QGridLayout()
+        layout.addLayout(limits)
+        self.gap_entry = QLineEdit()
+        self.gap_entry.setPlaceholderText("optimal")
+        self.time_entry = QLineEdit()
+        self.time_entry.setPlaceholderText("none")
+        limits.addWidget(QLabel("Stop at gap (%):"), 0, 0)
+        limits.addWidget(self.gap_entry, 0, 1)
+        limits.addWidget(QLabel("Time limit (s):"), 1, 0)
+        limits.addWidget(self.time_entry, 1, 1)
+
         # Button to run optimization
-        run_button = QPushButton("Run Optimization")
-        run_button.clicked.connect(self.run_optimization)
-        layout.addWidget(run_button)
-
-        # Text area to display results
-        self.result_text = QTextEdit()
-        self.result_text.setReadOnly(True)
-        layout.addWidget(self.result_text)
-
-    def PL2(self, months_number, raw_material_cost, storage_cost, demand, initial_workers, worker_salary, overtime_cost, recruitment_cost, layoff_cost, hours_per_pair, working_hours, max_overtime_hours, initial_stock):
-        m = Model('PL2')
-
-        # Decision Variables
-        production = m.addVars(months_number, vtype=GRB.INTEGER, name="Production")
-        workers = m.addVars(months_number, vtype=GRB.INTEGER, name="Workers")
-        stock = m.addVars(months_number, vtype=GRB.INTEGER, lb=0, name="Stock")
-        hired = m.addVars(months_number-1, vtype=GRB.INTEGER, lb=0, name="Hired")
-        laid_off = m.addVars(months_number-1, vtype=GRB.INTEGER, lb=0, name="Laid_Off")
-        overtime = m.addVars(months_number, vtype=GRB.INTEGER, lb=0, name="Overtime")
-
-        # Objective Function
-        m.setObjective(
-            quicksum(raw_material_cost * production[m] for m in range(months_number)) +
-            quicksum(storage_cost * stock[m] for m in range(months_number)) +
-            quicksum(worker_salary * workers[m] for m in range(months_number)) +
-            quicksum(overtime_cost * overtime[m] for m in range(months_number)) +
-            quicksum(recruitment_cost * hired[m] for m in range(months_number-1)) +
-            quicksum(layoff_cost * laid_off[m] for m in range(months_number-1)),
-            GRB.MINIMIZE
-        )
-
-        # Constraints
-        # Stock and production must meet demand
-        for mu in range(months_number):
-            m.addConstr(stock[mu] + production[mu] == demand[mu] + (stock[mu-1] if mu > 0 else initial_stock))
-
-        # Workers balance
-        for mi in range(1, months_number):
-            m.addConstr(workers[mi] == workers[mi-1] + hired[mi-1] - laid_off[mi-1])
-
-        # Initial number of workers
-        m.addConstr(workers[0] == initial_workers)
-
-        # Overtime per worker
-        for mp in range(months_number):
-            m.addConstr(overtime[mp] <= max_overtime_hours * workers[mp])
-
-        # Production capacity
-        for mo in range(months_number):
-            m.addConstr(production[mo] * hours_per_pair <= working_hours * workers[mo] + overtime[mo])
-
-        for mo in range(months_number):
-            m.addConstr(stock[mo] >= 0)
-        m.optimize()
-
-        results = {}
-        if m.status == GRB.OPTIMAL:
-            for month in range(months_number):
-                results[f"Month {month+1}"] = {
-                    "Production": production[month].X,
-                    "Workers": workers[month].X,
-                    "Stock": stock[month].X,
-                    "Hired": hired[month].X if month < months_number-1 else None,
-                    "Laid_Off": laid_off[month].X if month < months_number-1 else None,
-                    "Overtime": overtime[month].X
-                }
-        else:
-            raise Exception('No optimal solution found')
+        self.run_button = QPushButton("Run Optimization")
+        self.run_button.clicked.connect(self.run_optimization)
+        layout.addWidget(self.run_button)
+        self.stop_button = QPushButton("Stop")
+        self.stop_button.setEnabled(False)
+        self.stop_button.clicked.connect(self.stop_optimization)
+        layout.addWidget(self.stop_button)
+        self.progress_label = QLabel("")
+        layout.addWidget(self.progress_label)
+        # pl2_anytime.AnytimeSolver of the running solve
+        self.solver = None
 
-        return results
+        # Results: sortable table and chart over the same arrays
+        self.result_table = ResultTable(export_name="pl2_results")
+        self.figure = Figure(figsize=(5, 3), tight_layout=True)
+        self.canvas = FigureCanvasQTAgg(self.figure)
+        splitter = QSplitter(Qt.Vertical)
+        splitter.addWidget(self.result_table)
+        splitter.addWidget(self.canvas)
+        layout.addWidget(splitter)
+
+    def PL2(self, months_number, raw_material_cost, storage_cost, demand, initial_workers, worker_salary, overtime_cost, recruitment_cost, layoff_cost, hours_per_pair, working_hours, max_overtime_hours, initial_stock, metrics=None, backend=None):
+        return solve_pl2(months_number, raw_material_cost, storage_cost, demand, initial_workers, worker_salary, overtime_cost, recruitment_cost, layoff_cost, hours_per_pair, working_hours, max_overtime_hours, initial_stock, backend=backend or self.backend, metrics=metrics)
 
     def run_optimization(self):
         try:
-            C = float(self.inputs['C'].text())
-            Cs = float(self.inputs['Cs'].text())
-            D = [float(self.inputs[f'D{i+1}'].text()) for i in range(4)]
-            Ouv = int(self.inputs['Ouv'].text())
-            Sal = float(self.inputs['Sal'].text())
-            Hsup = float(self.inputs['Hsup'].text())
-            R = float(self.inputs['R'].text())
-            L = float(self.inputs['L'].text())
-            h = float(self.inputs['h'].text())
-            H = float(self.inputs['H'].text())
-            Hmax = float(self.inputs['Hmax'].text())
-            StockInit = float(self.inputs['StockInit'].text())
+            metrics = SolveMetrics("pl2")
+            with metrics.phase("parse"):
+                C = float(self.inputs['C'].text())
+                Cs = float(self.inputs['Cs'].text())
+                D = [float(self.inputs[f'D{i+1}'].text()) for i in range(4)]
+                Ouv = int(self.inputs['Ouv'].text())
+                Sal = float(self.inputs['Sal'].text())
+                Hsup = float(self.inputs['Hsup'].text())
+                R = float(self.inputs['R'].text())
+                L = float(self.inputs['L'].text())
+                h = float(self.inputs['h'].text())
+                H = float(self.inputs['H'].text())
+                Hmax = float(self.inputs['Hmax'].text())
+                StockInit = float(self.inputs['StockInit'].text())
+                gap = float(self.gap_entry.text()) / 100 if self.gap_entry.text().strip() else None
+                time_limit = float(self.time_entry.text()) if self.time_entry.text().strip() else None
+            if (self.backend or backends.DEFAULT_BACKEND) == "gurobi":
+                self.start_anytime((4, C, Cs, D, Ouv, Sal, Hsup, R, L, h, H, Hmax, StockInit), gap, time_limit, metrics)
+                return
             results = self.PL2(
-                4, C, Cs, D, Ouv, Sal, Hsup, R, L, h, H, Hmax, StockInit
+                4, C, Cs, D, Ouv, Sal, Hsup, R, L, h, H, Hmax, StockInit, metrics=metrics
             )
             # Display the results
-            self.result_text.clear()
-            for month, data in results.items():
-                self.result_text.append(f"Results for {month}:\n")
-                for key, value in data.items():
-                    if value is not None:  # Only display non-None values
-                        self.result_text.append(f"{key}: {value}")
-                self.result_text.append("")
+            with metrics.phase("format"):
+                self.show_results(results_arrays(results))
+            self.last_metrics = metrics.finish()
 
         except ValueError as ve:
             QMessageBox.critical(self, "Input Error", str(ve))
@@ -145,6 +326,66 @@ class ProductionOptimizationApp(QMainWindow):
             QMessageBox.critical(self, "Error", f"An unexpected error occurred: {str(e)}")
 
 
+    def start_anytime(self, args, gap, time_limit, metrics):
+        # Preview, then better plans as the MIP finds them; the last one stays on screen
+        from pl2_anytime import AnytimeSolver
+        self.solver = AnytimeSolver(args, gap, time_limit, metrics, self)
+        self.solver.updated.connect(self.show_update)
+        self.solver.finished.connect(self.finish_anytime)
+        self.solver.failed.connect(self.anytime_failed)
+        self.run_button.setEnabled(False)
+        self.stop_button.setEnabled(True)
+        self.progress_label.setText("Solving...")
+        self.solver.start()
+
+    def stop_optimization(self):
+        if self.solver is not None:
+            self.solver.stop()
+
+    def show_update(self, update):
+        if update["plan"] is not None:
+            self.show_results(results_arrays(update["plan"]))
+        text = f"{update['stage'].capitalize()}: cost {update['objective']:.2f}" if update["objective"] is not None \
+            else update["stage"].capitalize()
+        if update["gap"] is not None:
+            text += f", gap {100 * update['gap']:.2f}%"
+        self.progress_label.setText(f"{text} ({update['elapsed_s']:.2f} s)")
+
+    def finish_anytime(self, update):
+        metrics = self.solver.metrics
+        with metrics.phase("format"):
+            self.show_update(update)
+        self.last_metrics = metrics.finish()
+        self.anytime_done()
+
+    def anytime_failed(self, message):
+        self.progress_label.setText("")
+        QMessageBox.critical(self, "Error", f"An unexpected error occurred: {message}")
+        self.anytime_done()
+
+    def anytime_done(self):
+        self.solver = None
+        self.run_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+
+    def show_results(self, columns):
+        self.results = columns
+        self.result_table.set_columns(columns)
+        self.figure.clear()
+        ax = self.figure.add_subplot(111)
+        for field in ("Production", "Stock"):
+            ax.plot(columns["Month"], columns[field], label=field)
+        ax.set_xlabel("Month")
+        ax.set_ylabel("Pairs")
+        workers_ax = ax.twinx()
+        workers_ax.step(columns["Month"], columns["Workers"], where="mid", color="tab:green", label="Workers")
+        workers_ax.set_ylabel("Workers")
+        lines = ax.get_legend_handles_labels()
+        worker_lines = workers_ax.get_legend_handles_labels()
+        ax.legend(lines[0] + worker_lines[0], lines[1] + worker_lines[1], loc="upper left")
+        self.canvas.draw_idle()
+
+
 def main():
     app = QApplication(sys.argv)
     app.setStyleSheet("""
@@ -176,6 +417,12 @@ def main():
             border-radius: 8px;
             font-size: 12pt;
         }
+        QTableView, QHeaderView::section, QComboBox {
+            color: #fff;
+            background: #262D37;
+            gridline-color: #5A6270;
+            font-size: 11pt;
+        }
     """)
     ex = ProductionOptimizationApp()
     ex.show()
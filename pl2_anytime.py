@@ -0,0 +1,194 @@
+import threading
+import time
+
+import numpy as np
+from gurobipy import GRB, GurobiError
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from instrumentation import SolveMetrics
+from pl2 import PL2_INPUTS, RESULT_FIELDS, build_pl2_model
+from pl2_dp import greedy_production, plan_cost, workforce_dp
+
+# Stages of the updates sent while solving
+PREVIEW = "preview"      # rounded LP relaxation, before the MIP starts
+INCUMBENT = "incumbent"  # a better plan found by the MIP
+BOUND = "bound"          # the MIP lower bound moved, no new plan
+FINAL = "final"          # the returned plan, optimal or the best one when stopped
+
+
+# PL2 answered in stages for long horizons. The LP relaxation of build_pl2_model is solved first
+# and rounded into an integer plan with the exact steps of pl2_dp (the preview, a few ms); the
+# MIP then starts from that plan and every improving incumbent, and every move of the bound, is
+# reported with the current gap. The MIP stops at the optimum, at a user-set gap or time limit or
+# on request, and the best plan found so far is returned either way. Updates are dicts:
+#   {"stage", "plan" (PL2 result dictionary, None for BOUND), "objective", "bound", "gap", "elapsed_s"}
+
+def plan_results(values, months_number):
+    # {field: array} -> the PL2 result dictionary; Hired and Laid_Off have no last month
+    return {f"Month {month+1}": {name: (float(values[name][month]) if month < len(values[name]) else None)
+                                 for name in RESULT_FIELDS}
+            for month in range(months_number)}
+
+
+def round_plan(relaxed, months_number, raw_material_cost, storage_cost, demand, initial_workers, worker_salary,
+               overtime_cost, recruitment_cost, layoff_cost, hours_per_pair, working_hours, max_overtime_hours,
+               initial_stock):
+    # (integer plan as {field: array}, its cost) from the LP relaxation values: the LP workforce
+    # rounded up, the best production it can make (pl2_dp.greedy_production), then the cheapest
+    # workforce for that production (pl2_dp.workforce_dp)
+    hours = (hours_per_pair, working_hours, max_overtime_hours)
+    available = initial_stock + np.cumsum(np.asarray(demand[:months_number], dtype=float))
+    unit_cost = raw_material_cost - storage_cost * (months_number - np.arange(months_number))
+    workers = np.maximum(0, np.ceil(relaxed["Workers"] - 1e-6)).astype(int)
+    workers[0] = int(initial_workers)
+    production = greedy_production(workers, available, unit_cost, overtime_cost, *hours)
+    workers = workforce_dp(production, int(initial_workers), worker_salary, overtime_cost, recruitment_cost,
+                           layoff_cost, *hours).astype(float)
+    changes = np.diff(workers)
+    plan = {"Production": production, "Workers": workers, "Stock": available - np.cumsum(production),
+            "Hired": np.maximum(changes, 0), "Laid_Off": np.maximum(-changes, 0),
+            "Overtime": np.maximum(0.0, np.ceil(hours_per_pair * production - working_hours * workers - 1e-9))}
+    return plan, plan_cost(production, workers, available, raw_material_cost, storage_cost, worker_salary,
+                           overtime_cost, recruitment_cost, layoff_cost, hours_per_pair, working_hours)
+
+
+def group_values(flat, months_number):
+    # Values of the variables of build_pl2_model, in creation order, split into its groups
+    sizes = [months_number, months_number, months_number, months_number - 1, months_number - 1, months_number]
+    bounds = np.cumsum([0] + sizes)
+    return {name: np.asarray(flat[bounds[k]:bounds[k + 1]], dtype=float) for k, name in enumerate(RESULT_FIELDS)}
+
+
+def relative_gap(objective, bound):
+    if objective is None or bound is None or abs(objective) >= GRB.INFINITY or abs(bound) >= GRB.INFINITY:
+        return None
+    return abs(objective - bound) / max(abs(objective), 1e-10)
+
+
+def solve_pl2_anytime(months_number, raw_material_cost, storage_cost, demand, initial_workers, worker_salary,
+                      overtime_cost, recruitment_cost, layoff_cost, hours_per_pair, working_hours, max_overtime_hours,
+                      initial_stock, mip_gap=None, time_limit=None, on_update=None, stop=None, metrics=None):
+    # PL2 result dictionary of the best plan found; mip_gap (relative) and time_limit (seconds) stop
+    # the MIP early, and so does setting the threading.Event stop. on_update(update) is called from
+    # the solving thread for every stage (see above); the last call is the FINAL one.
+    if metrics is None:
+        metrics = SolveMetrics("pl2")
+    args = (months_number, raw_material_cost, storage_cost, demand, initial_workers, worker_salary, overtime_cost,
+            recruitment_cost, layoff_cost, hours_per_pair, working_hours, max_overtime_hours, initial_stock)
+    metrics.inputs = dict(zip(PL2_INPUTS, args))
+    started = time.perf_counter()
+    best = {"plan": None, "objective": None, "bound": None}
+
+    def send(stage, plan, objective, bound):
+        if on_update is not None:
+            on_update({"stage": stage, "plan": plan, "objective": objective, "bound": bound,
+                       "gap": relative_gap(objective, bound), "elapsed_s": time.perf_counter() - started})
+
+    # the MIP is built from scratch: the cached PL2Template cannot take a callback and gap or time limit
+    with metrics.phase("build"):
+        m, variables = build_pl2_model(*args)
+        m.update()
+        columns = [v for group in variables.values() for v in group.values()]
+
+    with metrics.phase("preview"):
+        relaxed = m.relax()
+        relaxed.Params.OutputFlag = 0
+        # through metrics like any solve: scheduled cores, tuning profile and capture; the MIP
+        # statistics recorded later replace the ones of the relaxation
+        metrics.optimize(relaxed)
+        start = None
+        if relaxed.Status == GRB.OPTIMAL:
+            best["bound"] = relaxed.ObjVal
+            try:
+                start, best["objective"] = round_plan(
+                    group_values(relaxed.getAttr("X", relaxed.getVars()), months_number), *args)
+            except Exception:
+                # the rounded workforce cannot make a feasible plan: the MIP starts cold
+                start = None
+        relaxed.dispose()
+    if start is not None:
+        best["plan"] = plan_results(start, months_number)
+        metrics.solve_stats.update(PreviewObjVal=best["objective"], RelaxationObjVal=best["bound"])
+        send(PREVIEW, best["plan"], best["objective"], best["bound"])
+        m.setAttr("Start", columns, [float(v) for name in RESULT_FIELDS for v in start[name]])
+
+    if mip_gap is not None:
+        m.Params.MIPGap = mip_gap
+    if time_limit is not None:
+        m.Params.TimeLimit = max(0.0, time_limit - (time.perf_counter() - started))
+
+    def report(model, where):
+        if stop is not None and stop.is_set():
+            model.terminate()
+        if where == GRB.Callback.MIPSOL:
+            objective = model.cbGet(GRB.Callback.MIPSOL_OBJ)
+            if best["objective"] is not None and objective >= best["objective"] - 1e-9:
+                return
+            best["plan"] = plan_results(group_values(model.cbGetSolution(columns), months_number), months_number)
+            best["objective"] = objective
+            # an early MIPSOL bound can be weaker than the LP relaxation's (or -infinity)
+            bound = model.cbGet(GRB.Callback.MIPSOL_OBJBND)
+            best["bound"] = bound if best["bound"] is None else max(best["bound"], bound)
+            send(INCUMBENT, best["plan"], objective, best["bound"])
+        elif where == GRB.Callback.MIP:
+            bound = model.cbGet(GRB.Callback.MIP_OBJBND)
+            if best["bound"] is None or bound > best["bound"] + 1e-9:
+                best["bound"] = bound
+                send(BOUND, None, best["objective"], bound)
+
+    if stop is None or not stop.is_set():
+        metrics.optimize(m, report)
+    with metrics.phase("extract"):
+        if m.SolCount and (best["objective"] is None or m.ObjVal <= best["objective"] + 1e-9):
+            best["plan"] = plan_results(group_values(m.getAttr("X", columns), months_number), months_number)
+            best["objective"] = m.ObjVal
+        try:
+            bound = m.ObjBound
+        except GurobiError:
+            # stopped before the search began
+            bound = None
+        if bound is not None and (best["bound"] is None or bound > best["bound"]):
+            best["bound"] = bound
+    m.dispose()
+    if best["plan"] is None:
+        raise Exception('No optimal solution found')
+    metrics.solve_stats["AnytimeGap"] = relative_gap(best["objective"], best["bound"])
+    send(FINAL, best["plan"], best["objective"], best["bound"])
+    return best["plan"]
+
+
+class AnytimeSolver(QObject):
+    # Runs solve_pl2_anytime in a background thread for the window: every update comes through
+    # updated(update) and the end through finished(update of the FINAL stage) or failed(message),
+    # all delivered to the GUI thread by Qt's event loop. stop() ends the MIP with the best plan.
+    updated = pyqtSignal(dict)
+    finished = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+    def __init__(self, args, mip_gap=None, time_limit=None, metrics=None, parent=None):
+        super().__init__(parent)
+        self.args = args
+        self.mip_gap = mip_gap
+        self.time_limit = time_limit
+        self.metrics = metrics
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="pl2-anytime", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+
+    def run(self):
+        def forward(update):
+            if update["stage"] == FINAL:
+                self.finished.emit(update)
+            else:
+                self.updated.emit(update)
+        try:
+            solve_pl2_anytime(*self.args, mip_gap=self.mip_gap, time_limit=self.time_limit, on_update=forward,
+                              stop=self.stopping, metrics=self.metrics)
+        except Exception as e:
+            self.failed.emit(str(e))
@@ -0,0 +1,191 @@
+import math
+
+import numpy as np
+
+import backends
+from instrumentation import SolveMetrics
+from pl2 import pl2_program
+
+# Alternations between the production greedy and the workforce DP
+DP_MAX_ROUNDS = 50
+# Plans further than this from the LP bound (relative) are solved again by the MIP; the same
+# tolerance as Gurobi's default MIPGap, so a plan returned by the DP is as good as the MIP's
+DP_GAP_TOLERANCE = 1e-4
+
+
+# The stock balance of PL2, stock[t] = stock[t-1] + demand[t] - production[t], makes every stock
+# variable a function of the cumulative production Q[t]:
+#     stock[t] = A[t] - Q[t]    with A[t] = initial_stock + demand[0] + ... + demand[t]
+# so the storage cost turns into a (negative) cost per pair produced in month t, and stock >= 0
+# into the nested limits Q[t] <= A[t]. Both halves of the problem then have an exact solver:
+#   - for a fixed workforce plan, the limits are nested, so taking the cheapest pairs first
+#     (regular hours, then overtime) gives the optimal production;
+#   - for a fixed production plan, the workforce is a DP over the number of workers in which
+#     hiring and layoffs are the transitions and overtime covers what regular hours do not.
+# The LP relaxation of PL2 gives the starting workforce (rounded up) and the lower bound; the
+# two exact steps then alternate until the cost stops improving. The alternation is a local
+# search, not an exact method: it can stop several percent above the optimum. Its plan is only
+# returned when the LP bound proves it within DP_GAP_TOLERANCE; otherwise the MIP solves the
+# instance (solve_stats["DPFallback"]).
+
+def _prepare(months_number, raw_material_cost, storage_cost, demand, initial_stock):
+    available = initial_stock + np.cumsum(np.asarray(demand[:months_number], dtype=float))
+    unit_cost = raw_material_cost - storage_cost * (months_number - np.arange(months_number))
+    return available, unit_cost
+
+
+def _capacity(workers, hours_per_pair, working_hours, max_overtime_hours):
+    regular = np.floor(working_hours * workers / hours_per_pair + 1e-9)
+    full = np.floor((working_hours + max_overtime_hours) * workers / hours_per_pair + 1e-9)
+    return regular, full
+
+
+def _overtime(production, workers, hours_per_pair, working_hours):
+    return np.maximum(0.0, np.ceil(hours_per_pair * production - working_hours * workers - 1e-9))
+
+
+def _transition(values, recruitment_cost, layoff_cost):
+    # best[w] = min over v of values[v] + recruitment_cost * (w - v)^+ + layoff_cost * (v - w)^+,
+    # with the argmin, as a running minimum upwards (hiring) and one downwards (layoffs)
+    w = np.arange(len(values))
+    up = values - recruitment_cost * w
+    up_min = np.minimum.accumulate(up)
+    up_arg = np.maximum.accumulate(np.where(up == up_min, w, 0))
+    down = (values + layoff_cost * w)[::-1]
+    down_min = np.minimum.accumulate(down)
+    down_arg = (len(values) - 1 - np.maximum.accumulate(np.where(down == down_min, w, 0)))[::-1]
+    up = up_min + recruitment_cost * w
+    down = down_min[::-1] - layoff_cost * w
+    return np.minimum(up, down), np.where(up <= down, up_arg, down_arg)
+
+
+def workforce_dp(production, initial_workers, worker_salary, overtime_cost, recruitment_cost, layoff_cost,
+                 hours_per_pair, working_hours, max_overtime_hours):
+    # Cheapest workforce plan able to make the given production. Returns the workers per month.
+    n = len(production)
+    needed = hours_per_pair * production
+    max_workers = max(int(initial_workers), int(math.ceil(needed.max(initial=0.0) / working_hours - 1e-9)))
+    workers = np.arange(max_workers + 1, dtype=float)
+    parents = []
+    value = None
+    for t in range(n):
+        overtime = np.maximum(0.0, np.ceil(needed[t] - working_hours * workers - 1e-9))
+        month = worker_salary * workers + overtime_cost * overtime
+        month[overtime > max_overtime_hours * workers + 1e-9] = np.inf
+        if t == 0:
+            value = np.full(len(workers), np.inf)
+            value[initial_workers] = month[initial_workers]
+        else:
+            previous, parent = _transition(value, recruitment_cost, layoff_cost)
+            value = previous + month
+            parents.append(parent)
+    w = int(np.argmin(value))
+    if not np.isfinite(value[w]):
+        raise Exception('No optimal solution found')
+    plan = np.empty(n, dtype=int)
+    for t in range(n - 1, -1, -1):
+        plan[t] = w
+        if t > 0:
+            w = int(parents[t - 1][w])
+    return plan
+
+
+def greedy_production(workers, available, unit_cost, overtime_cost, hours_per_pair, working_hours,
+                      max_overtime_hours):
+    # Optimal production for a fixed workforce plan under the limits Q[t] <= available[t]
+    n = len(workers)
+    regular, full = _capacity(workers.astype(float), hours_per_pair, working_hours, max_overtime_hours)
+    first_overtime = overtime_cost * _overtime(regular + 1, workers, hours_per_pair, working_hours)
+    # (cost per pair, month, pairs): regular hours, the first overtime pair, the other overtime pairs
+    tiers = []
+    for t in range(n):
+        tiers.append((unit_cost[t], t, regular[t]))
+        if full[t] > regular[t]:
+            tiers.append((unit_cost[t] + first_overtime[t], t, 1.0))
+            tiers.append((unit_cost[t] + overtime_cost * hours_per_pair, t, full[t] - regular[t] - 1))
+    slack = np.floor(available + 1e-9)
+    production = np.zeros(n)
+    for cost, t, pairs in sorted(tiers):
+        if cost >= 0:
+            break
+        amount = min(pairs, slack[t:].min())
+        if amount > 0:
+            production[t] += amount
+            slack[t:] -= amount
+    return production
+
+
+def plan_cost(production, workers, available, raw_material_cost, storage_cost, worker_salary, overtime_cost,
+              recruitment_cost, layoff_cost, hours_per_pair, working_hours):
+    stock = available - np.cumsum(production)
+    changes = np.diff(workers)
+    overtime = _overtime(production, workers, hours_per_pair, working_hours)
+    return float(raw_material_cost * production.sum() + storage_cost * stock.sum() + worker_salary * workers.sum() +
+                 overtime_cost * overtime.sum() + recruitment_cost * np.maximum(changes, 0).sum() +
+                 layoff_cost * np.maximum(-changes, 0).sum())
+
+
+def solve_pl2_dp(months_number, raw_material_cost, storage_cost, demand, initial_workers, worker_salary, overtime_cost,
+                 recruitment_cost, layoff_cost, hours_per_pair, working_hours, max_overtime_hours, initial_stock,
+                 metrics=None, max_rounds=DP_MAX_ROUNDS, gap_tolerance=DP_GAP_TOLERANCE):
+    # Same result dictionary as ProductionOptimizationApp.PL2; metrics.solve_stats holds the cost,
+    # the LP bound and the gap between them. gap_tolerance=None always returns the heuristic plan.
+    if metrics is None:
+        metrics = SolveMetrics("pl2")
+    n = months_number
+    initial_workers = int(initial_workers)
+    args = (months_number, raw_material_cost, storage_cost, demand, initial_workers, worker_salary, overtime_cost,
+            recruitment_cost, layoff_cost, hours_per_pair, working_hours, max_overtime_hours, initial_stock)
+    hours = (hours_per_pair, working_hours, max_overtime_hours)
+    costs = (raw_material_cost, storage_cost, worker_salary, overtime_cost, recruitment_cost, layoff_cost)
+
+    with metrics.phase("build"):
+        available, unit_cost = _prepare(n, raw_material_cost, storage_cost, demand, initial_stock)
+        program, _ = pl2_program(*args)
+        program.integer = [False] * program.num_vars
+    with metrics.phase("relax"):
+        relaxed = backends.get_backend("highs").solve(program)
+        if not relaxed.has_values:
+            raise Exception('No optimal solution found')
+    with metrics.phase("solve"):
+        workers = np.maximum(0, np.ceil(relaxed.values[n:2 * n] - 1e-6)).astype(int)
+        workers[0] = initial_workers
+        best_cost = np.inf
+        rounds = 0
+        for rounds in range(1, max_rounds + 1):
+            production = greedy_production(workers, available, unit_cost, overtime_cost, *hours)
+            workers = workforce_dp(production, initial_workers, worker_salary, overtime_cost, recruitment_cost,
+                                   layoff_cost, *hours)
+            cost = plan_cost(production, workers, available, *costs, hours_per_pair, working_hours)
+            if cost >= best_cost - 1e-9:
+                break
+            best_cost, best_workers, best_production = cost, workers, production
+
+    gap = (best_cost - relaxed.objective) / max(1.0, abs(best_cost))
+    metrics.solve_stats.update(Backend="dp", ObjVal=best_cost, ObjBound=relaxed.objective, IterCount=rounds,
+                               MIPGap=gap, Heuristic=True, DPFallback=False)
+    if gap_tolerance is not None and gap > gap_tolerance:
+        # not proven good enough: the plan may be a local optimum of the alternation
+        from pl2 import solve_pl2
+        metrics.solve_stats.update(DPObjVal=best_cost, DPGap=gap, Backend=backends.DEFAULT_BACKEND)
+        results = solve_pl2(*args, metrics=metrics)
+        metrics.solve_stats.update(Heuristic=False, DPFallback=True)
+        return results
+
+    with metrics.phase("extract"):
+        workers = best_workers.astype(float)
+        production = best_production
+        stock = available - np.cumsum(production)
+        overtime = _overtime(production, workers, hours_per_pair, working_hours)
+        changes = np.diff(workers)
+        results = {}
+        for month in range(n):
+            results[f"Month {month+1}"] = {
+                "Production": float(production[month]),
+                "Workers": float(workers[month]),
+                "Stock": float(stock[month]),
+                "Hired": float(max(changes[month], 0)) if month < n-1 else None,
+                "Laid_Off": float(max(-changes[month], 0)) if month < n-1 else None,
+                "Overtime": float(overtime[month])
+            }
+        return results
@@ -0,0 +1,151 @@
+import numpy as np
+from gurobipy import Model, GRB
+from scipy.sparse import coo_matrix
+
+from instrumentation import SolveMetrics
+
+
+# Production planning over (plant, SKU, period), generalizing PL2:
+#   - every plant keeps its own stock of every SKU, stock = previous stock + production - demand;
+#   - plants are grouped into labor pools (pool_of_plant), each with its own workforce, hiring,
+#     layoffs and overtime, whose hours cover the production of all its plants;
+#   - raw material cost, storage cost and hours per pair are per SKU, the labor costs per pool.
+# Inputs are arrays (NumPy, or anything np.asarray accepts, such as pandas objects) and every
+# constraint block is added through the matrix API, so the build is linear in the nonzeros.
+
+def _per(values, shape, name):
+    array = np.broadcast_to(np.asarray(values, dtype=float), shape)
+    if np.any(array < 0):
+        raise ValueError(f"{name} cannot be negative.")
+    return array
+
+
+def demand_from_frame(frame, plant="plant", sku="sku", period="period", demand="demand"):
+    # Long pandas table -> (plants x skus x periods) array with the labels of each axis;
+    # missing combinations have no demand
+    plants, plant_codes = np.unique(frame[plant].to_numpy(), return_inverse=True)
+    skus, sku_codes = np.unique(frame[sku].to_numpy(), return_inverse=True)
+    periods, period_codes = np.unique(frame[period].to_numpy(), return_inverse=True)
+    cube = np.zeros((len(plants), len(skus), len(periods)))
+    np.add.at(cube, (plant_codes, sku_codes, period_codes), frame[demand].to_numpy(dtype=float))
+    return cube, list(plants), list(skus), list(periods)
+
+
+def capacity_matrix(hours_per_pair, pool_of_plant, n_pools, periods):
+    # Sparse (pools * periods) x (plants * skus * periods) matrix of the hours each pair takes
+    # from the labor pool of its plant, in the flat order of the production variables
+    plants, skus = len(pool_of_plant), len(hours_per_pair)
+    i, k, t = np.meshgrid(np.arange(plants), np.arange(skus), np.arange(periods), indexing="ij")
+    rows = (pool_of_plant[i] * periods + t).ravel()
+    cols = ((i * skus + k) * periods + t).ravel()
+    data = hours_per_pair[k].ravel()
+    keep = data != 0
+    return coo_matrix((data[keep], (rows[keep], cols[keep])),
+                      shape=(n_pools * periods, plants * skus * periods)).tocsr()
+
+
+def build_plants_model(demand, raw_material_cost, storage_cost, hours_per_pair, initial_stock, pool_of_plant,
+                       initial_workers, worker_salary, overtime_cost, recruitment_cost, layoff_cost, working_hours,
+                       max_overtime_hours, integer=True):
+    # demand: (plants x skus x periods); raw_material_cost, storage_cost, hours_per_pair: (skus,);
+    # initial_stock: (plants x skus); pool_of_plant: (plants,) pool index of each plant;
+    # initial_workers and the labor parameters: (pools,) or scalars.
+    # Returns (model, variables) with variables shaped like the result arrays.
+    demand = _per(demand, np.shape(demand), "Demand")
+    plants, skus, periods = demand.shape
+    pool_of_plant = np.asarray(pool_of_plant, dtype=int)
+    if pool_of_plant.shape != (plants,):
+        raise ValueError(f"Expected a labor pool for each of the {plants} plants")
+    pools = int(pool_of_plant.max()) + 1
+    sku_shape = (plants, skus, periods)
+    pool_shape = (pools, periods)
+    raw_material_cost = _per(raw_material_cost, (skus,), "Raw material cost")
+    storage_cost = _per(storage_cost, (skus,), "Storage cost")
+    hours_per_pair = _per(hours_per_pair, (skus,), "Hours per pair")
+    initial_stock = _per(initial_stock, (plants, skus), "Initial stock")
+    initial_workers = _per(initial_workers, (pools,), "Initial workers")
+    worker_salary, overtime_cost, recruitment_cost, layoff_cost, working_hours, max_overtime_hours = (
+        _per(value, (pools,), name) for value, name in [
+            (worker_salary, "Worker salary"), (overtime_cost, "Overtime cost"), (recruitment_cost, "Recruitment cost"),
+            (layoff_cost, "Layoff cost"), (working_hours, "Working hours"), (max_overtime_hours, "Max overtime hours")])
+    n_sku = plants * skus * periods
+    n_pool = pools * periods
+    n_move = pools * (periods - 1)
+
+    # One column vector: production, stock, workers, hired, laid_off, overtime (each flattened
+    # row-major from the shapes of the results)
+    sizes = [n_sku, n_sku, n_pool, n_move, n_move, n_pool]
+    start = np.cumsum([0] + sizes)
+    obj = np.concatenate([
+        np.broadcast_to(raw_material_cost[None, :, None], sku_shape).ravel(),
+        np.broadcast_to(storage_cost[None, :, None], sku_shape).ravel(),
+        np.repeat(worker_salary, periods),
+        np.repeat(recruitment_cost, periods - 1),
+        np.repeat(layoff_cost, periods - 1),
+        np.repeat(overtime_cost, periods),
+    ])
+    m = Model('PL2_plants')
+    columns = m.addMVar(int(start[-1]), vtype=GRB.INTEGER if integer else GRB.CONTINUOUS, obj=obj)
+    m.ModelSense = GRB.MINIMIZE
+    production, stock, workers, hired, laid_off, overtime = (start[j] + np.arange(sizes[j]) for j in range(6))
+    shapes = [sku_shape, sku_shape, pool_shape, (pools, periods - 1), (pools, periods - 1), pool_shape]
+
+    def add(name, rows, cols, data, n_rows, sense, rhs):
+        matrix = coo_matrix((np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+                            shape=(n_rows, len(obj))).tocsr()
+        m.addMConstr(matrix, columns, sense, rhs, name=name)
+
+    # Stock balance per plant and SKU: stock[t] - stock[t-1] - production[t] = -demand[t]
+    rows = np.arange(n_sku)
+    later = rows[rows % periods != 0]
+    rhs = -demand.reshape(-1).copy()
+    rhs[::periods] += initial_stock.reshape(-1)
+    add("Stock", [rows, later, rows], [stock, stock[later - 1], production],
+        [np.ones(n_sku), -np.ones(len(later)), -np.ones(n_sku)], n_sku, GRB.EQUAL, rhs)
+
+    # Workforce balance per pool: workers[0] = initial, workers[t] = workers[t-1] + hired - laid_off
+    rows = np.arange(n_pool)
+    later = rows[rows % periods != 0]
+    moves = np.arange(n_move)
+    rhs = np.zeros(n_pool)
+    rhs[::periods] = initial_workers
+    add("Workers", [rows, later, later, later], [workers, workers[later - 1], hired[moves], laid_off[moves]],
+        [np.ones(n_pool), -np.ones(n_move), -np.ones(n_move), np.ones(n_move)], n_pool, GRB.EQUAL, rhs)
+
+    # Overtime per worker
+    add("Overtime", [rows, rows], [overtime, workers],
+        [np.ones(n_pool), -np.repeat(max_overtime_hours, periods)], n_pool, GRB.LESS_EQUAL, np.zeros(n_pool))
+
+    # Hours of every pool cover the production of its plants
+    capacity = capacity_matrix(hours_per_pair, pool_of_plant, pools, periods).tocoo()
+    add("Capacity", [capacity.row, rows, rows], [production[capacity.col], workers, overtime],
+        [capacity.data, -np.repeat(working_hours, periods), -np.ones(n_pool)], n_pool, GRB.LESS_EQUAL,
+        np.zeros(n_pool))
+
+    names = ["Production", "Stock", "Workers", "Hired", "Laid_Off", "Overtime"]
+    variables = {name: columns[int(start[j]):int(start[j + 1])].reshape(shapes[j]) for j, name in enumerate(names)}
+    return m, variables
+
+
+def extract_plants_results(m, variables):
+    if m.Status != GRB.OPTIMAL:
+        raise Exception('No optimal solution found')
+    results = {name: var.X for name, var in variables.items()}
+    results["Cost"] = m.ObjVal
+    return results
+
+
+def solve_plants(demand, raw_material_cost, storage_cost, hours_per_pair, initial_stock, pool_of_plant, initial_workers,
+                 worker_salary, overtime_cost, recruitment_cost, layoff_cost, working_hours, max_overtime_hours,
+                 integer=True, metrics=None):
+    # Result arrays by name ("Production" and "Stock" per plant x SKU x period, the workforce
+    # ones per pool x period) and the total "Cost"
+    if metrics is None:
+        metrics = SolveMetrics("pl2_plants")
+    with metrics.phase("build"):
+        m, variables = build_plants_model(demand, raw_material_cost, storage_cost, hours_per_pair, initial_stock,
+                                          pool_of_plant, initial_workers, worker_salary, overtime_cost,
+                                          recruitment_cost, layoff_cost, working_hours, max_overtime_hours, integer)
+    metrics.optimize(m)
+    with metrics.phase("extract"):
+        return extract_plants_results(m, variables)
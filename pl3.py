@@ -7,10 +7,115 @@ import numpy as np
 import gurobipy as gp
 from gurobipy import quicksum
 import pandas as pd
+import backends
+import jobs
+import results
+import templates
+from backends import LinearProgram
+from instrumentation import SolveMetrics
+
+JOURS = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche']
+
+
+def pattern_matrix(n=7, days_off=2):
+    # column c works n - days_off days starting on day c, then takes days_off consecutive days off
+    mat = np.ones((n, n), dtype=int)
+    for c in range(n):
+        i = c + n - days_off
+        for k in range(days_off):
+            mat[(i + k) % n, c] = 0
+    return mat
+
+
+def build_pl3_model(jours, days_off=2):
+    n = len(jours)
+    mat = pattern_matrix(n, days_off)
+    PL3 = gp.Model("PL3")
+    x = []
+    for i in range(n):
+        x.append(PL3.addVar(lb=0, vtype=gp.GRB.INTEGER, name='x' + str(i + 1)))
+    for j in range(n):
+        jour = JOURS[j] if n == 7 else f"jour {j + 1}"
+        PL3.addConstr(gp.quicksum(mat[j, :] * x) >= jours[j],
+                      "Nbre d'employé min requis pour " + jour + " est " + str(jours[j]))
+
+    PL3.setObjective(gp.quicksum(x), gp.GRB.MINIMIZE)
+    return PL3, x
+
+
+def extract_planning(model, x, days_off=2):
+    # result[i] is the number of employees whose days off start on day i
+    n = len(x)
+    aux = results.VarValues(range(n), results.read_attr(model, x)).rounded()
+    result = []
+    for i in range(n):
+        result.append(aux[(i + days_off) % n])
+    return result
+
+
+class PL3Template(templates.ModelTemplate):
+    # build_pl3_model compiled once per (cycle length, days off); only the daily requirements change
+    def build(self):
+        n, days_off = self.key
+        self.days_off = days_off
+        self.model = gp.Model("PL3")
+        self.x = self.model.addMVar(n, lb=0, vtype=gp.GRB.INTEGER, name='x')
+        self.rows = self.model.addMConstr(pattern_matrix(n, days_off), self.x, gp.GRB.GREATER_EQUAL, np.zeros(n))
+        self.model.setObjective(self.x.sum(), gp.GRB.MINIMIZE)
+
+    def patch(self, jours):
+        self.rows.RHS = jours
+
+    def results(self):
+        n = self.key[0]
+        aux = results.VarValues(range(n), results.read_attr(self.model, self.x)).rounded()
+        return [aux[(i + self.days_off) % n] for i in range(n)], self.model.ObjVal
+
+
+def pl3_program(jours, days_off=2):
+    # Same model as build_pl3_model for the non-Gurobi backends
+    n = len(jours)
+    mat = pattern_matrix(n, days_off)
+    program = LinearProgram("PL3")
+    x = program.add_vars(n, obj=1, integer=True, name='x')
+    for j in range(n):
+        program.add_constr({x[c]: 1 for c in range(n) if mat[j, c]}, ">=", jours[j])
+
+    def extract(solution):
+        if not solution.has_values:
+            raise Exception('No optimal solution found')
+        aux = [int(round(v)) for v in solution.values]
+        return [aux[(i + days_off) % n] for i in range(n)], solution.objective
+
+    return program, extract
+
+
+def solve_pl3(jours, days_off=2, backend=None, metrics=None):
+    # Returns (employees starting their days off on each day, total employees);
+    # backend "cyclic" is the combinatorial solver of pl3_cyclic
+    if metrics is None:
+        metrics = SolveMetrics("pl3")
+    if backend == "cyclic":
+        from pl3_cyclic import solve_pl3_cyclic
+        return solve_pl3_cyclic(jours, days_off, metrics)
+
+    def solve_gurobi():
+        if templates.ENABLED:
+            return templates.solve(PL3Template, (len(jours), days_off), metrics, jours)
+        with metrics.phase("build"):
+            PL3, x = build_pl3_model(jours, days_off)
+        metrics.optimize(PL3)
+        with metrics.phase("extract"):
+            return extract_planning(PL3, x, days_off), PL3.objVal
+
+    return backends.run(backend, solve_gurobi, lambda: pl3_program(jours, days_off), metrics)
+
 
 class PL3_Ui(QtWidgets.QWidget):
     def __init__(self):
         super().__init__()
+        # Solver backend name, None for the default one
+        self.backend = None
         self.initUI()
 
     def initUI(self):
@@ -62,68 +167,98 @@ class PL3_Ui(QtWidgets.QWidget):
 
         layout.addWidget(results_button)
 
+        # Many stores at once: one requirement row per store, read from a CSV/Excel file
+        batch_button = QtWidgets.QPushButton('Résoudre un fichier de magasins')
+        batch_button.clicked.connect(self.planification_magasins)
+        batch_button.setStyleSheet(results_button.styleSheet())
+        layout.addWidget(batch_button)
+
         self.setLayout(layout)
 
     def planification(self):
         try:
             # ===================INITILISATION
-            x1, x2, x3, x4, x5, x6, x7 = [int(field.text()) for field in self.input_fields]
-            jours = [x1, x2, x3, x4, x5, x6, x7]
-            jour = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche']
-            mat = np.ones((7, 7), dtype=int)
-            for c in range(7):
-                i = c + 5
-                mat[i % 7, c] = 0
-                mat[(i + 1) % 7, c] = 0
-
-            # ===================MODEL
-            PL3 = gp.Model("PL3")
-            x = []
-            for i in range(7):
-                x.append(PL3.addVar(lb=0, vtype=gp.GRB.INTEGER, name='x' + str(i + 1)))
-            X = np.array(x)
-            X = X.reshape((1, 7))
-            for j in range(7):
-                PL3.addConstr(gp.quicksum(mat[j, :] * x) >= jours[j],
-                            "Nbre d'employé min requis pour " + jour[j] + " est " + str(jours[j]))
+            metrics = SolveMetrics("pl3")
+            with metrics.phase("parse"):
+                x1, x2, x3, x4, x5, x6, x7 = [int(field.text()) for field in self.input_fields]
+                jours = [x1, x2, x3, x4, x5, x6, x7]
+
+            # ===================MODEL / PLANIFICATION
+            if jobs.ENABLED:
+                # solved by the job queue; the window stays free and job_finished shows the result
+                return self.submit_job(jours)
+            result, total = solve_pl3(jours, backend=self.backend, metrics=metrics)
+            self.last_metrics = metrics.finish()
+            self.show_planning(result, total)
+        except Exception as e:
+            # Show error message in a pop-up window
+            error_msg = f"An error occurred !!"
+            self.show_error_popup(error_msg)
 
-            PL3.setObjective(gp.quicksum(x), gp.GRB.MINIMIZE)
+    def submit_job(self, jours):
+        queue = jobs.shared_queue()
+        if getattr(self, "watcher", None) is None:
+            self.watcher = jobs.JobWatcher(queue, self)
+            self.watcher.finished.connect(self.job_finished)
+        self.watcher.watch(queue.submit("pl3", {"jours": jours}, self.backend))
 
-            PL3.optimize()
+    def job_finished(self, job):
+        if job["status"] != jobs.DONE:
+            self.show_error_popup(f"An error occurred !!\n{job['error']}")
+            return
+        self.last_metrics = job["metrics"]
+        try:
+            self.show_planning(job["result"]["planning"], job["result"]["total"])
+        except Exception:
+            self.show_error_popup("An error occurred !!")
 
-            # ===================PLANIFICATION
-            aux = []
+    def show_planning(self, result, total):
+        jour = JOURS
+        with open("Resolutions/PL3.txt", "w") as f:
+            sys.stdout = f
+            sheet = {}
+            print("plannification des congés ")
             for i in range(7):
-                aux.append(int(x[i].x))
-            result = []
+                print(jour[i] + "  :" + str(result[i]))
+                sheet.update({jour[i]: [result[i]]})
+            df = pd.DataFrame(sheet)
+            df.to_excel("Resolution_excel/pl3.xlsx", index=False)
+
+            # ===================RESOLUTION
+            print("le nombre totale optimale des employés est ", int(total))
+            # ===================DISPLAY RESULTS
+            result_text = "Plannification des congés :\n"
             for i in range(7):
-                result.append(aux[(i + 2) % 7])
-            with open("Resolutions/PL3.txt", "w") as f:
-                sys.stdout = f
-                sheet = {}
-                print("plannification des congés ")
-                for i in range(7):
-                    print(jour[i] + "  :" + str(result[i]))
-                    sheet.update({jour[i]: [result[i]]})
-                df = pd.DataFrame(sheet)
-                df.to_excel("Resolution_excel/pl3.xlsx", index=False)
-
-                # ===================RESOLUTION
-                print("le nombre totale optimale des employés est ", int(PL3.objVal))
-                # ===================DISPLAY RESULTS
-                result_text = "Plannification des congés :\n"
-                for i in range(7):
-                    result_text += f"{jour[i]}  : {result[i]}\n"
-
-                result_text += f"Le nombre total optimal des employés est {int(PL3.objVal)}" if hasattr(PL3, 'objVal') else \
-                    "Le nombre total optimal des employés n'est pas défini."
-
-                # Display results in a pop-up window
-                self.show_results_popup(result_text)
+                result_text += f"{jour[i]}  : {result[i]}\n"
+
+            result_text += f"Le nombre total optimal des employés est {int(total)}" if total is not None else \
+                "Le nombre total optimal des employés n'est pas défini."
+
+            # Display results in a pop-up window
+            self.show_results_popup(result_text)
+
+    def planification_magasins(self):
+        from pl3_batch import read_demand, solve_pl3_batch, export_batch
+
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Besoins des magasins", "",
+                                                        "Tableaux (*.csv *.xlsx *.xls)")
+        if not path:
+            return
+        try:
+            metrics = SolveMetrics("pl3")
+            stores, days, demand = read_demand(path)
+            schedule, totals = solve_pl3_batch(demand, backend=self.backend or "cyclic", metrics=metrics)
+            self.last_metrics = metrics.finish()
+            output, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Exporter les plannings",
+                                                              "Resolution_excel/pl3_magasins.xlsx",
+                                                              "Excel (*.xlsx);;CSV (*.csv);;Parquet (*.parquet)")
+            if output:
+                export_batch(output, schedule, totals, stores, days if len(days) == schedule.shape[1] else None)
+            self.show_results_popup(f"{len(stores)} magasins planifiés "
+                                    f"({metrics.solve_stats['DistinctStores']} besoins distincts)\n"
+                                    f"Le nombre total optimal des employés est {int(totals.sum())}")
         except Exception as e:
-            # Show error message in a pop-up window
-            error_msg = f"An error occurred !!"
-            self.show_error_popup(error_msg)
+            self.show_error_popup(f"An error occurred !!\n{e}")
 
     def show_results_popup(self, result_text):
         msg = QtWidgets.QMessageBox()
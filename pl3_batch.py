@@ -0,0 +1,101 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import scheduler
+from instrumentation import SolveMetrics
+from pl3 import JOURS, solve_pl3
+from pl3_cyclic import cyclic_staffing_batch
+
+# Distinct demand vectors solved per task sent to a worker process. The cyclic backend solves a
+# whole chunk in one set of array operations, so it takes much larger chunks.
+STORES_PER_TASK = 256
+CYCLIC_STORES_PER_TASK = 16384
+
+
+# Staffing for many stores at once: an (n_stores x days) array of daily requirements in, an
+# (n_stores x days) array of schedules (employees starting their days off on each day) and the
+# total per store out. Stores often share a requirement vector, so each distinct vector is solved
+# once; the distinct vectors are split into chunks solved in parallel worker processes. With the
+# cyclic backend each chunk is solved by cyclic_staffing_batch, vectorized over its stores;
+# the other backends build one model per store.
+
+def _solve_chunk(rows, days_off, backend):
+    if backend == "cyclic":
+        x, totals = cyclic_staffing_batch(rows, days_off)
+        # same day order as solve_pl3_cyclic
+        return np.roll(x, -days_off, axis=1), totals.astype(float)
+    metrics = SolveMetrics("pl3")
+    planning = np.empty_like(rows)
+    totals = np.empty(len(rows))
+    for k, jours in enumerate(rows):
+        result, totals[k] = solve_pl3(jours.tolist(), days_off, backend=backend, metrics=metrics)
+        planning[k] = result
+    return planning, totals
+
+
+def solve_pl3_batch(demand, days_off=2, backend="cyclic", workers=None, metrics=None):
+    # backend defaults to the combinatorial solver of pl3_cyclic, which is exact for these
+    # patterns and needs no license seat per worker. Returns (schedule, totals).
+    if metrics is None:
+        metrics = SolveMetrics("pl3")
+    with metrics.phase("parse"):
+        demand = np.ceil(np.asarray(demand, dtype=float))
+        if demand.ndim != 2:
+            raise ValueError("Expected an (n_stores x days) demand array")
+        if np.isnan(demand).any() or (demand < 0).any():
+            raise ValueError("Demand must be non-negative numbers")
+        unique, inverse = np.unique(demand.astype(np.int64), axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+
+    workers = workers or os.cpu_count() or 1
+    size = CYCLIC_STORES_PER_TASK if backend == "cyclic" else STORES_PER_TASK
+    chunks = [unique[i:i + size] for i in range(0, len(unique), size)]
+    with metrics.phase("solve"):
+        if workers == 1 or len(chunks) <= 1:
+            solved = [_solve_chunk(chunk, days_off, backend) for chunk in chunks]
+        else:
+            workers = min(workers, len(chunks))
+            with ProcessPoolExecutor(workers, initializer=scheduler.configure,
+                                     initargs=(scheduler.share_per_worker(workers),)) as pool:
+                solved = list(pool.map(_solve_chunk, chunks, [days_off] * len(chunks), [backend] * len(chunks)))
+
+    with metrics.phase("extract"):
+        if solved:
+            planning = np.concatenate([p for p, _ in solved])
+            totals = np.concatenate([t for _, t in solved])
+        else:
+            planning, totals = np.empty((0, demand.shape[1]), dtype=np.int64), np.empty(0)
+        planning, totals = planning[inverse], totals[inverse]
+        metrics.solve_stats.update(Stores=len(demand), DistinctStores=len(unique), ObjVal=float(totals.sum()))
+        return planning, totals
+
+
+def read_demand(path):
+    # CSV or Excel file with the store in the first column and one requirement column per day.
+    # Returns (store ids, day names, demand array).
+    frame = pd.read_excel(path) if path.lower().endswith((".xlsx", ".xls")) else pd.read_csv(path)
+    if frame.shape[1] < 2:
+        raise ValueError("Expected a store column followed by one column per day")
+    return frame.iloc[:, 0].tolist(), [str(c) for c in frame.columns[1:]], frame.iloc[:, 1:].to_numpy(dtype=float)
+
+
+def export_batch(path, schedule, totals, stores=None, days=None):
+    # Every store in one file (CSV, Excel or Parquet by extension): store, one column per day
+    # with the employees starting their days off that day, and the total
+    schedule = np.asarray(schedule)
+    if days is None:
+        days = JOURS if schedule.shape[1] == 7 else [f"jour {j + 1}" for j in range(schedule.shape[1])]
+    frame = pd.DataFrame(schedule, columns=list(days))
+    frame.insert(0, "Magasin", np.arange(1, len(schedule) + 1) if stores is None else list(stores))
+    frame["Total"] = np.asarray(totals).astype(np.int64)
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".xlsx", ".xls"):
+        frame.to_excel(path, index=False)
+    elif extension == ".parquet":
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+    return frame
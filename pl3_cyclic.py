@@ -0,0 +1,148 @@
+import math
+
+import numpy as np
+
+from instrumentation import SolveMetrics
+
+
+# PL3 is a cyclic staffing problem with consecutive days off: pattern c works every day except
+# the days_off days c - days_off, ..., c - 1 (mod n). Fixing the total number of employees T
+# makes it a network problem (Bartholdi, Orlin and Ratliff): with the prefix sums
+# S_i = x_0 + ... + x_{i-1}, S_0 = 0 and S_n = T, "at least d_j employees work on day j" reads
+# "at most T - d_j employees are off on day j", a bound on S over one circular window of
+# days_off patterns. Every constraint is then a difference S_v - S_u <= w, so a T is feasible
+# iff the constraint graph has no negative cycle, and Bellman-Ford distances give integer S
+# (hence integer x) directly. Feasibility is monotone in T, so the smallest feasible T above
+# the simple lower bounds is the optimum; it is almost always the bound itself or the next one.
+
+def _constraint_edges(jours, days_off):
+    # (u, v, w, t): S_v - S_u <= w + t * T
+    n = len(jours)
+    edges = [(c + 1, c, 0, 0) for c in range(n)]          # x_c >= 0
+    edges += [(0, n, 0, 1), (n, 0, 0, -1)]                 # S_n = T
+    for j, demand in enumerate(jours):
+        a = (j + 1) % n
+        b = a + days_off
+        if b <= n:
+            edges.append((a, b, -demand, 1))               # S_b - S_a <= T - d_j
+        else:
+            edges.append((a, b - n, -demand, 0))           # T - S_a + S_{b-n} <= T - d_j
+    return edges
+
+
+def _feasible(n, edges, total):
+    # Bellman-Ford from a virtual source joined to every node; None on a negative cycle
+    dist = [0] * (n + 1)
+    for _ in range(n + 1):
+        changed = False
+        for u, v, w, t in edges:
+            d = dist[u] + w + t * total
+            if d < dist[v]:
+                dist[v] = d
+                changed = True
+        if not changed:
+            return [dist[c + 1] - dist[c] for c in range(n)]
+    return None
+
+
+def cyclic_staffing(jours, days_off=2):
+    # Optimal employees per pattern (x[c] in the column order of pattern_matrix) and their total
+    n = len(jours)
+    if not 0 <= days_off < n:
+        raise ValueError(f"days_off must be between 0 and {n - 1}")
+    jours = [max(0, int(math.ceil(d))) for d in jours]
+    edges = _constraint_edges(jours, days_off)
+    low = max(max(jours, default=0), -(-sum(jours) // (n - days_off)))
+    x = _feasible(n, edges, low)
+    if x is not None:
+        return x, low
+    # Gallop up from the bound, then bisect; n * max(jours) employees always suffice
+    high = n * max(jours)
+    best = None
+    step = 1
+    while low + step < high:
+        x = _feasible(n, edges, low + step)
+        if x is not None:
+            high, best = low + step, x
+            break
+        low += step
+        step *= 2
+    while high - low > 1:
+        middle = (low + high) // 2
+        x = _feasible(n, edges, middle)
+        if x is None:
+            low = middle
+        else:
+            high, best = middle, x
+    if best is None:
+        best = _feasible(n, edges, high)
+    return best, high
+
+
+def _feasible_batch(structure, weights, totals):
+    # _feasible for many stores at once: the same edge sweeps, each relaxation applied to every
+    # store as one array operation. weights is (edges x stores). Returns (x, feasible) with x as
+    # (days x stores); columns of infeasible stores are garbage.
+    n = len(structure) // 2 - 1
+    dist = np.zeros((n + 1, len(totals)), dtype=np.int64)
+    shift = [t * totals for t in range(-1, 2)]
+    d = np.empty(len(totals), dtype=np.int64)
+    changed = np.zeros(len(totals), dtype=bool)
+    for _ in range(n + 1):
+        changed[:] = False
+        for e, (u, v, t) in enumerate(structure):
+            np.add(dist[u], weights[e], out=d)
+            if t:
+                d += shift[t + 1]
+            better = d < dist[v]
+            np.minimum(dist[v], d, out=dist[v])
+            changed |= better
+        if not changed.any():
+            break
+    return np.diff(dist, axis=0), ~changed
+
+
+def cyclic_staffing_batch(demand, days_off=2):
+    # cyclic_staffing of every row of an (n_stores x days) demand array: (x array, totals). All
+    # stores run the bound check and then the bisection on T together.
+    demand = np.maximum(0, np.ceil(np.asarray(demand, dtype=float))).astype(np.int64)
+    stores, n = demand.shape
+    if not 0 <= days_off < n:
+        raise ValueError(f"days_off must be between 0 and {n - 1}")
+    edges = _constraint_edges([0] * n, days_off)
+    structure = [(u, v, t) for u, v, _, t in edges]
+    # the demand rows come last, in day order
+    weights = np.zeros((len(edges), stores), dtype=np.int64)
+    weights[n + 2:] = -demand.T
+    low = np.maximum(demand.max(axis=1), -(-demand.sum(axis=1) // (n - days_off)))
+    x, feasible = _feasible_batch(structure, weights, low)
+    totals = low.copy()
+    pending = np.flatnonzero(~feasible)
+    # infeasible at the bound: bisect between it and n * max(jours), which always suffices
+    low, high = low[pending], n * demand[pending].max(axis=1)
+    probe = True
+    while pending.size:
+        open_ = high - low > 1
+        if not open_.any():
+            break
+        # the optimum is almost always the bound or the next one: try low + 1 first
+        middle = low[open_] + 1 if probe else (low[open_] + high[open_]) // 2
+        _, ok = _feasible_batch(structure, weights[:, pending[open_]], middle)
+        high[open_] = np.where(ok, middle, high[open_])
+        low[open_] = np.where(ok, low[open_], middle)
+        probe = False
+    if pending.size:
+        x[:, pending] = _feasible_batch(structure, weights[:, pending], high)[0]
+        totals[pending] = high
+    return x.T, totals
+
+
+def solve_pl3_cyclic(jours, days_off=2, metrics=None):
+    # Same result as solve_pl3: (employees starting their days off on each day, total employees)
+    if metrics is None:
+        metrics = SolveMetrics("pl3")
+    n = len(jours)
+    with metrics.phase("solve"):
+        x, total = cyclic_staffing(jours, days_off)
+    metrics.solve_stats.update(Backend="cyclic", ObjVal=total, ObjBound=total, MIPGap=0.0)
+    return [x[(i + days_off) % n] for i in range(n)], total
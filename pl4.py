@@ -1,7 +1,18 @@
 import sys
-from PyQt5.QtWidgets import QApplication, QWidget, QLabel, QLineEdit, QPushButton, QTextEdit, QVBoxLayout, QHBoxLayout, QMessageBox
+from PyQt5.QtWidgets import (QApplication, QWidget, QLabel, QLineEdit, QPushButton, QVBoxLayout, QHBoxLayout, QMessageBox,
+                             QFileDialog)
 import gurobipy as gp
 from gurobipy import GRB
+import numpy as np
+from scipy.sparse import issparse, triu
+import backends
+import pl4_dp
+import templates
+import warmstart
+from backends import LinearProgram, MAXIMIZE
+from instrumentation import SolveMetrics
+from pl4_geometry import load_regions, load_populations, adjacency_edges, sparse_adjacency
+from result_views import ResultTable
 
 # Given data from the problem statement
 populations = [2, 3, 4, 5, 6, 7, 8, 9, 10]  # Population in millions
@@ -19,6 +30,84 @@ adjacency_matrix = [
 ]
 
 
+def results_arrays(populations, branches_solution, dabs_solution):
+    # One row per region, as shown in the GUI table and exported; solutions may be lists or
+    # dicts keyed by region index
+    n = len(populations)
+    branches_solution = [branches_solution[i] for i in range(n)]
+    dabs_solution = [dabs_solution[i] for i in range(n)]
+    return {
+        "Region": np.arange(1, len(populations) + 1),
+        "Population": np.asarray(populations, dtype=float),
+        "Branch": np.asarray(branches_solution, dtype=float) > 0.5,
+        "DAB": np.asarray(dabs_solution, dtype=float) > 0.5,
+    }
+
+
+def neighbor_pairs(adjacency_matrix):
+    # (i, j), i < j, of the neighbouring regions; the matrix may be dense or a scipy sparse one
+    # (as built by pl4_geometry for large region sets)
+    if issparse(adjacency_matrix):
+        upper = triu(adjacency_matrix, k=1).tocoo()
+        keep = upper.data == 1
+        return tuple(sorted(zip(upper.row[keep].tolist(), upper.col[keep].tolist())))
+    return tuple((i, j) for i in range(len(adjacency_matrix)) for j in range(i + 1, len(adjacency_matrix[i]))
+                 if adjacency_matrix[i][j] == 1)
+
+
+def structure_items(n, pairs):
+    # warmstart fingerprint items of a region graph: one per region and one per neighbour pair
+    items = np.arange(n, dtype=np.uint64) << np.uint64(32)
+    if pairs:
+        i, j = np.array(pairs, dtype=np.uint64).T
+        items = np.concatenate([items, (i << np.uint64(32)) | (j + np.uint64(1))])
+    return items
+
+
+class BankBranchTemplate(templates.ModelTemplate):
+    # The model compiled once per region graph, keyed by (regions, neighbour pairs). The coverage
+    # term c * (1 - branch) * (1 - dab) is linearized as in BankBranchOptimization.program so that
+    # populations and coverage rates only touch objective coefficients; costs and budget are patched
+    # in the budget row.
+    def build(self):
+        n, pairs = self.key
+        m = self.model = gp.Model("BankBranchOptimization")
+        self.branches = m.addMVar(n, vtype=GRB.BINARY, name="branches")
+        self.dabs = m.addMVar(n, vtype=GRB.BINARY, name="dabs")
+        self.uncovered = m.addMVar(n, vtype=GRB.BINARY, name="uncovered")
+        m.ModelSense = GRB.MAXIMIZE
+        m.addConstr(self.uncovered + self.branches <= 1)
+        m.addConstr(self.uncovered + self.dabs <= 1)
+        m.addConstr(self.uncovered + self.branches + self.dabs >= 1)
+        self.budget = m.addConstr(self.branches.sum() + self.dabs.sum() <= 0, "Budget")
+        if pairs:
+            i, j = np.array(pairs).T
+            m.addConstr(self.branches[i] + self.branches[j] <= 1, "Neighboring")
+        m.update()
+        self.costs = (1.0, 1.0)
+
+    def patch(self, problem, start=None):
+        populations = np.array(problem.populations, dtype=float)
+        self.branches.Obj = populations * problem.a_coverage
+        self.dabs.Obj = populations * problem.b_coverage
+        self.uncovered.Obj = populations * problem.c_coverage
+        costs = (float(problem.branch_cost), float(problem.dab_cost))
+        for k, group in enumerate((self.branches, self.dabs)):
+            if costs[k] != self.costs[k]:
+                for var in group.tolist():
+                    self.model.chgCoeff(self.budget, var, costs[k])
+        self.costs = costs
+        self.budget.RHS = problem.budget
+        # a start left from an earlier solve of the template is cleared
+        branches, dabs = start if start is not None else (None, None)
+        warmstart.set_start(self.model, self.branches, branches)
+        warmstart.set_start(self.model, self.dabs, dabs)
+        warmstart.set_start(self.model, self.uncovered, None if start is None else ~(branches | dabs))
+
+    def results(self):
+        return self.branches.X.tolist(), self.dabs.X.tolist()
+
+
 # Optimization model class
 class BankBranchOptimization:
     def __init__(self, populations, adjacency_matrix, budget, branch_cost, dab_cost, a_coverage, b_coverage,
@@ -32,7 +121,7 @@ class BankBranchOptimization:
         self.b_coverage = b_coverage
         self.c_coverage = c_coverage
 
-    def run(self):
+    def build(self):
         model = gp.Model("BankBranchOptimization")
 
         # Decision variables
@@ -52,24 +141,155 @@ class BankBranchOptimization:
                         "Budget")
 
         # Neighboring regions constraint
-        for i in range(len(self.adjacency_matrix)):
-            for j in range(i + 1, len(self.adjacency_matrix[i])):
-                if self.adjacency_matrix[i][j] == 1:
-                    model.addConstr(branches[i] + branches[j] <= 1, f"Neighboring_{i}_{j}")
+        for i, j in neighbor_pairs(self.adjacency_matrix):
+            model.addConstr(branches[i] + branches[j] <= 1, f"Neighboring_{i}_{j}")
+        return model, branches, dabs
+
+    def program(self):
+        # Same model for the non-Gurobi backends. The objective term c * (1 - branch) * (1 - dab)
+        # is linearized with a binary uncovered[i] equal to that product.
+        n = len(self.populations)
+        program = LinearProgram("BankBranchOptimization", MAXIMIZE)
+        branches = [program.add_binary(self.populations[i] * self.a_coverage, f"branches[{i}]") for i in range(n)]
+        dabs = [program.add_binary(self.populations[i] * self.b_coverage, f"dabs[{i}]") for i in range(n)]
+        uncovered = [program.add_binary(self.populations[i] * self.c_coverage, f"uncovered[{i}]") for i in range(n)]
+        for i in range(n):
+            program.add_constr({uncovered[i]: 1, branches[i]: 1}, "<=", 1)
+            program.add_constr({uncovered[i]: 1, dabs[i]: 1}, "<=", 1)
+            program.add_constr({uncovered[i]: 1, branches[i]: 1, dabs[i]: 1}, ">=", 1)
+
+        budget = {b: self.branch_cost for b in branches}
+        budget.update({d: self.dab_cost for d in dabs})
+        program.add_constr(budget, "<=", self.budget, "Budget")
+
+        for i, j in neighbor_pairs(self.adjacency_matrix):
+            program.add_constr({branches[i]: 1, branches[j]: 1}, "<=", 1, f"Neighboring_{i}_{j}")
+
+        def extract(solution):
+            if not solution.has_values:
+                raise Exception('No optimal solution found')
+            return ([solution.values[b] for b in branches], [solution.values[d] for d in dabs])
+
+        return program, extract
+
+    def repair(self, branches, dabs, pairs):
+        # Makes a 0/1 plan feasible for this instance, then fills it up greedily: a branch next to
+        # a kept branch is dropped (most populated regions kept first), the items worth least per
+        # unit of cost are dropped until the budget holds, and what is left of the budget goes to
+        # the items worth most per unit of cost
+        populations = np.asarray(self.populations, dtype=float)
+        n = len(populations)
+        neighbours = [[] for _ in range(n)]
+        for i, j in pairs:
+            neighbours[i].append(j)
+            neighbours[j].append(i)
+        kept = np.zeros(n, dtype=bool)
+        for i in np.argsort(-populations, kind="stable").tolist():
+            if branches[i] and not any(kept[j] for j in neighbours[i]):
+                kept[i] = True
+        plan = [kept, np.array(dabs, dtype=bool)]
+        rates = (self.a_coverage, self.b_coverage)
+        costs = (float(self.branch_cost), float(self.dab_cost))
+
+        def gains(kind):
+            # objective change of setting the kind (0 branch, 1 DAB) of every region to 1, the
+            # other kind fixed: the region loses its c_coverage term unless the other kind is there
+            return populations * (rates[kind] - np.where(plan[1 - kind], 0.0, self.c_coverage))
 
-        # Solve the model
-        model.optimize()
+        spent = costs[0] * plan[0].sum() + costs[1] * plan[1].sum()
+        while spent > self.budget and (plan[0].any() or plan[1].any()):
+            ratios = [np.where(plan[kind], gains(kind) / max(costs[kind], 1e-9), np.inf) for kind in (0, 1)]
+            kind = 0 if ratios[0].min() <= ratios[1].min() else 1
+            plan[kind][ratios[kind].argmin()] = False
+            spent -= costs[kind]
 
-        # Collect results
-        branches_solution = model.getAttr('x', branches)
-        dabs_solution = model.getAttr('x', dabs)
-        return branches_solution, dabs_solution
+        candidates = [(gain / max(costs[kind], 1e-9), kind, i) for kind in (0, 1)
+                      for i, gain in enumerate(gains(kind).tolist()) if not plan[kind][i]]
+        for _, kind, i in sorted(candidates, reverse=True):
+            if plan[kind][i] or spent + costs[kind] > self.budget:
+                continue
+            if kind == 0 and any(plan[0][j] for j in neighbours[i]):
+                continue
+            if populations[i] * (rates[kind] - (0.0 if plan[1 - kind][i] else self.c_coverage)) <= 0:
+                continue
+            plan[kind][i] = True
+            spent += costs[kind]
+        return plan[0], plan[1]
+
+    def warm_start(self, pairs, metrics):
+        # (fingerprint, repaired (branches, dabs) of the closest solved region graph or None)
+        n = len(self.populations)
+        fingerprint, stored = warmstart.lookup("pl4", structure_items(n, pairs), metrics)
+        if stored is None:
+            return fingerprint, None
+        stored_plan = []
+        for name in ("branches", "dabs"):
+            chosen = np.zeros(n, dtype=bool)
+            indices = np.asarray(stored[name], dtype=np.int64)
+            chosen[indices[indices < n]] = True
+            stored_plan.append(chosen)
+        start = self.repair(*stored_plan, pairs)
+        metrics.warm_start["repaired"] = int(sum((a != b).sum() for a, b in zip(start, stored_plan)))
+        return fingerprint, start
+
+    def run(self, metrics=None, backend=None):
+        if metrics is None:
+            metrics = SolveMetrics("pl4")
+        metrics.inputs = {"populations": self.populations, "adjacency_matrix": self.adjacency_matrix,
+                          "budget": self.budget, "branch_cost": self.branch_cost, "dab_cost": self.dab_cost,
+                          "a_coverage": self.a_coverage, "b_coverage": self.b_coverage,
+                          "c_coverage": self.c_coverage}
+        pairs = neighbor_pairs(self.adjacency_matrix)
+
+        # backend "dp" is the tree-decomposition solver of pl4_dp; by default it also takes the
+        # region graphs narrow enough for it
+        if backend == "dp" or backend is None and pl4_dp.AUTO:
+            solution = pl4_dp.solve_pl4_dp(self, pairs, metrics, required=backend == "dp")
+            if solution is not None:
+                return solution
+
+        def solve_gurobi():
+            # started from the stored solution of the closest region graph, if any (see warmstart.py)
+            with metrics.phase("warm_start"):
+                fingerprint, start = self.warm_start(pairs, metrics)
+            if templates.ENABLED:
+                key = (len(self.populations), pairs)
+                solution = templates.solve(BankBranchTemplate, key, metrics, self, start)
+            else:
+                solution = solve_model(start)
+            plan = results_arrays(self.populations, *solution)
+            warmstart.remember("pl4", fingerprint, {"branches": np.flatnonzero(plan["Branch"]).tolist(),
+                                                    "dabs": np.flatnonzero(plan["DAB"]).tolist()}, metrics)
+            return solution
+
+        def solve_model(start):
+            with metrics.phase("build"):
+                model, branches, dabs = self.build()
+                if start is not None:
+                    warmstart.set_start(model, branches, start[0])
+                    warmstart.set_start(model, dabs, start[1])
+
+            # Solve the model
+            metrics.optimize(model)
+
+            # Collect results
+            with metrics.phase("extract"):
+                branches_solution = model.getAttr('x', branches)
+                dabs_solution = model.getAttr('x', dabs)
+            return branches_solution, dabs_solution
+
+        return backends.run(backend, solve_gurobi, self.program, metrics)
 
 
 # GUI class
 class BankBranchOptimizationGUI(QWidget):
     def __init__(self):
         super().__init__()
+        # Solver backend name, None for the default one
+        self.backend = None
+        # Regions of the problem statement until a region file is loaded
+        self.populations = populations
+        self.adjacency_matrix = adjacency_matrix
 
         self.init_ui()
 
@@ -100,46 +320,74 @@ class BankBranchOptimizationGUI(QWidget):
             input_layout.addWidget(label_widget)
             input_layout.addWidget(entry)
 
+        # Regions: the 9 of the problem statement, or polygons loaded from a GeoJSON file
+        self.regions_label = QLabel(f"{len(self.populations)} regions (problem statement)", self)
+        load_button = QPushButton("Load Regions", self)
+        load_button.clicked.connect(self.load_regions)
+        regions_layout = QHBoxLayout()
+        regions_layout.addWidget(self.regions_label)
+        regions_layout.addWidget(load_button)
+
         # Add run button
         run_button = QPushButton("Run Optimization", self)
         run_button.clicked.connect(self.run_gui_optimization)
 
-        # Add text widget to display results
-        self.result_text = QTextEdit(self)
-        self.result_text.setReadOnly(True)
+        # Sortable, filterable table of the regions
+        self.result_table = ResultTable(self, export_name="pl4_results")
 
         # Create main layout
         main_layout = QVBoxLayout(self)
         main_layout.addLayout(input_layout)
+        main_layout.addLayout(regions_layout)
         main_layout.addWidget(run_button)
-        main_layout.addWidget(self.result_text)
+        main_layout.addWidget(self.result_table)
 
-        self.setGeometry(100, 100, 420, 450)
+        self.setGeometry(100, 100, 480, 700)
+
+    def load_regions(self):
+        # Neighbours come from the shared polygon edges; populations from the features, or else
+        # from a CSV of region id and population
+        path, _ = QFileDialog.getOpenFileName(self, "Region boundaries", "", "GeoJSON (*.geojson *.json)")
+        if not path:
+            return
+        try:
+            ids, regions, region_populations = load_regions(path)
+            if region_populations is None:
+                population_path, _ = QFileDialog.getOpenFileName(self, "Region populations", "", "CSV (*.csv)")
+                if not population_path:
+                    return
+                region_populations = load_populations(population_path, ids)
+            edges = adjacency_edges(regions)
+            self.populations = region_populations
+            self.adjacency_matrix = sparse_adjacency(len(regions), edges)
+            self.regions_label.setText(f"{len(regions)} regions, {len(edges)} neighbour pairs")
+        except Exception as e:
+            QMessageBox.critical(self, "Region Error", str(e))
 
     def run_gui_optimization(self):
         try:
+            metrics = SolveMetrics("pl4")
             # Get values from entries
-            budget = float(self.budget_entry.text())
-            branch_cost = float(self.branch_cost_entry.text())
-            dab_cost = float(self.dab_cost_entry.text())
-            a_coverage = float(self.a_coverage_entry.text()) / 100  # Convert percentage to proportion
-            b_coverage = float(self.b_coverage_entry.text()) / 100  # Convert percentage to proportion
-            c_coverage = float(self.c_coverage_entry.text()) / 100  # Convert percentage to proportion
+            with metrics.phase("parse"):
+                budget = float(self.budget_entry.text())
+                branch_cost = float(self.branch_cost_entry.text())
+                dab_cost = float(self.dab_cost_entry.text())
+                a_coverage = float(self.a_coverage_entry.text()) / 100  # Convert percentage to proportion
+                b_coverage = float(self.b_coverage_entry.text()) / 100  # Convert percentage to proportion
+                c_coverage = float(self.c_coverage_entry.text()) / 100  # Convert percentage to proportion
 
             # Create an instance of the optimization model
-            optimization_model = BankBranchOptimization(populations, adjacency_matrix, budget, branch_cost, dab_cost,
-                                                        a_coverage, b_coverage, c_coverage)
+            optimization_model = BankBranchOptimization(self.populations, self.adjacency_matrix, budget, branch_cost,
+                                                        dab_cost, a_coverage, b_coverage, c_coverage)
 
             # Run the optimization
-            branches_solution, dabs_solution = optimization_model.run()
+            branches_solution, dabs_solution = optimization_model.run(metrics, self.backend)
 
             # Display results
-            self.result_text.clear()  # Clear previous results
-            self.result_text.insertPlainText("Optimal solution:\n")
-            for i in range(len(populations)):
-                branch_status = 'Yes' if branches_solution[i] > 0.5 else 'No'
-                dab_status = 'Yes' if dabs_solution[i] > 0.5 else 'No'
-                self.result_text.insertPlainText(f"Region {i + 1} - Branch: {branch_status}, DAB: {dab_status}\n")
+            with metrics.phase("format"):
+                self.results = results_arrays(self.populations, branches_solution, dabs_solution)
+                self.result_table.set_columns(self.results)
+            self.last_metrics = metrics.finish()
 
         except gp.GurobiError as e:
             QMessageBox.critical(self, "Gurobi Error", str(e))
@@ -180,6 +428,12 @@ if __name__ == '__main__':
         border-radius: 8px;
         font-size: 12pt;
     }
+    QTableView, QHeaderView::section, QComboBox {
+        color: #fff;
+        background: #262D37;
+        gridline-color: #5A6270;
+        font-size: 11pt;
+    }
     """
     app.setStyleSheet(stylesheet)
     gui = BankBranchOptimizationGUI()
@@ -0,0 +1,316 @@
+import functools
+import heapq
+import math
+import os
+
+import numpy as np
+
+from instrumentation import SolveMetrics
+
+# BankBranchOptimization.run picks this solver by itself (backend None) for region graphs of
+# min-fill width up to MAX_WIDTH on which it is expected to beat the MIP; LP_PL4_DP=0 leaves
+# them all to the MIP.
+AUTO = os.environ.get("LP_PL4_DP", "1") not in ("", "0")
+MAX_WIDTH = 8
+# Rough solve times fitted on benchmarks.pl4_dp (square maps and strips, 9 to 600 regions): the
+# DP takes DP_REGION_MS per region plus DP_CELL_MS per cell of estimated_work, building and
+# solving the MIP takes MIP_BASE_MS plus MIP_ELEMENT_MS per region and per neighbour pair. The
+# DP is picked when its estimate is at least AUTO_SPEEDUP times below the MIP's; both scale
+# alike with the machine, so only their ratio matters.
+DP_REGION_MS = 0.1
+DP_CELL_MS = 2.5e-6
+MIP_BASE_MS = 3.0
+MIP_ELEMENT_MS = 0.045
+AUTO_SPEEDUP = 1.25
+# Budget levels of the tables. Costs that are not multiples of a common unit (or budgets worth
+# more levels than this) are rounded up to budget / MAX_BUDGET_UNITS: the plan stays within the
+# budget but may not be optimal, so such instances are never picked automatically.
+MAX_BUDGET_UNITS = 5_000
+
+
+# The branch/DAB placement only couples regions through the neighbour exclusion of branches
+# (and the budget), so it is a weighted independent-set problem with a knapsack on top. Regional
+# adjacency graphs are planar and usually narrow, so it is solved exactly by dynamic programming
+# over a tree decomposition:
+#   - the regions are eliminated in min-fill order; eliminating v leaves its remaining
+#     neighbours (its separator) as a clique, and the bags {v} + separator form a tree
+#     decomposition whose parent links go to the first eliminated vertex of each separator;
+#   - the message of v is a table over the branch assignments of its separator and the budget
+#     spent, in units: the best population covered in the subtree of v. The children tables
+#     are combined by max-plus convolution along the budget, then v's own branch and DAB are
+#     chosen and v is maxed out;
+#   - the roots are combined the same way, and the plan is read back top-down by recomputing
+#     each node's options and splitting its budget among the children.
+# Width w and B budget units cost O(n 2^(w+1) B^2) time and O(n 2^w B) memory.
+
+@functools.lru_cache(maxsize=32)
+def decompose(n, pairs, max_width=None):
+    # Min-fill elimination of the region graph: (order, separators, parents, width), or None
+    # as soon as the width goes over max_width. pairs is the neighbor_pairs tuple; the result is
+    # shared by the solves of the same map and must not be modified.
+    adjacency = [set() for _ in range(n)]
+    for i, j in pairs:
+        adjacency[i].add(j)
+        adjacency[j].add(i)
+
+    def score(v):
+        # (fill edges eliminating v would add, degree)
+        neighbours = list(adjacency[v])
+        missing = sum(1 for k, a in enumerate(neighbours) for b in neighbours[k + 1:] if b not in adjacency[a])
+        return missing, len(neighbours)
+
+    scores = [score(v) for v in range(n)]
+    heap = [(*scores[v], v) for v in range(n)]
+    heapq.heapify(heap)
+    eliminated = np.zeros(n, dtype=bool)
+    order, separators = [], [None] * n
+    width = 0
+    while heap:
+        missing, degree, v = heapq.heappop(heap)
+        if eliminated[v] or (missing, degree) != scores[v]:
+            continue
+        neighbours = adjacency[v]
+        width = max(width, len(neighbours))
+        if max_width is not None and width > max_width:
+            return None
+        order.append(v)
+        separators[v] = sorted(neighbours)
+        eliminated[v] = True
+        for u in neighbours:
+            adjacency[u].discard(v)
+            adjacency[u] |= neighbours - {u}
+        affected = set(neighbours)
+        for u in neighbours:
+            affected |= adjacency[u]
+        adjacency[v] = set()
+        for u in affected:
+            scores[u] = score(u)
+            heapq.heappush(heap, (*scores[u], u))
+    position = {v: k for k, v in enumerate(order)}
+    parents = [min(separators[v], key=position.get) if separators[v] else None for v in range(n)]
+    return order, separators, parents, width
+
+
+def budget_units(budget, costs, num_regions):
+    # (unit, budget in units, costs in units, exact). Costs with up to three decimals are exact
+    # in units of their greatest common divisor.
+    total = num_regions * sum(costs)
+    for scale in (1, 10, 100, 1000):
+        scaled = [c * scale for c in costs]
+        if all(abs(c - round(c)) < 1e-9 for c in scaled):
+            divisor = math.gcd(*(int(round(c)) for c in scaled))
+            if divisor == 0:
+                return 1.0, 0, [0, 0], True
+            unit = divisor / scale
+            units = int(math.floor(min(budget, total) / unit + 1e-9))
+            if units <= MAX_BUDGET_UNITS:
+                return unit, units, [int(round(c / unit)) for c in costs], True
+            break
+    unit = min(budget, total) / MAX_BUDGET_UNITS
+    return unit, MAX_BUDGET_UNITS, [int(math.ceil(c / unit - 1e-9)) for c in costs], False
+
+
+def estimated_work(decomposition, cost_units, levels):
+    # Cells the DP touches: per node, a convolution with each further child costs the bag
+    # states times the budget columns both sides can reach, and v's own options the bag states
+    # times the budget levels
+    order, separators, parents, _ = decomposition
+    children = [[] for _ in order]
+    reach = [0] * len(order)
+    work = 0
+    for v in order:
+        states = 2 << len(separators[v])
+        spent = 1
+        for u in children[v]:
+            if spent > 1:
+                work += states * min(spent, reach[u]) * max(spent, reach[u])
+            spent = min(levels, spent + reach[u] - 1)
+        work += states * levels
+        reach[v] = min(levels, spent + sum(cost_units))
+        if parents[v] is not None:
+            children[parents[v]].append(v)
+    return work
+
+
+def _maxplus(a, b):
+    # out[:, k] = max over i + j = k of a[:, i] + b[:, j], up to the last budget level. Only the
+    # budget columns either table can reach are touched, so small subtrees stay cheap.
+    reach_a = np.flatnonzero(np.isfinite(a).any(axis=0))
+    reach_b = np.flatnonzero(np.isfinite(b).any(axis=0))
+    if len(reach_b) < len(reach_a):
+        a, b, reach_a, reach_b = b, a, reach_b, reach_a
+    levels = a.shape[1]
+    out = np.full(a.shape, -np.inf)
+    if not len(reach_b):
+        return out
+    last = int(reach_b[-1]) + 1
+    for i in reach_a.tolist():
+        width = min(last, levels - i)
+        np.maximum(out[:, i:i + width], a[:, i:i + 1] + b[:, :width], out=out[:, i:i + width])
+    return out
+
+
+@functools.lru_cache(maxsize=None)
+def _states(size):
+    # Branch bits of every assignment of a bag, bag[0] in the lowest bit
+    return (np.arange(1 << size)[:, None] >> np.arange(size)) & 1
+
+
+def _split(tables, total):
+    # Budget of each 1-D table such that they add up to total and reach the max-plus
+    # convolution of the tables at total
+    prefixes = [tables[0]]
+    for table in tables[1:]:
+        prefixes.append(_maxplus(prefixes[-1][None], table[None])[0])
+    parts = []
+    for k in range(len(tables) - 1, 0, -1):
+        candidates = prefixes[k - 1][total::-1] + tables[k][:total + 1]
+        j = int(np.argmax(candidates))
+        parts.append(j)
+        total -= j
+    parts.append(total)
+    return parts[::-1]
+
+
+class TreeDP:
+    # Messages of the decomposition for one instance; solve() returns the plan and its value
+    def __init__(self, problem, pairs, decomposition, cost_units, levels):
+        self.order, self.separators, self.parents, self.width = decomposition
+        n = len(problem.populations)
+        populations = np.asarray(problem.populations, dtype=float)
+        # value[v, b, d] of region v with branch b and DAB d
+        self.value = np.empty((n, 2, 2))
+        for b in (0, 1):
+            for d in (0, 1):
+                self.value[:, b, d] = populations * (problem.a_coverage * b + problem.b_coverage * d +
+                                                     problem.c_coverage * (1 - b) * (1 - d))
+        self.cost_units = cost_units
+        self.levels = levels
+        self.neighbours = [set() for _ in range(n)]
+        for i, j in pairs:
+            self.neighbours[i].add(j)
+            self.neighbours[j].add(i)
+        self.children = [[] for _ in range(n)]
+        self.roots = []
+        for v in self.order:
+            (self.roots if self.parents[v] is None else self.children[self.parents[v]]).append(v)
+        # bag positions of each child's separator, and weights turning its bits into message rows
+        self.projections = [[] for _ in range(n)]
+        for v in self.order:
+            bag_position = {w: p for p, w in enumerate([v] + self.separators[v])}
+            for u in self.children[v]:
+                positions = [bag_position[w] for w in self.separators[u]]
+                self.projections[v].append((u, positions, 1 << np.arange(len(positions))))
+        self.messages = [None] * n
+
+    def _child_tables(self, v, bits):
+        # Message of each child of v at the bag assignments in bits
+        for u, positions, weights in self.projections[v]:
+            yield self.messages[u][bits[:, positions] @ weights]
+
+    def _combine(self, tables, rows):
+        # Max-plus product of the children tables; nothing spent without children
+        table = None
+        for child in tables:
+            table = child if table is None else _maxplus(table, child)
+        if table is None:
+            table = np.full((rows, self.levels), -np.inf)
+            table[:, 0] = 0.0
+        return table
+
+    def _conflicts(self, v, bits):
+        # Assignments in bits (bag bits) with a branch on a neighbour of v in its separator
+        columns = [p for p, w in enumerate(self.separators[v], 1) if w in self.neighbours[v]]
+        return bits[:, columns].any(axis=1) if columns else np.zeros(len(bits), dtype=bool)
+
+    def _options(self, v):
+        # (b, d, cost, value) of v's branch and DAB choices that fit in the budget levels
+        for b in (0, 1):
+            for d in (0, 1):
+                cost = b * self.cost_units[0] + d * self.cost_units[1]
+                if cost < self.levels:
+                    yield b, d, cost, self.value[v, b, d]
+
+    def solve(self):
+        for v in self.order:
+            bits = _states(1 + len(self.separators[v]))
+            table = self._combine(self._child_tables(v, bits), len(bits))
+            # v is bit 0: even rows have no branch at v, odd rows have one (none next to a branch)
+            rows = (table[0::2], np.where(self._conflicts(v, bits[1::2])[:, None], -np.inf, table[1::2]))
+            message = np.full(rows[0].shape, -np.inf)
+            for b, _, cost, value in self._options(v):
+                np.maximum(message[:, cost:], rows[b][:, :self.levels - cost] + value, out=message[:, cost:])
+            self.messages[v] = message
+
+        roots = [self.messages[v][0] for v in self.roots]
+        total = roots[0][None]
+        for table in roots[1:]:
+            total = _maxplus(total, table[None])
+        spent = int(np.argmax(total[0]))
+        if not np.isfinite(total[0, spent]):
+            raise Exception('No optimal solution found')
+
+        n = len(self.value)
+        branches = np.zeros(n, dtype=int)
+        dabs = np.zeros(n, dtype=int)
+        target = dict(zip(self.roots, _split(roots, spent)))
+        for v in reversed(self.order):
+            separator = [branches[w] for w in self.separators[v]]
+            bits = np.array([[0] + separator, [1] + separator])
+            budget = target[v]
+            children = list(self._child_tables(v, bits))
+            table = self._combine(children, 2)
+            blocked = self._conflicts(v, bits)[1]
+            _, branches[v], dabs[v], cost = max((table[b, budget - cost] + value, b, d, cost)
+                                                for b, d, cost, value in self._options(v)
+                                                if cost <= budget and not (b and blocked))
+            if children:
+                tables = [child[branches[v]] for child in children]
+                target.update(zip(self.children[v], _split(tables, budget - cost)))
+        return branches, dabs
+
+
+def plan_value(problem, branches, dabs):
+    populations = np.asarray(problem.populations, dtype=float)
+    return float((populations * (problem.a_coverage * branches + problem.b_coverage * dabs +
+                                 problem.c_coverage * (1 - branches) * (1 - dabs))).sum())
+
+
+def dp_pays_off(n, n_pairs, work):
+    # Whether the DP is expected to be clearly faster than the MIP on this map (see DP_REGION_MS)
+    dp_ms = DP_REGION_MS * n + DP_CELL_MS * work
+    mip_ms = MIP_BASE_MS + MIP_ELEMENT_MS * (n + n_pairs)
+    return AUTO_SPEEDUP * dp_ms <= mip_ms
+
+
+def solve_pl4_dp(problem, pairs, metrics=None, required=True):
+    # Same (branches, dabs) lists as BankBranchOptimization.run for a BankBranchOptimization
+    # instance. Unless required, returns None when the instance is too wide for the DP (or its
+    # costs only discretize approximately) so that the caller can use the MIP; metrics.solve_stats
+    # holds the width either way.
+    if metrics is None:
+        metrics = SolveMetrics("pl4")
+    n = len(problem.populations)
+    if n == 0:
+        return [], []
+    costs = [float(problem.branch_cost), float(problem.dab_cost)]
+    if min(costs) < 0 or problem.budget < 0:
+        if required:
+            raise Exception('The DP needs non-negative costs and budget')
+        return None
+    with metrics.phase("build"):
+        decomposition = decompose(n, pairs, None if required else MAX_WIDTH)
+        if decomposition is None:
+            metrics.solve_stats["Width"] = f">{MAX_WIDTH}"
+            return None
+        unit, units, cost_units, exact = budget_units(problem.budget, costs, n)
+        work = estimated_work(decomposition, cost_units, units + 1)
+        metrics.solve_stats.update(Width=decomposition[3], BudgetUnits=units + 1, DPWork=work)
+        if not required and (not exact or not dp_pays_off(n, len(pairs), work)):
+            return None
+        dp = TreeDP(problem, pairs, decomposition, cost_units, units + 1)
+    with metrics.phase("solve"):
+        branches, dabs = dp.solve()
+    with metrics.phase("extract"):
+        metrics.solve_stats.update(Backend="dp", Exact=exact, ObjVal=plan_value(problem, branches, dabs))
+        return branches.astype(float).tolist(), dabs.astype(float).tolist()
@@ -0,0 +1,186 @@
+import csv
+import json
+
+import numpy as np
+from scipy.sparse import coo_matrix
+
+# Segment pairs tested at once by the exact shared-edge test (bounds the temporary arrays)
+SEGMENT_PAIRS_PER_CHUNK = 2_000_000
+# Distances below this share of the map extent count as zero
+RELATIVE_TOLERANCE = 1e-9
+
+
+# Neighbour graph of pl4 from region boundaries. Two regions are neighbours when their
+# boundaries share a piece of edge of positive length; touching at a corner does not count.
+#   - bounding boxes are hashed into a grid of cells about the size of a region, and only
+#     regions whose boxes meet in some cell become candidate pairs;
+#   - for every candidate pair, all segment pairs are tested at once for collinear overlap,
+#     so the shared edges need not have the same vertices on both sides.
+# A region is a list of rings, each a (k x 2) array of its vertices (closed or not); holes and
+# the parts of multipolygons are just more rings.
+
+def _ring(coordinates):
+    ring = np.asarray(coordinates, dtype=float)[:, :2]
+    if len(ring) > 1 and np.array_equal(ring[0], ring[-1]):
+        ring = ring[:-1]
+    return ring
+
+
+def load_regions(path, id_field="id", population_field="population"):
+    # GeoJSON FeatureCollection of Polygon/MultiPolygon features. Returns (ids, regions,
+    # populations), populations being None unless every feature has population_field.
+    with open(path, encoding="utf-8") as f:
+        features = json.load(f)["features"]
+    ids, regions, populations = [], [], []
+    for k, feature in enumerate(features):
+        geometry = feature["geometry"]
+        if geometry["type"] == "Polygon":
+            parts = [geometry["coordinates"]]
+        elif geometry["type"] == "MultiPolygon":
+            parts = geometry["coordinates"]
+        else:
+            raise ValueError(f"Feature {k}: unsupported geometry {geometry['type']!r}")
+        properties = feature.get("properties") or {}
+        ids.append(properties.get(id_field, feature.get("id", k)))
+        regions.append([_ring(ring) for part in parts for ring in part])
+        populations.append(properties.get(population_field))
+    if any(p is None for p in populations):
+        populations = None
+    else:
+        populations = [float(p) for p in populations]
+    return ids, regions, populations
+
+
+def load_populations(path, ids=None):
+    # CSV with a region id column and a population column (the first two columns). With ids, the
+    # populations come back in that order; otherwise in file order.
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = [row for row in csv.reader(f) if row]
+    try:
+        float(rows[0][1])
+    except ValueError:
+        rows = rows[1:]         # header
+    by_id = {row[0].strip(): float(row[1]) for row in rows}
+    if ids is None:
+        return list(by_id.values())
+    missing = [i for i in ids if str(i) not in by_id]
+    if missing:
+        raise ValueError(f"No population for regions {missing[:10]}")
+    return [by_id[str(i)] for i in ids]
+
+
+def _segments(regions):
+    # Every boundary segment as start/end points, with offsets[r]:offsets[r+1] those of region r
+    rings = [ring for rings in regions for ring in rings if len(ring) > 1]
+    counts = [sum(len(ring) for ring in rings if len(ring) > 1) for rings in regions]
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    if not rings:
+        return np.empty((0, 2)), np.empty((0, 2)), offsets
+    starts = np.concatenate(rings)
+    # the segment after the last vertex of a ring closes it back to its first vertex
+    sizes = np.array([len(ring) for ring in rings])
+    following = np.arange(1, len(starts) + 1)
+    following[np.cumsum(sizes) - 1] = np.cumsum(sizes) - sizes
+    return starts, starts[following], offsets
+
+
+def candidate_pairs(boxes, tolerance=0.0):
+    # (i, j), i < j, of the regions whose (xmin, ymin, xmax, ymax) boxes meet, found through
+    # the grid cells each box covers
+    n = len(boxes)
+    if n < 2:
+        return np.empty((0, 2), dtype=np.int64)
+    size = max(np.mean(np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])), tolerance, 1e-300)
+    origin = boxes[:, :2].min(axis=0) - tolerance
+    low = np.floor((boxes[:, :2] - tolerance - origin) / size).astype(np.int64)
+    high = np.floor((boxes[:, 2:] + tolerance - origin) / size).astype(np.int64)
+    spans = high - low + 1
+    per_region = spans[:, 0] * spans[:, 1]
+    region = np.repeat(np.arange(n), per_region)
+    local = np.arange(per_region.sum()) - np.repeat(np.cumsum(per_region) - per_region, per_region)
+    cell_x = low[region, 0] + local // spans[region, 1]
+    cell_y = low[region, 1] + local % spans[region, 1]
+    cell = cell_x * (high[:, 1].max() + 1) + cell_y
+    order = np.lexsort((region, cell))
+    cell, region = cell[order], region[order]
+    # regions sharing a cell: entry k with entry k + step of the same cell, for every step up
+    # to the size of the most crowded cell
+    pairs = []
+    step = 1
+    while step < len(cell):
+        same = np.flatnonzero(cell[step:] == cell[:-step])
+        if not len(same):
+            break
+        pairs.append(np.stack([region[same], region[same + step]], axis=1))
+        step += 1
+    if not pairs:
+        return np.empty((0, 2), dtype=np.int64)
+    pairs = np.concatenate(pairs)
+    key = np.unique(pairs[:, 0] * n + pairs[:, 1])
+    pairs = np.stack([key // n, key % n], axis=1)
+    a, b = boxes[pairs[:, 0]], boxes[pairs[:, 1]]
+    meet = ((a[:, 0] <= b[:, 2] + tolerance) & (b[:, 0] <= a[:, 2] + tolerance) &
+            (a[:, 1] <= b[:, 3] + tolerance) & (b[:, 1] <= a[:, 3] + tolerance))
+    return pairs[meet]
+
+
+def _shared_edge(p0, p1, q0, q1, tolerance):
+    # Whether segment q lies on the line of segment p over a length above tolerance
+    d = p1 - p0
+    length = np.sqrt((d * d).sum(axis=1))
+    valid = length > tolerance
+    length = np.where(valid, length, 1.0)
+    u = q0 - p0
+    v = q1 - p0
+    collinear = ((np.abs(d[:, 0] * u[:, 1] - d[:, 1] * u[:, 0]) <= tolerance * length) &
+                 (np.abs(d[:, 0] * v[:, 1] - d[:, 1] * v[:, 0]) <= tolerance * length))
+    t0 = (u * d).sum(axis=1) / length
+    t1 = (v * d).sum(axis=1) / length
+    overlap = np.minimum(length, np.maximum(t0, t1)) - np.maximum(0.0, np.minimum(t0, t1))
+    return valid & collinear & (overlap > tolerance)
+
+
+def adjacency_edges(regions, tolerance=None):
+    # Sparse neighbour list: (m x 2) array of region pairs (i, j), i < j, sorted
+    starts, ends, offsets = _segments(regions)
+    n = len(regions)
+    if len(starts) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    if tolerance is None:
+        extent = np.ptp(np.concatenate([starts, ends]), axis=0).max()
+        tolerance = RELATIVE_TOLERANCE * max(extent, 1.0)
+    boxes = np.full((n, 4), np.nan)
+    counts = np.diff(offsets)
+    present = counts > 0
+    boxes[present, :2] = np.minimum.reduceat(starts, offsets[:-1][present])
+    boxes[present, 2:] = np.maximum.reduceat(starts, offsets[:-1][present])
+    pairs = candidate_pairs(boxes[present], tolerance)
+    pairs = np.flatnonzero(present)[pairs] if len(pairs) else pairs
+
+    # all (segment of i) x (segment of j) combinations of the candidate pairs, chunk by chunk
+    found = []
+    work = counts[pairs[:, 0]] * counts[pairs[:, 1]]
+    chunk_of = (np.cumsum(work) - work) // SEGMENT_PAIRS_PER_CHUNK
+    for chunk in np.split(pairs, np.flatnonzero(np.diff(chunk_of)) + 1):
+        if not len(chunk):
+            continue
+        chunk_work = counts[chunk[:, 0]] * counts[chunk[:, 1]]
+        pair = np.repeat(np.arange(len(chunk)), chunk_work)
+        local = np.arange(chunk_work.sum()) - np.repeat(np.cumsum(chunk_work) - chunk_work, chunk_work)
+        width = counts[chunk[pair, 1]]
+        a = offsets[chunk[pair, 0]] + local // width
+        b = offsets[chunk[pair, 1]] + local % width
+        hit = _shared_edge(starts[a], ends[a], starts[b], ends[b], tolerance)
+        found.append(chunk[np.unique(pair[hit])])
+    if not found:
+        return np.empty((0, 2), dtype=np.int64)
+    edges = np.concatenate(found)
+    return edges[np.lexsort((edges[:, 1], edges[:, 0]))]
+
+
+def sparse_adjacency(n_regions, edges):
+    # Symmetric 0/1 matrix with ones on the diagonal, the sparse form of pl4.adjacency_matrix
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    rows = np.concatenate([edges[:, 0], edges[:, 1], np.arange(n_regions)])
+    cols = np.concatenate([edges[:, 1], edges[:, 0], np.arange(n_regions)])
+    return coo_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(n_regions, n_regions)).tocsr()
@@ -1,36 +1,334 @@
 import sys
+import os
+import csv
+import math
+import zlib
 import random
+import time
+from contextlib import contextmanager
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton,
-                             QGraphicsView, QGraphicsScene, QGraphicsRectItem, QGraphicsEllipseItem, QMessageBox)
-from PyQt5.QtCore import Qt, QRectF
-from PyQt5.QtGui import QBrush, QColor, QPen
+                             QGraphicsView, QGraphicsScene, QGraphicsItem, QGraphicsRectItem, QGraphicsEllipseItem,
+                             QMessageBox, QFileDialog, QOpenGLWidget, QCheckBox)
+from PyQt5.QtCore import Qt, QRectF, QPointF, QTimer, pyqtSignal
+from PyQt5.QtGui import QBrush, QColor, QPen, QFont
 from gurobipy import Model, GRB
+import numpy as np
+from scipy.sparse import csr_matrix
+import backends
+import results
+import streaming
+import warmstart
+from backends import LinearProgram, OPTIMAL
+from instrumentation import SolveMetrics
+
+# InteractiveMap rendering. Set LP_MAP_OPENGL=1 to draw the map through an OpenGL viewport.
+OPENGL = os.environ.get("LP_MAP_OPENGL", "") not in ("", "0")
+SITE_RADIUS = 5
+ZOOM_STEP = 1.25
+MIN_ZOOM, MAX_ZOOM = 0.01, 20.0
+# Zoomed out below CLUSTER_ZOOM, maps with at least CLUSTER_MIN_SITES sites draw clusters of
+# about CLUSTER_PIXELS on screen instead of every site
+CLUSTER_ZOOM = 0.5
+CLUSTER_MIN_SITES = 200
+CLUSTER_PIXELS = 40
+# QGraphicsItem.data keys of the zone name and the site index
+ZONE_KEY, SITE_KEY = 0, 1
+# Time given to recoloring sites per event-loop turn; the rest waits for the next turn
+FRAME_BUDGET_S = 0.008
 
 def generate_random_color():
     return QColor(random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
 
+def build_antenna_model(num_sites, coverage):
+    # coverage maps each zone name to the indices of the sites that cover it
+    model = Model("antenna_placement")
+    sites = model.addVars(num_sites, vtype=GRB.BINARY, name="Site")
+    model.setObjective(sites.sum(), GRB.MINIMIZE)
+
+    for zone_name, covering_sites in coverage.items():
+        model.addConstr(sum(sites[i] for i in covering_sites) >= 1, f"cover_{zone_name}")
+    return model, sites
+
+def extract_selected_sites(model, sites):
+    return results.extract(model, {"sites": sites})["sites"].selected()
+
+def coverage_items(coverage):
+    # warmstart fingerprint items of a coverage structure: one per (zone, covering site) pair
+    items = [np.asarray(sites, dtype=np.uint64) | np.uint64(zlib.crc32(str(zone_name).encode()) << 32)
+             for zone_name, sites in coverage.items()]
+    return np.concatenate(items) if items else np.empty(0, dtype=np.uint64)
+
+def repair_cover(num_sites, coverage, selected):
+    # Turns a stored selection into a cover of this instance: sites that no longer exist are
+    # dropped, each zone left uncovered gets the site covering most uncovered zones, then sites
+    # whose zones are all covered twice are dropped
+    chosen = np.zeros(num_sites, dtype=bool)
+    selected = np.asarray(selected, dtype=np.int64)
+    chosen[selected[selected < num_sites]] = True
+    lengths = [len(sites) for sites in coverage.values()]
+    columns = np.concatenate([np.asarray(sites, dtype=np.int64) for sites in coverage.values()]
+                             or [np.empty(0, dtype=np.int64)])
+    matrix = csr_matrix((np.ones(len(columns)), (np.repeat(np.arange(len(coverage)), lengths), columns)),
+                        shape=(len(coverage), num_sites))
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    by_site = matrix.T.tocsr()
+    counts = matrix @ chosen.astype(float)
+    # a zone no site covers stays uncovered; the model is infeasible anyway
+    open_zones = (counts == 0) & (np.diff(matrix.indptr) > 0)
+    while open_zones.any():
+        site = int(np.asarray(matrix[np.flatnonzero(open_zones)].sum(axis=0)).argmax())
+        zones = by_site.indices[by_site.indptr[site]:by_site.indptr[site + 1]]
+        chosen[site] = True
+        counts[zones] += 1
+        open_zones[zones] = False
+    for site in np.flatnonzero(chosen).tolist():
+        zones = by_site.indices[by_site.indptr[site]:by_site.indptr[site + 1]]
+        if (counts[zones] >= 2).all():
+            chosen[site] = False
+            counts[zones] -= 1
+    return chosen
+
+def antenna_start(num_sites, coverage, metrics):
+    # (fingerprint, repaired selection of the closest solved coverage structure or None)
+    fingerprint, stored = warmstart.lookup("pl5", coverage_items(coverage), metrics)
+    if stored is None:
+        return fingerprint, None
+    start = repair_cover(num_sites, coverage, stored["sites"])
+    before = np.zeros(num_sites, dtype=bool)
+    indices = np.asarray(stored["sites"], dtype=np.int64)
+    before[indices[indices < num_sites]] = True
+    metrics.warm_start["repaired"] = int((start != before).sum() + (indices >= num_sites).sum())
+    return fingerprint, start
+
+def antenna_program(num_sites, coverage):
+    # Same model as build_antenna_model for the non-Gurobi backends
+    program = LinearProgram("antenna_placement")
+    sites = [program.add_binary(1, f"Site[{i}]") for i in range(num_sites)]
+    for zone_name, covering_sites in coverage.items():
+        program.add_constr({sites[i]: 1 for i in covering_sites}, ">=", 1, f"cover_{zone_name}")
+
+    def extract(solution):
+        if solution.status != OPTIMAL:
+            return None
+        return results.from_solution(solution, {"sites": sites})["sites"].selected()
+
+    return program, extract
+
+def solve_antenna(num_sites, coverage, backend=None, metrics=None):
+    # Indices of the selected sites, None when no optimal placement was found
+    if metrics is None:
+        metrics = SolveMetrics("pl5")
+    metrics.inputs = {"num_sites": num_sites, "coverage": coverage}
+
+    def solve_gurobi():
+        # started from the stored solution of the closest coverage structure, if any (see warmstart.py)
+        with metrics.phase("warm_start"):
+            fingerprint, start = antenna_start(num_sites, coverage, metrics)
+        if sum(len(sites) for sites in coverage.values()) >= streaming.STREAMING_NONZEROS:
+            selected = solve_streaming(start)
+        else:
+            # no template: every site added in the window changes the coverage structure, so a
+            # cached model would never be reused (pl5_live keeps one model across edits instead)
+            selected = solve_model(start)
+        warmstart.remember("pl5", fingerprint, None if selected is None else {"sites": selected}, metrics)
+        return selected
+
+    def solve_model(start):
+        with metrics.phase("build"):
+            model, sites = build_antenna_model(num_sites, coverage)
+            if start is not None:
+                warmstart.set_start(model, sites, start)
+        metrics.optimize(model)
+        if model.status != GRB.OPTIMAL:
+            return None
+        with metrics.phase("extract"):
+            return extract_selected_sites(model, sites)
+
+    def solve_streaming(start):
+        # very large coverage: fed in CSR row slices, without one expression per zone
+        with metrics.phase("build"):
+            model, sites = streaming.antenna_model(num_sites, len(coverage), streaming.coverage_chunks(coverage))
+            if start is not None:
+                warmstart.set_start(model, sites, start)
+        metrics.optimize(model)
+        if model.status != GRB.OPTIMAL:
+            return None
+        with metrics.phase("extract"):
+            return results.extract(model, {"sites": sites})["sites"].selected()
+
+    return backends.run(backend, solve_gurobi, lambda: antenna_program(num_sites, coverage), metrics)
+
+def load_site_points(path):
+    # CSV of site coordinates, x and y in the first two columns, with or without a header
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = [row for row in csv.reader(f) if row]
+    try:
+        float(rows[0][0])
+    except (ValueError, IndexError):
+        rows = rows[1:]
+    return [(float(row[0]), float(row[1])) for row in rows]
+
+def zone_covers(zone_info, points):
+    # Mask of the sites (rows of an (n x 2) array of centers) whose disc overlaps the zone
+    return ((points[:, 0] + SITE_RADIUS > zone_info['x']) &
+            (points[:, 0] - SITE_RADIUS < zone_info['x'] + zone_info['width']) &
+            (points[:, 1] + SITE_RADIUS > zone_info['y']) &
+            (points[:, 1] - SITE_RADIUS < zone_info['y'] + zone_info['height']))
+
+def cluster_sites(points, selected, cell):
+    # Sites binned on a grid of the given cell size: (centers, sites per cluster, selected per cluster)
+    keys = np.floor(points / cell).astype(np.int64)
+    _, inverse, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+    centers = np.stack([np.bincount(inverse, points[:, k]) for k in range(2)], axis=1) / counts[:, None]
+    return centers, counts, np.bincount(inverse, selected, minlength=len(counts))
+
+class SiteClusters(QGraphicsItem):
+    # All clusters of one zoom level as a single item, painting only those in the exposed area
+    def __init__(self):
+        super().__init__()
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
+        self.centers = np.empty((0, 2))
+        self.counts = np.empty(0)
+        self.selected = np.empty(0)
+        self.radius = 1.0
+        self.rect = QRectF()
+
+    def set_clusters(self, centers, counts, selected, radius):
+        self.prepareGeometryChange()
+        self.centers, self.counts, self.selected, self.radius = centers, counts, selected, radius
+        if len(centers):
+            low, high = centers.min(axis=0) - radius, centers.max(axis=0) + radius
+            self.rect = QRectF(low[0], low[1], high[0] - low[0], high[1] - low[1])
+        else:
+            self.rect = QRectF()
+        self.update()
+
+    def boundingRect(self):
+        return self.rect
+
+    def paint(self, painter, option, widget=None):
+        exposed = option.exposedRect
+        r = self.radius
+        visible = np.flatnonzero((self.centers[:, 0] >= exposed.left() - r) & (self.centers[:, 0] <= exposed.right() + r) &
+                                 (self.centers[:, 1] >= exposed.top() - r) & (self.centers[:, 1] <= exposed.bottom() + r))
+        pen = QPen(QColor(0, 0, 0), 1)
+        pen.setCosmetic(True)
+        painter.setPen(pen)
+        font = QFont(painter.font())
+        font.setPixelSize(max(1, round(0.8 * r)))
+        painter.setFont(font)
+        largest = self.counts.max(initial=1)
+        for k in visible:
+            x, y = self.centers[k]
+            size = r * (0.4 + 0.6 * math.sqrt(self.counts[k] / largest))
+            painter.setBrush(QBrush(Qt.green if self.selected[k] else Qt.white))
+            painter.drawEllipse(QPointF(x, y), size, size)
+            if self.counts[k] > 1:
+                painter.drawText(QRectF(x - size, y - size, 2 * size, 2 * size), Qt.AlignCenter, str(self.counts[k]))
+
 class InteractiveMap(QGraphicsView):
-    def __init__(self, zones, parent=None):
+    # Zones and sites are looked up through the scene's BSP index (hover, clicks); sites give way
+    # to SiteClusters when zoomed out. Wheel zooms around the cursor, right or middle drag pans,
+    # left click adds a site.
+    # sitesAdded(first index, [(x, y), ...]) follows every click or batch load.
+    sitesAdded = pyqtSignal(int, list)
+
+    def __init__(self, zones, parent=None, opengl=None):
         super().__init__(parent)
         self.scene = QGraphicsScene(self)
+        self.scene.setItemIndexMethod(QGraphicsScene.BspTreeIndex)
         self.setScene(self.scene)
-        self.setFixedSize(800, 600)
+        self.setMinimumSize(800, 600)
+        if OPENGL if opengl is None else opengl:
+            self.setViewport(QOpenGLWidget())
+        self.setCacheMode(QGraphicsView.CacheBackground)
+        self.setOptimizationFlags(QGraphicsView.DontSavePainterState | QGraphicsView.DontAdjustForAntialiasing)
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
         self.sites = []
+        self.site_points = []
+        self.selected = []
         self.zones = zones
+        self.clustered = False
+        self.clusters = SiteClusters()
+        self.clusters.setVisible(False)
+        self.cluster_level = None
+        self.panning = None
+        # site index -> selected, waiting to be painted
+        self.pending_colors = {}
+        self.color_timer = QTimer(self)
+        self.color_timer.setSingleShot(True)
+        self.color_timer.timeout.connect(self.paint_pending_colors)
+        self.scene.addItem(self.clusters)
         self.draw_zones()
         self.setMouseTracking(True)
 
+    @contextmanager
+    def batched_insertion(self):
+        # Items are added without index updates; the BSP tree is rebuilt once at the end, over
+        # a scene rect fixed afterwards (a rect set before the rebuild leaves the tree unbalanced)
+        self.scene.setItemIndexMethod(QGraphicsScene.NoIndex)
+        try:
+            yield
+        finally:
+            self.scene.setItemIndexMethod(QGraphicsScene.BspTreeIndex)
+            self.update_scene_rect()
+
     def draw_zones(self):
-        boundary_pen = QPen(QColor(0, 0, 0), 10)  # Thick black border for zones
-        for zone_name, zone_info in self.zones.items():
-            rect = QRectF(zone_info['x'], zone_info['y'], zone_info['width'], zone_info['height'])
-            zone_rect = QGraphicsRectItem(rect)
-            zone_rect.setBrush(QBrush(zone_info['color']))
-            zone_rect.setPen(boundary_pen)
-            self.scene.addItem(zone_rect)
-            self.zones[zone_name]['rect'] = zone_rect
+        boundary_pen = QPen(QColor(0, 0, 0), 3)  # Thick black border for zones, same width at any zoom
+        boundary_pen.setCosmetic(True)
+        with self.batched_insertion():
+            for zone_name, zone_info in self.zones.items():
+                rect = QRectF(zone_info['x'], zone_info['y'], zone_info['width'], zone_info['height'])
+                zone_rect = QGraphicsRectItem(rect)
+                zone_rect.setBrush(QBrush(zone_info['color']))
+                zone_rect.setPen(boundary_pen)
+                zone_rect.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+                zone_rect.setData(ZONE_KEY, zone_name)
+                self.scene.addItem(zone_rect)
+                self.zones[zone_name]['rect'] = zone_rect
+
+    def update_scene_rect(self):
+        bounds = self.scene.itemsBoundingRect()
+        margin = max(bounds.width(), bounds.height(), 1.0) * 0.1
+        self.scene.setSceneRect(bounds.adjusted(-margin, -margin, margin, margin))
+
+    def zoom(self):
+        return self.transform().m11()
+
+    def wheelEvent(self, event):
+        zoom = min(MAX_ZOOM, max(MIN_ZOOM, self.zoom() * ZOOM_STEP ** (event.angleDelta().y() / 120)))
+        factor = zoom / self.zoom()
+        self.scale(factor, factor)
+        self.update_level_of_detail()
+
+    def update_level_of_detail(self, force=False):
+        # Clusters are recomputed when the zoom crosses a power of two (or the sites change)
+        zoom = self.zoom()
+        clustered = zoom < CLUSTER_ZOOM and len(self.sites) >= CLUSTER_MIN_SITES
+        level = math.floor(math.log2(zoom)) if clustered else None
+        if level == self.cluster_level and not force:
+            return
+        self.cluster_level = level
+        if clustered != self.clustered:
+            for site, _ in self.sites:
+                site.setVisible(not clustered)
+            self.clustered = clustered
+        self.clusters.setVisible(clustered)
+        if clustered:
+            scale = 2.0 ** level
+            centers, counts, selected = cluster_sites(np.array(self.site_points), np.array(self.selected, dtype=float),
+                                                      CLUSTER_PIXELS / scale)
+            self.clusters.set_clusters(centers, counts, selected, 0.45 * CLUSTER_PIXELS / scale)
 
     def mouseMoveEvent(self, event):
+        if self.panning is not None:
+            delta = event.pos() - self.panning
+            self.panning = event.pos()
+            self.horizontalScrollBar().setValue(self.horizontalScrollBar().value() - delta.x())
+            self.verticalScrollBar().setValue(self.verticalScrollBar().value() - delta.y())
+            return
         scene_pos = self.mapToScene(event.pos())
         on_boundary = self.is_on_boundary(scene_pos)
         if on_boundary:
@@ -39,22 +337,78 @@ class InteractiveMap(QGraphicsView):
             self.setCursor(Qt.ArrowCursor)  # Default cursor elsewhere
 
     def is_on_boundary(self, pos):
-        for zone_info in self.zones.values():
-            if zone_info['rect'].sceneBoundingRect().contains(pos):
-                return True
-        return False
+        # Only the items under pos, found through the scene index
+        return any(item.data(ZONE_KEY) is not None for item in self.scene.items(pos))
 
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
             self.add_site(event.pos())
+        elif event.button() in (Qt.RightButton, Qt.MiddleButton):
+            self.panning = event.pos()
+            self.setCursor(Qt.ClosedHandCursor)
+
+    def mouseReleaseEvent(self, event):
+        if event.button() in (Qt.RightButton, Qt.MiddleButton) and self.panning is not None:
+            self.panning = None
+            self.setCursor(Qt.ArrowCursor)
+
+    def new_site(self, x, y):
+        site = QGraphicsEllipseItem(x - SITE_RADIUS, y - SITE_RADIUS, 2 * SITE_RADIUS, 2 * SITE_RADIUS)
+        site.setBrush(QBrush(Qt.white))  # Set site color to white
+        site.setData(SITE_KEY, len(self.sites))
+        site.setVisible(not self.clustered)
+        self.scene.addItem(site)
+        self.sites.append((site, None))
+        self.site_points.append((x, y))
+        self.selected.append(False)
+        return site
 
     def add_site(self, pos):
         scene_pos = self.mapToScene(pos)
         if self.is_on_boundary(scene_pos):
-            site = QGraphicsEllipseItem(scene_pos.x() - 5, scene_pos.y() - 5, 10, 10)
-            site.setBrush(QBrush(Qt.white))  # Set site color to white
-            self.scene.addItem(site)
-            self.sites.append((site, None))
+            self.new_site(scene_pos.x(), scene_pos.y())
+            self.update_level_of_detail(force=True)
+            self.sitesAdded.emit(len(self.sites) - 1, [(scene_pos.x(), scene_pos.y())])
+
+    def add_sites(self, points):
+        # Batched load of a site list; like clicks, points outside every zone are skipped.
+        # Returns the number of sites added.
+        inside = [(x, y) for x, y in points if self.is_on_boundary(QPointF(x, y))]
+        first = len(self.sites)
+        with self.batched_insertion():
+            for x, y in inside:
+                self.new_site(x, y)
+        self.update_level_of_detail(force=True)
+        if inside:
+            self.sitesAdded.emit(first, inside)
+        return len(inside)
+
+    def show_selection(self, indices):
+        # Selected sites green, the others white. Only the sites whose color changes are
+        # repainted, FRAME_BUDGET_S worth per event-loop turn, so a large change never freezes
+        # the view; a newer selection replaces what is still pending.
+        target = np.zeros(len(self.sites), dtype=bool)
+        target[list(indices)] = True
+        changed = np.flatnonzero(target != np.array(self.selected, dtype=bool))
+        self.pending_colors = {int(i): bool(target[i]) for i in changed}
+        if self.pending_colors:
+            self.paint_pending_colors()
+
+    def paint_pending_colors(self):
+        deadline = time.perf_counter() + FRAME_BUDGET_S
+        while self.pending_colors and time.perf_counter() < deadline:
+            for _ in range(min(256, len(self.pending_colors))):
+                i, selected = self.pending_colors.popitem()
+                self.sites[i][0].setBrush(QBrush(Qt.green if selected else Qt.white))
+                self.selected[i] = selected
+        if self.pending_colors:
+            self.color_timer.start(0)
+        elif self.clustered:
+            self.update_level_of_detail(force=True)
+
+    def fit_all(self):
+        self.fitInView(self.scene.itemsBoundingRect(), Qt.KeepAspectRatio)
+        self.update_level_of_detail()
 
 class MainApplicationWindow(QMainWindow):
     def __init__(self):
@@ -62,6 +416,10 @@ class MainApplicationWindow(QMainWindow):
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
         self.zones = {}
+        # Solver backend name, None for the default one
+        self.backend = None
+        # pl5_live.LiveSolver while live re-solve is on
+        self.live = None
         self.init_ui()
 
     def init_ui(self):
@@ -82,6 +440,16 @@ class MainApplicationWindow(QMainWindow):
         self.solve_button.clicked.connect(self.solve_optimization)
         self.solve_button.setEnabled(False)
         buttons_layout.addWidget(self.solve_button)
+        self.load_sites_button = QPushButton('Load Sites', self)
+        self.load_sites_button.clicked.connect(self.load_sites)
+        self.load_sites_button.setEnabled(False)
+        buttons_layout.addWidget(self.load_sites_button)
+        self.live_checkbox = QCheckBox('Live re-solve', self)
+        self.live_checkbox.toggled.connect(self.set_live)
+        self.live_checkbox.setEnabled(False)
+        buttons_layout.addWidget(self.live_checkbox)
+        self.live_label = QLabel('', self)
+        buttons_layout.addWidget(self.live_label)
 
         # Add buttons layout to the main layout
         zone_layout.addLayout(buttons_layout)
@@ -100,6 +468,8 @@ class MainApplicationWindow(QMainWindow):
             self.define_zones(num_zones, zone_names)
             self.init_map_view()
             self.solve_button.setEnabled(True)
+            self.load_sites_button.setEnabled(True)
+            self.live_checkbox.setEnabled(True)
         else:
             QMessageBox.warning(self, 'Warning', 'Please enter at least one zone.', QMessageBox.Ok)
 
@@ -111,28 +481,89 @@ class MainApplicationWindow(QMainWindow):
             self.zones[zone_name] = {'x': x, 'y': y, 'width': zone_width, 'height': zone_height, 'color': generate_random_color()}
 
     def init_map_view(self):
+        self.stop_live()
         if self.map_view:
             self.map_view.deleteLater()
 
         self.map_view = InteractiveMap(self.zones, self)
         self.central_widget.layout().addWidget(self.map_view)
+        if self.live_checkbox.isChecked():
+            self.start_live()
 
-    def solve_optimization(self):
+    def set_live(self, checked):
+        if checked and self.map_view:
+            self.start_live()
+        elif not checked:
+            self.stop_live()
+
+    def start_live(self):
+        # Re-solve in the background after every new site, from a model kept across clicks
+        from pl5_live import LiveSolver
+        self.stop_live()
+        self.live = LiveSolver(self.zones, self)
+        if self.map_view.site_points:
+            self.live.add_sites(0, self.map_view.site_points)
+        self.map_view.sitesAdded.connect(self.live.add_sites)
+        self.live.solved.connect(self.show_live_solution)
+        self.live.failed.connect(self.live_label.setText)
+        self.live_label.setText('Solving...')
+
+    def stop_live(self):
+        if self.live is None:
+            return
         try:
-            model = Model("antenna_placement")
-            sites = model.addVars(len(self.map_view.sites), vtype=GRB.BINARY, name="Site")
-            model.setObjective(sites.sum(), GRB.MINIMIZE)
+            self.map_view.sitesAdded.disconnect(self.live.add_sites)
+        except TypeError:
+            pass
+        self.live.stop()
+        self.live.deleteLater()
+        self.live = None
+        self.live_label.setText('')
 
-            for zone_name, zone_info in self.zones.items():
-                model.addConstr(sum(sites[i] for i, (site_item, _) in enumerate(self.map_view.sites)
-                                    if zone_info['rect'].sceneBoundingRect().intersects(site_item.sceneBoundingRect())) >= 1, f"cover_{zone_name}")
+    def show_live_solution(self, selected, uncovered, optimal):
+        if self.live is None or self.sender() is not self.live:
+            return
+        self.map_view.show_selection(selected)
+        status = 'optimal' if optimal else 'improving'
+        if uncovered:
+            status += f", uncovered: {', '.join(map(str, uncovered[:5]))}" + ('...' if len(uncovered) > 5 else '')
+        self.live_label.setText(f'{len(selected)} sites ({status})')
+
+    def closeEvent(self, event):
+        self.stop_live()
+        super().closeEvent(event)
 
-            model.optimize()
+    def load_sites(self):
+        path, _ = QFileDialog.getOpenFileName(self, 'Site coordinates', '', 'CSV (*.csv *.txt)')
+        if not path:
+            return
+        try:
+            points = load_site_points(path)
+            added = self.map_view.add_sites(points)
+            self.map_view.fit_all()
+            if added < len(points):
+                QMessageBox.information(self, 'Sites', f'{len(points) - added} sites outside every zone were skipped.')
+        except Exception as e:
+            QMessageBox.critical(self, 'Sites Error', str(e))
+
+    def site_coverage(self):
+        # zone name -> indices of the sites whose disc overlaps that zone, computed on the site
+        # coordinates for all sites at once
+        points = np.array(self.map_view.site_points, dtype=float).reshape(-1, 2)
+        return {zone_name: np.flatnonzero(zone_covers(zone_info, points)).tolist()
+                for zone_name, zone_info in self.zones.items()}
+
+    def solve_optimization(self):
+        try:
+            metrics = SolveMetrics("pl5")
+            with metrics.phase("parse"):
+                coverage = self.site_coverage()
+            selected = solve_antenna(len(self.map_view.sites), coverage, self.backend, metrics)
 
-            if model.status == GRB.OPTIMAL:
-                for i, (site_item, _) in enumerate(self.map_view.sites):
-                    if sites[i].X > 0.5:
-                        site_item.setBrush(QBrush(Qt.green))
+            if selected is not None:
+                with metrics.phase("format"):
+                    self.map_view.show_selection(selected)
+                self.last_metrics = metrics.finish()
                 QMessageBox.information(self, 'Optimization Result', 'Optimization completed successfully.')
             else:
                 QMessageBox.warning(self, 'Optimization Result', 'No feasible solution found.')
@@ -0,0 +1,227 @@
+import threading
+
+import numpy as np
+from gurobipy import Model, GRB, Column, LinExpr
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from instrumentation import SolveMetrics
+from pl5 import SITE_RADIUS, zone_covers
+
+# Cost of leaving a zone uncovered in the live model; above any number of sites, so coverage
+# always comes first, but the model stays feasible while zones still have no site
+UNCOVERED_PENALTY = 1e6
+# Zone x site tests evaluated at once when new sites are matched against the zones
+COVER_TEST_SIZE = 10_000_000
+
+
+class LiveCoverModel:
+    # The set-cover model of build_antenna_model kept across edits: one binary column per site,
+    # one row per zone, plus an uncovered slack per zone. Adding sites adds columns with their
+    # coefficients in the rows of the zones they cover; a zone edit only touches its own row.
+    def __init__(self, zones):
+        self.model = Model("antenna_live")
+        self.model.Params.OutputFlag = 0
+        # the penalty of an uncovered zone inflates the objective, so a relative gap would stop
+        # many sites from the optimum; the site count is integral, so an absolute gap below one
+        # site means optimal
+        self.model.Params.MIPGapAbs = 0.5
+        self.model.Params.MIPGap = 0
+        self.model.ModelSense = GRB.MINIMIZE
+        self.zones = {}
+        self.rows = {}
+        self.slacks = {}
+        # zone name -> indices of the sites it contains, and the reverse index per site
+        self.members = {}
+        self.zones_of = []
+        # zone name -> selected sites among its members in the incumbent, kept up to date from
+        # the sites that change between incumbents
+        self.selected = {}
+        self.sites = []
+        self.points = np.empty((0, 2))
+        self.incumbent = np.zeros(0, dtype=bool)
+        for zone_name, zone_info in zones.items():
+            self.update_zone(zone_name, zone_info)
+
+    def covering(self, points):
+        # (zone position in self.zones, point) pairs of every zone containing one of the points,
+        # with the zones x points test broadcast over chunks of points
+        names = list(self.zones)
+        bounds = np.array([[z['x'], z['y'], z['x'] + z['width'], z['y'] + z['height']]
+                           for z in self.zones.values()]).reshape(-1, 4)
+        pairs = []
+        step = max(1, COVER_TEST_SIZE // max(1, len(names)))
+        for start in range(0, len(points), step):
+            chunk = points[start:start + step]
+            inside = ((chunk[None, :, 0] + SITE_RADIUS > bounds[:, 0, None]) &
+                      (chunk[None, :, 0] - SITE_RADIUS < bounds[:, 2, None]) &
+                      (chunk[None, :, 1] + SITE_RADIUS > bounds[:, 1, None]) &
+                      (chunk[None, :, 1] - SITE_RADIUS < bounds[:, 3, None]))
+            zone, point = np.nonzero(inside)
+            pairs.append((zone, point + start))
+        if not pairs:
+            return names, np.empty(0, dtype=int), np.empty(0, dtype=int)
+        return names, np.concatenate([z for z, _ in pairs]), np.concatenate([p for _, p in pairs])
+
+    def add_sites(self, points):
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        first = len(self.sites)
+        self.points = np.vstack([self.points, points])
+        names, zone, point = self.covering(points)
+        rows_of = [[] for _ in range(len(points))]
+        for z, k in zip(zone.tolist(), point.tolist()):
+            rows_of[k].append(self.rows[names[z]])
+            self.members[names[z]].add(first + k)
+        self.zones_of.extend(set() for _ in range(len(points)))
+        for z, k in zip(zone.tolist(), point.tolist()):
+            self.zones_of[first + k].add(names[z])
+        for k, rows in enumerate(rows_of):
+            column = Column([1.0] * len(rows), rows)
+            self.sites.append(self.model.addVar(obj=1.0, vtype=GRB.BINARY, column=column, name=f"Site[{first + k}]"))
+        self.incumbent = np.concatenate([self.incumbent, np.zeros(len(points), dtype=bool)])
+
+    def update_zone(self, zone_name, zone_info):
+        # New, moved or resized zone (zone_info with x, y, width, height), or a removed one (None)
+        if zone_info is None:
+            if zone_name in self.rows:
+                self.model.remove(self.rows.pop(zone_name))
+                self.model.remove(self.slacks.pop(zone_name))
+                for i in self.members.pop(zone_name):
+                    self.zones_of[i].discard(zone_name)
+                del self.zones[zone_name], self.selected[zone_name]
+            return
+        inside = set(np.flatnonzero(zone_covers(zone_info, self.points)).tolist())
+        self.zones[zone_name] = {key: zone_info[key] for key in ('x', 'y', 'width', 'height')}
+        if zone_name not in self.rows:
+            self.slacks[zone_name] = self.model.addVar(obj=UNCOVERED_PENALTY, vtype=GRB.BINARY,
+                                                       name=f"Uncovered[{zone_name}]")
+            expr = LinExpr([1.0] * len(inside), [self.sites[i] for i in sorted(inside)])
+            self.rows[zone_name] = self.model.addConstr(expr + self.slacks[zone_name] >= 1, f"cover_{zone_name}")
+            self.members[zone_name] = inside
+            for i in inside:
+                self.zones_of[i].add(zone_name)
+            self.selected[zone_name] = int(np.count_nonzero(self.incumbent[sorted(inside)]))
+            return
+        row = self.rows[zone_name]
+        for i in inside - self.members[zone_name]:
+            self.model.chgCoeff(row, self.sites[i], 1.0)
+            self.zones_of[i].add(zone_name)
+            self.selected[zone_name] += int(self.incumbent[i])
+        for i in self.members[zone_name] - inside:
+            self.model.chgCoeff(row, self.sites[i], 0.0)
+            self.zones_of[i].discard(zone_name)
+            self.selected[zone_name] -= int(self.incumbent[i])
+        self.members[zone_name] = inside
+
+    def set_start(self):
+        # The last incumbent, new sites off, and the slacks of the zones it leaves uncovered
+        self.model.setAttr("Start", self.sites, self.incumbent.astype(float).tolist())
+        self.model.setAttr("Start", list(self.slacks.values()),
+                           [0.0 if self.selected[zone_name] else 1.0 for zone_name in self.slacks])
+
+    def store(self, values):
+        incumbent = np.asarray(values) > 0.5
+        for i in np.flatnonzero(incumbent != self.incumbent).tolist():
+            change = 1 if incumbent[i] else -1
+            for zone_name in self.zones_of[i]:
+                self.selected[zone_name] += change
+        self.incumbent = incumbent
+
+    def selection(self):
+        # (selected site indices, zones left uncovered)
+        selected = np.flatnonzero(self.incumbent).tolist()
+        uncovered = [zone_name for zone_name, count in self.selected.items() if not count]
+        return selected, uncovered
+
+
+class LiveSolver(QObject):
+    # Background re-optimization of a LiveCoverModel. Edits from the GUI thread are queued; the
+    # worker thread applies them between solves and interrupts a running solve when new ones
+    # arrive, so the model is only touched by the worker. Each solve starts from the previous
+    # incumbent, and every improving solution is reported through solved(selected site indices,
+    # uncovered zones, optimal), delivered to the GUI thread by Qt's event loop; errors come
+    # through failed(message) and the worker waits for the next edit.
+    solved = pyqtSignal(list, list, bool)
+    failed = pyqtSignal(str)
+
+    def __init__(self, zones, parent=None):
+        super().__init__(parent)
+        self.cover = LiveCoverModel(zones)
+        self.pending = []
+        self.condition = threading.Condition()
+        self.optimizing = False
+        self.running = True
+        self.dirty = True
+        self.thread = threading.Thread(target=self.run, name="pl5-live", daemon=True)
+        self.thread.start()
+
+    def add_sites(self, first, points):
+        self.enqueue(("sites", first, list(points)))
+
+    def update_zone(self, zone_name, zone_info):
+        self.enqueue(("zone", zone_name, None if zone_info is None else dict(zone_info)))
+
+    def enqueue(self, edit):
+        with self.condition:
+            self.pending.append(edit)
+            self.condition.notify()
+            if self.optimizing:
+                self.cover.model.terminate()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+            if self.optimizing:
+                self.cover.model.terminate()
+        self.thread.join()
+
+    def apply(self, edits):
+        for edit in edits:
+            if edit[0] == "sites":
+                _, first, points = edit
+                if first != len(self.cover.sites):
+                    raise ValueError(f"Sites out of order: expected index {len(self.cover.sites)}, got {first}")
+                self.cover.add_sites(points)
+            else:
+                self.cover.update_zone(edit[1], edit[2])
+
+    def report(self, model, where):
+        if where == GRB.Callback.MIPSOL and self.cover.sites:
+            self.cover.store(model.cbGetSolution(self.cover.sites))
+            self.solved.emit(*self.cover.selection(), False)
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and not self.pending and not self.dirty:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                edits, self.pending = self.pending, []
+                self.dirty = False
+            try:
+                self.solve(edits)
+            except Exception as e:
+                self.failed.emit(str(e))
+
+    def solve(self, edits):
+        self.apply(edits)
+        metrics = SolveMetrics("pl5")
+        if self.cover.sites:
+            self.cover.set_start()
+        with self.condition:
+            self.optimizing = True
+        try:
+            metrics.optimize(self.cover.model, self.report)
+        finally:
+            with self.condition:
+                self.optimizing = False
+        model = self.cover.model
+        if model.Status == GRB.INTERRUPTED:
+            # cut short by an edit (or stop): solve again once it is applied
+            with self.condition:
+                self.dirty = True
+        if model.SolCount:
+            self.cover.store([v.X for v in self.cover.sites])
+        self.solved.emit(*self.cover.selection(), model.Status == GRB.OPTIMAL)
+        metrics.finish()
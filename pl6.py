@@ -4,6 +4,127 @@ import gurobipy as gp
 from gurobipy import quicksum
 import matplotlib.pyplot as plt
 import networkx as nx
+import numpy as np
+import backends
+import results
+import streaming
+import templates
+from backends import LinearProgram, OPTIMAL
+from instrumentation import SolveMetrics
+
+def build_network_model(edges, src, dest):
+    m = gp.Model("network_solver")
+    ##variables de decision 
+    vars = m.addVars(edges.keys(), obj=edges, vtype=gp.GRB.BINARY, name='e')
+    for node in set(sum([list(edge) for edge in edges.keys()], [])):
+        if node not in [src, dest]:  # Ignore source and sink for flow conservation
+            m.addConstr(quicksum(vars[i, j] for i, j in edges.keys() if j == node) ==
+                quicksum(vars[i, j] for i, j in edges.keys() if i == node), name=f'node_{node}_conservation')
+    m.addConstr(quicksum(vars[src, j] for i, j in edges.keys() if i == src) == 1, name='source_out')
+    m.addConstr(quicksum(vars[i, dest] for i, j in edges.keys() if j == dest) == 1, name='sink_in') 
+    return m, vars
+
+def extract_path_edges(m, vars):
+    return results.extract(m, {"edges": vars})["edges"].selected()
+
+class NetworkTemplate(templates.ModelTemplate):
+    # The path model compiled once per topology, keyed by the tuple of edges. It uses one flow
+    # balance row per router (out - in = 1 at the source, -1 at the destination, 0 elsewhere),
+    # which has the same optimal paths as build_network_model for non-negative travel times and
+    # lets source, destination and weights change through RHS and objective only.
+    def build(self):
+        edges = self.key
+        self.model = gp.Model("network_solver")
+        self.vars = self.model.addVars(edges, vtype=gp.GRB.BINARY, name='e')
+        self.nodes = sorted({node for edge in edges for node in edge})
+        out_edges = {node: [] for node in self.nodes}
+        in_edges = {node: [] for node in self.nodes}
+        for i, j in edges:
+            out_edges[i].append(self.vars[i, j])
+            in_edges[j].append(self.vars[i, j])
+        self.balance = {node: self.model.addConstr(quicksum(out_edges[node]) - quicksum(in_edges[node]) == 0,
+                                                   name=f'node_{node}_balance')
+                        for node in self.nodes}
+        self.model.update()
+
+    def patch(self, weights, src, dest):
+        self.model.setAttr("Obj", list(self.vars.values()), weights)
+        rhs = dict.fromkeys(self.nodes, 0)
+        self.reachable = src in rhs and dest in rhs
+        if self.reachable:
+            rhs[src] += 1
+            rhs[dest] -= 1
+        self.model.setAttr("RHS", [self.balance[node] for node in self.nodes], [rhs[node] for node in self.nodes])
+
+    def results(self):
+        if not self.reachable or self.model.status != gp.GRB.OPTIMAL:
+            return None
+        return extract_path_edges(self.model, self.vars)
+
+def network_program(edges, src, dest):
+    # Same model as build_network_model for the non-Gurobi backends
+    program = LinearProgram("network_solver")
+    x = {e: program.add_binary(w, f"e[{e[0]},{e[1]}]") for e, w in edges.items()}
+    nodes = set()
+    for i, j in edges:
+        nodes.update((i, j))
+    for node in nodes:
+        if node not in [src, dest]:
+            coeffs = {}
+            for (i, j), col in x.items():
+                if j == node:
+                    coeffs[col] = coeffs.get(col, 0) + 1
+                if i == node:
+                    coeffs[col] = coeffs.get(col, 0) - 1
+            program.add_constr(coeffs, "==", 0, f'node_{node}_conservation')
+    program.add_constr({col: 1 for (i, j), col in x.items() if i == src}, "==", 1, 'source_out')
+    program.add_constr({col: 1 for (i, j), col in x.items() if j == dest}, "==", 1, 'sink_in')
+
+    def extract(solution):
+        if solution.status != OPTIMAL:
+            return None
+        return results.from_solution(solution, {"edges": x})["edges"].selected()
+
+    return program, extract
+
+def solve_network(edges, src, dest, backend=None, metrics=None):
+    # Edges of the shortest src -> dest path, None when no optimal path was found
+    if metrics is None:
+        metrics = SolveMetrics("pl6")
+    if src == dest:
+        # already there: the empty path on every backend (the path models would otherwise
+        # return the cheapest cycle through the router, or nothing, depending on the model)
+        return [] if any(src in edge for edge in edges) else None
+
+    def solve_gurobi():
+        if 2 * len(edges) >= streaming.STREAMING_NONZEROS:
+          return solve_streaming()
+        if templates.ENABLED:
+          return templates.solve(NetworkTemplate, tuple(edges), metrics, list(edges.values()), src, dest)
+        with metrics.phase("build"):
+          m, vars = build_network_model(edges, src, dest)
+        metrics.optimize(m)
+        if m.status != gp.GRB.OPTIMAL:
+          return None
+        with metrics.phase("extract"):
+          return extract_path_edges(m, vars)
+
+    def solve_streaming():
+        # very large graphs: written arc by arc to an MPS file read back by Gurobi
+        with metrics.phase("build"):
+          nodes = sorted({node for edge in edges for node in edge})
+          if src not in nodes or dest not in nodes:
+            return None
+          m = streaming.network_model(len(nodes), streaming.arc_chunks(nodes, edges),
+                                      nodes.index(src), nodes.index(dest))
+        metrics.optimize(m)
+        if m.status != gp.GRB.OPTIMAL:
+          return None
+        with metrics.phase("extract"):
+          arcs = list(edges)
+          return [arcs[a] for a in np.flatnonzero(np.array(m.getAttr("X")) > 0.5).tolist()]
+
+    return backends.run(backend, solve_gurobi, lambda: network_program(edges, src, dest), metrics)
 
 class AddNetworkElements(QWidget):
     def __init__(self, network_problem_instance):
@@ -99,6 +220,8 @@ class Networkproblem(QWidget):
         self.edges = {
         }
         self.add_network_elements = None
+        # Solver backend name, None for the default one
+        self.backend = None
 
     def initUI(self):
         self.setGeometry(300, 300, 600, 400)
@@ -157,21 +280,13 @@ class Networkproblem(QWidget):
             # Display Gurobi errors in a pop-up window
             self.show_error_popup(' Oups an Error Occured !') 
     def run_network_solver(self,src,dest):
-        m = gp.Model("network_solver")
-        ##variables de decision 
-        vars = m.addVars(self.edges.keys(), obj=self.edges, vtype=gp.GRB.BINARY, name='e')
-        for node in set(sum([list(edge) for edge in self.edges.keys()], [])):
-            if node not in [src, dest]:  # Ignore source and sink for flow conservation
-                m.addConstr(quicksum(vars[i, j] for i, j in self.edges.keys() if j == node) ==
-                    quicksum(vars[i, j] for i, j in self.edges.keys() if i == node), name=f'node_{node}_conservation')
-        m.addConstr(quicksum(vars[src, j] for i, j in self.edges.keys() if i == src) == 1, name='source_out')
-        m.addConstr(quicksum(vars[i, dest] for i, j in self.edges.keys() if j == dest) == 1, name='sink_in') 
-        m.optimize()
+        metrics = SolveMetrics("pl6")
+        solution_edges = solve_network(self.edges, src, dest, self.backend, metrics)
         ##retrieve solution
-        if m.status == gp.GRB.OPTIMAL:
-          solution_edges = [e for e in vars.keys() if vars[e].x > 0.5]
-          self.draw_graph(solution_edges)
+        if solution_edges is not None:
           total_time = sum(self.edges[e] for e in solution_edges)
+          self.last_metrics = metrics.finish()
+          self.draw_graph(solution_edges)
           result_text=f"The shortest path from {src} to {dest} is: {solution_edges} with total travel time: {total_time}"
           return result_text
     def draw_graph(self, solution_edges):
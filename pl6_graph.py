@@ -0,0 +1,281 @@
+import itertools
+import multiprocessing
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+# Path queries sent to a worker process per task
+QUERIES_PER_TASK = 256
+
+
+# Many pl6 shortest path queries on one network, answered in parallel worker processes. The
+# topology is stored once as CSR arrays (the sorted router names, the arc offsets of every tail,
+# the heads and the travel times) in shared memory segments; workers map the segments instead of
+# receiving a pickled copy of the edges dict, and run Dijkstra on them in place. A change to the
+# edges publishes a new version of the store (copy on write): only the arrays that changed get a
+# new segment, and the segments of older versions are freed once no query still reads them.
+# Travel times must be non-negative, as for the path model of pl6.
+
+# What a worker needs to attach to one version: per array, (segment name, dtype, length)
+GraphHandle = namedtuple("GraphHandle", ["store", "version", "arrays"])
+
+ARRAYS = ("nodes", "indptr", "indices", "weights")
+
+
+def csr_arrays(nodes, tails, heads, weights):
+    # CSR arrays of the arcs tails[k] -> heads[k] (router names) with travel times weights[k]
+    nodes = np.asarray(sorted(nodes))
+    if nodes.dtype == object:
+        raise ValueError("Router names must all be strings or all be integers")
+    weights = np.asarray(weights, dtype=float)
+    if len(weights) and not (weights >= 0).all():
+        raise ValueError("Travel times must be non-negative numbers")
+    if len(weights) >= np.iinfo(np.int32).max:
+        raise ValueError("Too many edges for a graph store")
+    tails = np.searchsorted(nodes, np.asarray(tails))
+    heads = np.searchsorted(nodes, np.asarray(heads))
+    order = np.lexsort((heads, tails))
+    indptr = np.zeros(len(nodes) + 1, dtype=np.int32)
+    np.cumsum(np.bincount(tails, minlength=len(nodes)), out=indptr[1:])
+    return {"nodes": nodes, "indptr": indptr, "indices": heads[order].astype(np.int32),
+            "weights": weights[order]}
+
+
+def edge_arrays(edges):
+    # Networkproblem.edges ((src, dest) -> travel time) as csr_arrays
+    keys = list(edges)
+    nodes = {node for edge in keys for node in edge}
+    return csr_arrays(nodes, [i for i, _ in keys], [j for _, j in keys], list(edges.values()))
+
+
+class GraphView:
+    # Shortest paths on a set of CSR arrays, its own or mapped from the segments of a store
+    def __init__(self, arrays, segments=()):
+        self.nodes = arrays["nodes"]
+        self.graph = csr_matrix((arrays["weights"], arrays["indices"], arrays["indptr"]),
+                                shape=(len(self.nodes), len(self.nodes)), copy=False)
+        self._segments = list(segments)
+
+    @classmethod
+    def attach(cls, handle):
+        segments, arrays = [], {}
+        for name, (segment, dtype, length) in handle.arrays.items():
+            shm = shared_memory.SharedMemory(segment)
+            segments.append(shm)
+            arrays[name] = np.ndarray(length, dtype=dtype, buffer=shm.buf)
+            arrays[name].flags.writeable = False
+        return cls(arrays, segments)
+
+    def close(self):
+        # the arrays have to go before their segments can be unmapped
+        del self.nodes, self.graph
+        for shm in self._segments:
+            shm.close()
+        self._segments = []
+
+    def index(self, node):
+        k = int(np.searchsorted(self.nodes, node))
+        return k if k < len(self.nodes) and self.nodes[k] == node else None
+
+    def shortest_paths(self, queries):
+        # Edges of the shortest src -> dest path of every (src, dest) query, None when there is
+        # none; one Dijkstra run per distinct source
+        paths = [None] * len(queries)
+        by_source = {}
+        for q, (src, dest) in enumerate(queries):
+            by_source.setdefault(src, []).append((q, dest))
+        for src, targets in by_source.items():
+            s = self.index(src)
+            if s is None:
+                continue
+            distances, predecessors = dijkstra(self.graph, indices=s, return_predecessors=True)
+            for q, dest in targets:
+                t = self.index(dest)
+                if t is not None and np.isfinite(distances[t]):
+                    paths[q] = self._path(predecessors, s, t)
+        return paths
+
+    def _path(self, predecessors, s, t):
+        path = []
+        while t != s:
+            p = predecessors[t]
+            path.append((self.nodes[p].item(), self.nodes[t].item()))
+            t = p
+        return path[::-1]
+
+
+class GraphStore:
+    # Owner of the shared segments. handle() is the current version; pin() keeps a version
+    # readable while queries run on it, whatever update() publishes in the meantime.
+    _ids = itertools.count()
+
+    def __init__(self, arrays):
+        self.id = f"{os.getpid()}-{next(GraphStore._ids)}"
+        self.version = 0
+        self._segments = {}   # segment name -> [SharedMemory, versions using it]
+        self._versions = {}   # version -> [handle, pins]
+        self._lock = threading.Lock()
+        self._publish(arrays, None)
+
+    @classmethod
+    def from_edges(cls, edges):
+        return cls(edge_arrays(edges))
+
+    def _publish(self, arrays, previous):
+        # new version; arrays equal to the ones of the previous version keep their segment
+        layout = {}
+        for name in ARRAYS:
+            array = np.ascontiguousarray(arrays[name])
+            if previous is not None:
+                segment, dtype, length = previous.arrays[name]
+                old = self._segments[segment][0]
+                if dtype == array.dtype.str and length == len(array) and \
+                        np.array_equal(np.ndarray(length, dtype=dtype, buffer=old.buf), array):
+                    layout[name] = previous.arrays[name]
+                    continue
+            shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+            np.ndarray(len(array), dtype=array.dtype, buffer=shm.buf)[:] = array
+            self._segments[shm.name] = [shm, 0]
+            layout[name] = (shm.name, array.dtype.str, len(array))
+        self.version += 1
+        handle = GraphHandle(self.id, self.version, layout)
+        for segment, _, _ in layout.values():
+            self._segments[segment][1] += 1
+        self._versions[self.version] = [handle, 0]
+        return handle
+
+    def handle(self):
+        with self._lock:
+            return self._versions[self.version][0]
+
+    def update(self, edges):
+        # Publishes the edges dict as the next version; queries pinned on older ones go on
+        with self._lock:
+            previous = self._versions[self.version][0]
+            handle = self._publish(edge_arrays(edges), previous)
+            self._retire(previous.version)
+            return handle
+
+    @contextmanager
+    def pin(self):
+        with self._lock:
+            entry = self._versions[self.version]
+            entry[1] += 1
+        try:
+            yield entry[0]
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                self._retire(entry[0].version)
+
+    def _retire(self, version):
+        # frees a version nobody reads any more, and the segments no other version uses
+        handle, pins = self._versions[version]
+        if version == self.version or pins:
+            return
+        del self._versions[version]
+        for segment, _, _ in handle.arrays.values():
+            entry = self._segments[segment]
+            entry[1] -= 1
+            if not entry[1]:
+                del self._segments[segment]
+                entry[0].close()
+                entry[0].unlink()
+
+    def nbytes(self):
+        with self._lock:
+            return sum(entry[0].size for entry in self._segments.values())
+
+    def close(self):
+        with self._lock:
+            for shm, _ in self._segments.values():
+                shm.close()
+                shm.unlink()
+            self._segments.clear()
+            self._versions.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ===================WORKER
+
+_views = {}
+
+
+def _view(handle):
+    # attached once per version; attaching a newer version of a store drops the older ones
+    view = _views.get((handle.store, handle.version))
+    if view is None:
+        for key in [k for k in _views if k[0] == handle.store and k[1] < handle.version]:
+            _views.pop(key).close()
+        view = _views[handle.store, handle.version] = GraphView.attach(handle)
+    return view
+
+
+def _answer(handle, queries):
+    return _view(handle).shortest_paths(queries)
+
+
+class QueryPool:
+    # Worker processes answering path queries on a store. Workers are spawned, not forked, so
+    # that the only graph memory they hold is the mapped segments.
+    def __init__(self, store, workers=None):
+        self.store = store
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def shortest_paths(self, queries):
+        # paths in query order, on the version current when the call started
+        queries = list(queries)
+        # queries from one source in the same task share their Dijkstra run
+        order = sorted(range(len(queries)), key=lambda q: repr(queries[q][0]))
+        chunks = [order[i:i + QUERIES_PER_TASK] for i in range(0, len(order), QUERIES_PER_TASK)]
+        paths = [None] * len(queries)
+        with self.store.pin() as handle:
+            futures = [self._pool.submit(_answer, handle, [queries[q] for q in chunk]) for chunk in chunks]
+            for chunk, future in zip(chunks, futures):
+                for q, path in zip(chunk, future.result()):
+                    paths[q] = path
+        return paths
+
+    def close(self):
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def solve_network_batch(edges, queries, workers=None, metrics=None):
+    # Edges of the shortest src -> dest path of every (src, dest) query on one network, None for
+    # the ones without a path; the single-query counterpart is pl6.solve_network
+    if metrics is None:
+        # imported here so that the workers, which import this module, do not load gurobipy
+        from instrumentation import SolveMetrics
+        metrics = SolveMetrics("pl6")
+    queries = list(queries)
+    workers = workers or os.cpu_count() or 1
+    with metrics.phase("build"):
+        arrays = edge_arrays(edges)
+    with metrics.phase("solve"):
+        if workers == 1 or len(queries) <= QUERIES_PER_TASK:
+            paths = GraphView(arrays).shortest_paths(queries)
+        else:
+            with GraphStore(arrays) as store, QueryPool(store, workers) as pool:
+                paths = pool.shortest_paths(queries)
+    metrics.solve_stats.update(Backend="dijkstra", Queries=len(queries), Nodes=len(arrays["nodes"]),
+                               Arcs=len(arrays["weights"]), Paths=sum(p is not None for p in paths))
+    return paths
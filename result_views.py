@@ -0,0 +1,168 @@
+import csv
+import os
+import re
+
+import numpy as np
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableView, QLineEdit, QComboBox, QPushButton,
+                             QFileDialog, QMessageBox, QHeaderView)
+
+# Filter text like ">= 10" on a numeric column; anything else is a substring match
+COMPARISON = re.compile(r"^\s*(<=|>=|!=|==|=|<|>)\s*(-?[\d.]+(?:[eE][-+]?\d+)?)\s*$")
+COMPARE = {"<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal, "=": np.isclose,
+           "==": np.isclose, "!=": lambda a, b: ~np.isclose(a, b)}
+
+
+def format_value(value):
+    if isinstance(value, (bool, np.bool_)):
+        return "Yes" if value else "No"
+    if isinstance(value, (float, np.floating)):
+        return "" if np.isnan(value) else f"{value:.12g}"
+    return str(value)
+
+
+def export_columns(path, columns):
+    # Writes {name: 1-D array} straight to CSV, or to Parquet through pandas (needs pyarrow or
+    # fastparquet), without going through the table's text
+    if os.path.splitext(path)[1].lower() == '.parquet':
+        import pandas as pd
+        pd.DataFrame(columns).to_parquet(path, index=False)
+        return
+    names = list(columns)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(names)
+        writer.writerows(zip(*(np.asarray(columns[name]).tolist() for name in names)))
+
+
+class ArrayTableModel(QAbstractTableModel):
+    # Read-only table over equal-length column arrays. Sorting and filtering only permute a row
+    # index array; cells are formatted when the view asks for them, i.e. for the visible rows.
+    def __init__(self, columns=None, parent=None):
+        super().__init__(parent)
+        self.set_columns(columns or {})
+
+    def set_columns(self, columns):
+        self.beginResetModel()
+        self.columns = {name: np.asarray(values) for name, values in columns.items()}
+        self.names = list(self.columns)
+        lengths = {len(values) for values in self.columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Columns have different lengths: {sorted(lengths)}")
+        self.rows = np.arange(lengths.pop() if lengths else 0)
+        self.mask = np.ones(len(self.rows), dtype=bool)
+        self.order = self.rows
+        self.endResetModel()
+
+    def visible_columns(self):
+        # The filtered, sorted rows as arrays, for export and charts
+        return {name: values[self.rows] for name, values in self.columns.items()}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.names)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return format_value(self.columns[self.names[index.column()]][self.rows[index.row()]])
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignRight | Qt.AlignVCenter
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        return self.names[section] if orientation == Qt.Horizontal else str(section + 1)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        if not 0 <= column < len(self.names):
+            # sorting turned off (or nothing to sort yet): back to the original row order
+            self.order = np.arange(len(self.mask))
+        else:
+            values = self.columns[self.names[column]]
+            if values.dtype == object:
+                values = values.astype(str)
+            # stable, so equal keys keep the previous order
+            self.order = np.argsort(values, kind="stable")
+            if order == Qt.DescendingOrder:
+                self.order = self.order[::-1]
+        self.rows = self.order[self.mask[self.order]]
+        self.layoutChanged.emit()
+
+    def set_filter(self, column, text):
+        # Keeps the rows whose value in `column` matches text; an empty text shows every row
+        values = self.columns[self.names[column]] if self.names else np.empty(0)
+        match = COMPARISON.match(text)
+        if not text.strip():
+            mask = np.ones(len(values), dtype=bool)
+        elif match and np.issubdtype(values.dtype, np.number):
+            mask = COMPARE[match.group(1)](values.astype(float), float(match.group(2)))
+        else:
+            needle = text.strip().lower()
+            mask = np.array([needle in format_value(v).lower() for v in values], dtype=bool)
+        self.beginResetModel()
+        self.mask = mask
+        self.rows = self.order[mask[self.order]]
+        self.endResetModel()
+
+
+class ResultTable(QWidget):
+    # Filter bar, sortable table and export button over an ArrayTableModel
+    def __init__(self, parent=None, export_name="results"):
+        super().__init__(parent)
+        self.export_name = export_name
+        self.model = ArrayTableModel(parent=self)
+
+        self.filter_column = QComboBox(self)
+        self.filter_text = QLineEdit(self)
+        self.filter_text.setPlaceholderText("Filter: text, or > 0, <= 10, = 1 ...")
+        self.filter_text.textChanged.connect(self.apply_filter)
+        self.filter_column.currentIndexChanged.connect(self.apply_filter)
+        export_button = QPushButton("Export", self)
+        export_button.clicked.connect(self.export)
+
+        self.view = QTableView(self)
+        self.view.setModel(self.model)
+        self.view.setSortingEnabled(True)
+        # Fixed row heights let the view skip measuring rows it does not show
+        self.view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.view.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+
+        bar = QHBoxLayout()
+        bar.addWidget(self.filter_column)
+        bar.addWidget(self.filter_text)
+        bar.addWidget(export_button)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(bar)
+        layout.addWidget(self.view)
+
+    def set_columns(self, columns):
+        self.model.set_columns(columns)
+        self.filter_column.blockSignals(True)
+        self.filter_column.clear()
+        self.filter_column.addItems(self.model.names)
+        self.filter_column.blockSignals(False)
+        self.view.sortByColumn(-1, Qt.AscendingOrder)
+        self.apply_filter()
+
+    def apply_filter(self):
+        if self.model.names:
+            self.model.set_filter(max(0, self.filter_column.currentIndex()), self.filter_text.text())
+
+    def export(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export results", f"{self.export_name}.csv",
+                                              "CSV (*.csv);;Parquet (*.parquet)")
+        if not path:
+            return
+        try:
+            export_columns(path, self.model.visible_columns())
+        except ImportError as e:
+            QMessageBox.critical(self, "Export Error", f"Parquet export needs pyarrow or fastparquet: {e}")
+        except Exception as e:
+            QMessageBox.critical(self, "Export Error", str(e))
@@ -0,0 +1,127 @@
+import numpy as np
+from gurobipy import GRB
+
+# Solution extraction shared by the exercises. Values are read with one getAttr call per
+# attribute and variable group, straight into NumPy arrays, instead of one .X per variable;
+# duals and reduced costs come the same way when the model is a continuous LP. The result
+# objects only hold the arrays (and their keys): dicts, rounding and text are built on demand.
+
+
+def read_attr(model, group, attr="X"):
+    # attr of every variable (or constraint) of group as a float array, in group order: an
+    # MVar/MConstr, a tupledict/dict (in key order) or a list
+    if hasattr(group, "getAttr") and hasattr(group, "shape"):
+        return np.asarray(group.getAttr(attr), dtype=float).reshape(-1)
+    if isinstance(group, dict):
+        group = list(group.values())
+    if not len(group):
+        return np.empty(0)
+    return np.array(model.getAttr(attr, list(group)), dtype=float)
+
+
+def group_keys(group):
+    if isinstance(group, dict):
+        return list(group.keys())
+    return range(group.size if hasattr(group, "shape") else len(group))
+
+
+class VarValues:
+    # Values (and reduced costs, when available) of one variable group with the group's keys
+    __slots__ = ("keys", "values", "reduced_costs", "_position")
+
+    def __init__(self, keys, values, reduced_costs=None):
+        self.keys = keys
+        self.values = values
+        self.reduced_costs = reduced_costs
+        self._position = None
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, key):
+        if self._position is None:
+            self._position = {k: i for i, k in enumerate(self.keys)}
+        return float(self.values[self._position[key]])
+
+    def as_dict(self):
+        return dict(zip(self.keys, self.values.tolist()))
+
+    def rounded(self):
+        # Integer values of an integer group, as Python ints
+        return np.rint(self.values).astype(np.int64).tolist()
+
+    def selected(self, threshold=0.5):
+        # Keys of the variables above threshold (the chosen ones of a binary group)
+        chosen = np.flatnonzero(self.values > threshold)
+        if isinstance(self.keys, range):
+            return [self.keys[i] for i in chosen.tolist()]
+        return [self.keys[i] for i in chosen]
+
+    def total(self):
+        return float(self.values.sum())
+
+    def __repr__(self):
+        return f"VarValues({len(self)} values, total={self.total():g})"
+
+
+class Result:
+    # One solve: status, objective, best bound, the variable groups by name and the duals of the
+    # constraint groups by name (empty for MIPs)
+    __slots__ = ("status", "objective", "bound", "groups", "duals", "_text")
+
+    def __init__(self, status, objective, bound, groups, duals):
+        self.status = status
+        self.objective = objective
+        self.bound = bound
+        self.groups = groups
+        self.duals = duals
+        self._text = None
+
+    def __getitem__(self, name):
+        return self.groups[name]
+
+    @property
+    def optimal(self):
+        return self.status == GRB.OPTIMAL
+
+    def format(self, limit=20):
+        # Text summary, built on first use: objective, then the nonzero values of every group
+        if self._text is None:
+            lines = [f"status {self.status}, objective {self.objective}"]
+            for name, group in self.groups.items():
+                nonzero = np.flatnonzero(np.abs(group.values) > 1e-9)
+                shown = ", ".join(f"{group.keys[i]}={group.values[i]:g}" for i in nonzero[:limit].tolist())
+                more = f", ... ({len(nonzero) - limit} more)" if len(nonzero) > limit else ""
+                lines.append(f"{name}: {shown}{more}")
+            self._text = "\n".join(lines)
+        return self._text
+
+    def __repr__(self):
+        return f"Result(status={self.status}, objective={self.objective}, groups={list(self.groups)})"
+
+
+def extract(model, variables, constraints=None):
+    # variables and constraints map names to groups (see read_attr). Reduced costs and duals are
+    # read only for continuous models; a MIP has none.
+    sensitivity = not model.IsMIP
+    groups = {}
+    for name, group in variables.items():
+        groups[name] = VarValues(group_keys(group), read_attr(model, group, "X"),
+                                 read_attr(model, group, "RC") if sensitivity else None)
+    duals = {}
+    if sensitivity:
+        for name, group in (constraints or {}).items():
+            duals[name] = VarValues(group_keys(group), read_attr(model, group, "Pi"))
+    bound = model.ObjBound if model.IsMIP else model.ObjVal
+    return Result(model.Status, model.ObjVal, bound, groups, duals)
+
+
+def from_solution(solution, variables):
+    # The same objects from a backends.Solution: variables maps names to the column indices of
+    # each group in the LinearProgram (a list, or a dict key -> column)
+    groups = {}
+    for name, columns in variables.items():
+        index = np.fromiter(columns.values() if isinstance(columns, dict) else columns, dtype=np.int64)
+        keys = list(columns.keys()) if isinstance(columns, dict) else range(len(index))
+        groups[name] = VarValues(keys, np.asarray(solution.values, dtype=float)[index])
+    return Result(solution.status, solution.objective, solution.objective, groups, {})
@@ -0,0 +1,205 @@
+import getpass
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# Cores shared by the solves of this process; worker pools give each worker its share (see
+# configure), and every process also takes its cores from the machine (see MachineCores).
+# LP_SCHEDULER=0 leaves Threads alone and never queues.
+ENABLED = os.environ.get("LP_SCHEDULER", "1") not in ("", "0")
+CORES = int(os.environ.get("LP_SOLVER_CORES", "0")) or os.cpu_count() or 1
+
+# Threads a model can use well grows with its size: one thread per this many nonzeros (MIPs
+# search in parallel and get one per half as many), and small models always run single-threaded
+NONZEROS_PER_THREAD = 50_000
+SINGLE_THREAD_NONZEROS = 10_000
+
+# Cores are also counted across processes (two planner windows, or a window and a jobs.py
+# server): every core of the machine is a lock file in this directory, and a solve holds one
+# lock per thread it runs. The OS drops the locks of a process that dies.
+MACHINE_DIR = os.environ.get("LP_SOLVER_CORES_DIR",
+                             os.path.join(tempfile.gettempdir(), f"roproject-cores-{getpass.getuser()}"))
+MACHINE_CORES = os.cpu_count() or 1
+# Seconds between two looks for a free core when the machine is full
+MACHINE_POLL_S = 0.01
+
+
+def wanted_threads(model_stats, cores=None):
+    # Threads worth giving a model of these statistics (SolveMetrics.model_stats) on an idle machine
+    cores = cores or CORES
+    nonzeros = model_stats.get("NumNZs", 0) or 0
+    if nonzeros < SINGLE_THREAD_NONZEROS:
+        return 1
+    per_thread = NONZEROS_PER_THREAD // 2 if model_stats.get("NumIntVars") else NONZEROS_PER_THREAD
+    return max(1, min(cores, math.ceil(nonzeros / per_thread)))
+
+
+class CoreScheduler:
+    # Hands out cores to solves first come, first served. A solve asks for the threads its size
+    # is worth and gets at most its fair share of the free cores: alone on the machine it gets
+    # all it asked for (one big parallel solve), with others waiting the cores are split and a
+    # full queue runs everything single-threaded, which maximizes solves per minute since
+    # parallel speedup is sublinear. When no core is free, solves wait in line.
+    def __init__(self, cores=CORES):
+        self.cores = cores
+        self.free = cores
+        self.queue = deque()
+        self.condition = threading.Condition()
+        self.running = 0
+
+    def acquire(self, wanted):
+        ticket = object()
+        with self.condition:
+            self.queue.append(ticket)
+            while self.queue[0] is not ticket or self.free < 1:
+                self.condition.wait()
+            self.queue.popleft()
+            share = max(1, self.free // (1 + len(self.queue)))
+            granted = max(1, min(wanted, share, self.free))
+            self.free -= granted
+            self.running += 1
+            self.condition.notify_all()
+            return granted
+
+    def release(self, granted):
+        with self.condition:
+            self.free += granted
+            self.running -= 1
+            self.condition.notify_all()
+
+    @contextmanager
+    def slot(self, wanted):
+        granted = self.acquire(wanted)
+        try:
+            yield granted
+        finally:
+            self.release(granted)
+
+    def load(self):
+        with self.condition:
+            return {"cores": self.cores, "busy": self.cores - self.free, "running": self.running,
+                    "queued": len(self.queue)}
+
+
+def _try_lock(f):
+    try:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(f):
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class MachineCores:
+    # The cores of the machine as lock files shared by every process. A lock only tells processes
+    # apart, so the cores this process holds are tracked here and never asked for twice.
+    def __init__(self, path=MACHINE_DIR, cores=MACHINE_CORES):
+        self.path = path
+        self.cores = cores
+        self.files = {}
+        self.held = set()
+        self.lock = threading.Lock()
+
+    def _file(self, k):
+        if k not in self.files:
+            os.makedirs(self.path, exist_ok=True)
+            self.files[k] = open(os.path.join(self.path, f"core-{k}.lock"), "a+b")
+        return self.files[k]
+
+    def take(self, wanted):
+        # Indices of up to wanted free cores, at least one; waits while the machine is full
+        while True:
+            with self.lock:
+                taken = []
+                for k in range(self.cores):
+                    if len(taken) == wanted:
+                        break
+                    if k not in self.held and _try_lock(self._file(k)):
+                        self.held.add(k)
+                        taken.append(k)
+            if taken:
+                return taken
+            time.sleep(MACHINE_POLL_S)
+
+    def give_back(self, taken):
+        with self.lock:
+            for k in taken:
+                _unlock(self.files[k])
+                self.held.discard(k)
+
+
+_scheduler = CoreScheduler()
+_machine = MachineCores()
+
+
+def configure(cores):
+    # Size this process's share of the machine; pool workers call it from their initializer
+    global _scheduler
+    _scheduler = CoreScheduler(max(1, int(cores)))
+
+
+def share_per_worker(workers):
+    return max(1, CORES // max(1, workers))
+
+
+def get():
+    return _scheduler
+
+
+@contextmanager
+def solve_slot(model, model_stats, metrics=None):
+    # Waits for cores, in this process and then on the machine, and sets Threads on the model for
+    # the solve. A Threads value already set on the model (by the caller or a tuning profile) caps
+    # the request. Threads is not put back afterwards, which Gurobi would print for models with
+    # output on; the value set here is remembered on the model instead, so that the next solve
+    # tells it from one the caller set.
+    if not ENABLED:
+        yield None
+        return
+    wanted = wanted_threads(model_stats, _scheduler.cores)
+    scheduled = getattr(model, "_scheduled_threads", None)
+    if scheduled is not None and model.Params.Threads == scheduled[1]:
+        limit = scheduled[0]
+    else:
+        limit = model.Params.Threads
+    if limit > 0:
+        wanted = min(wanted, limit)
+    started = time.perf_counter()
+    scheduler = _scheduler
+    granted = scheduler.acquire(wanted)
+    try:
+        cores = _machine.take(granted)
+        try:
+            threads = len(cores)
+            if metrics is not None:
+                metrics.phases["queue"] = {"wall_s": time.perf_counter() - started, "cpu_s": None}
+                metrics.solve_stats["Threads"] = threads
+            if model.Params.Threads != threads:
+                model.Params.Threads = threads
+            model._scheduled_threads = (limit, threads)
+            yield threads
+        finally:
+            _machine.give_back(cores)
+    finally:
+        scheduler.release(granted)
@@ -0,0 +1,166 @@
+import os
+import tempfile
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# Nonzeros handled per chunk: bounds the temporary arrays and strings of the builders below
+CHUNK_NONZEROS = 1_000_000
+# pl5 and pl6 build through this module from this many nonzeros on
+STREAMING_NONZEROS = 1_000_000
+# Terms per line of an LP file
+TERMS_PER_LINE = 16
+
+
+# Memory-bounded model builders for very large pl5 and pl6 instances. Instead of one Python
+# expression per constraint, they consume the coverage pairs (pl5) or arcs (pl6) as chunks of
+# NumPy arrays and either write the model file directly or feed Gurobi whole CSR row slices, so
+# that beyond the per-site/per-arc vectors, memory only grows with the chunk size.
+#   - pl5 set cover: rows are zones; coverage pairs come grouped by zone, which is the order of
+#     an LP file (row by row) and of CSR row slices.
+#   - pl6 shortest path: one binary column per arc with +1 in its tail row and -1 in its head
+#     row (the flow balance form of pl6.NetworkTemplate); arcs come column by column, which is
+#     the order of an MPS file.
+# Variables and rows are named by index (Site[i], cover[k], e[a], node[v]).
+
+def coverage_chunks(coverage, chunk=CHUNK_NONZEROS):
+    # pl5 coverage dict (zone -> covering site indices) as (zone index, site index) array chunks
+    zones, sites = [], []
+    size = 0
+    for k, covering in enumerate(coverage.values()):
+        covering = np.asarray(covering, dtype=np.int64)
+        zones.append(np.full(len(covering), k, dtype=np.int64))
+        sites.append(covering)
+        size += len(covering)
+        if size >= chunk:
+            yield np.concatenate(zones), np.concatenate(sites)
+            zones, sites, size = [], [], 0
+    if zones:
+        yield np.concatenate(zones), np.concatenate(sites)
+
+
+def arc_chunks(nodes, edges, chunk=CHUNK_NONZEROS):
+    # pl6 edge dict ((tail, head) -> weight) as (tail index, head index, weight) array chunks
+    position = {node: k for k, node in enumerate(nodes)}
+    tails, heads, weights = [], [], []
+    for (i, j), w in edges.items():
+        tails.append(position[i])
+        heads.append(position[j])
+        weights.append(w)
+        if len(tails) >= chunk:
+            yield np.array(tails), np.array(heads), np.array(weights, dtype=float)
+            tails, heads, weights = [], [], []
+    if tails:
+        yield np.array(tails), np.array(heads), np.array(weights, dtype=float)
+
+
+def _complete_rows(chunks, num_rows):
+    # Regroups row-sorted (row, column) chunks so that every chunk holds whole rows; rows
+    # without any pair come out as empty rows in between
+    pending_rows = np.empty(0, dtype=np.int64)
+    pending_cols = np.empty(0, dtype=np.int64)
+    first = 0
+    for rows, cols in chunks:
+        rows = np.concatenate([pending_rows, np.asarray(rows, dtype=np.int64)])
+        cols = np.concatenate([pending_cols, np.asarray(cols, dtype=np.int64)])
+        if len(rows) and (np.diff(rows) < 0).any():
+            raise ValueError("Coverage pairs must come grouped by zone, in zone order")
+        if not len(rows):
+            continue
+        last = rows[-1]
+        done = rows < last
+        if done.any():
+            yield first, last, rows[done], cols[done]
+            first = last
+        pending_rows, pending_cols = rows[~done], cols[~done]
+    if first < num_rows:
+        yield first, num_rows, pending_rows, pending_cols
+
+
+def write_antenna_lp(path, num_sites, num_zones, chunks):
+    # pl5 set cover as an LP file: minimize the number of sites, every zone covered once
+    sites = np.arange(num_sites)
+    with open(path, "w") as f:
+        f.write("\\ antenna_placement, written by streaming.write_antenna_lp\nMinimize\n obj:")
+        for start in range(0, num_sites, CHUNK_NONZEROS):
+            block = sites[start:start + CHUNK_NONZEROS]
+            f.write(("" if start == 0 else "\n  ") + _terms(np.ones(len(block)), block, "Site", first=start == 0))
+        f.write("\nSubject To\n")
+        for first, end, rows, cols in _complete_rows(chunks, num_zones):
+            starts = np.searchsorted(rows, np.arange(first, end))
+            stops = np.searchsorted(rows, np.arange(first, end), side="right")
+            lines = []
+            for zone, a, b in zip(range(first, end), starts.tolist(), stops.tolist()):
+                # an empty zone keeps an infeasible 0 >= 1 row, as build_antenna_model would
+                body = _terms(np.ones(b - a), cols[a:b], "Site") if b > a else " 0 Site[0]"
+                lines.append(f" cover[{zone}]:{body} >= 1\n")
+            f.write("".join(lines))
+        f.write("Binaries\n")
+        for start in range(0, num_sites, CHUNK_NONZEROS):
+            block = sites[start:start + CHUNK_NONZEROS]
+            f.write("".join(f" Site[{i}]\n" for i in block.tolist()))
+        f.write("End\n")
+    return path
+
+
+def _terms(coeffs, columns, prefix, first=True):
+    # " + Site[3] + Site[7] ..." broken over lines of TERMS_PER_LINE terms
+    parts = [f" {'+' if c >= 0 else '-'} {abs(c):g} {prefix}[{j}]" if c not in (1, -1)
+             else f" {'+' if c > 0 else '-'} {prefix}[{j}]"
+             for c, j in zip(coeffs.tolist(), columns.tolist())]
+    if first and parts and parts[0].startswith(" + "):
+        parts[0] = parts[0][2:]
+    lines = ["".join(parts[k:k + TERMS_PER_LINE]) for k in range(0, len(parts), TERMS_PER_LINE)]
+    return "\n  ".join(lines)
+
+
+def antenna_model(num_sites, num_zones, chunks):
+    # pl5 set cover fed to Gurobi in CSR row slices: returns (model, site MVar)
+    import gurobipy as gp
+    from gurobipy import GRB
+    model = gp.Model("antenna_placement")
+    x = model.addMVar(num_sites, vtype=GRB.BINARY, obj=1.0, name="Site")
+    model.ModelSense = GRB.MINIMIZE
+    for first, end, rows, cols in _complete_rows(chunks, num_zones):
+        block = csr_matrix((np.ones(len(rows)), (rows - first, cols)), shape=(end - first, num_sites))
+        model.addMConstr(block, x, GRB.GREATER_EQUAL, np.ones(end - first))
+    return model, x
+
+
+def write_network_mps(path, num_nodes, chunks, src, dest):
+    # pl6 path model as a free-format MPS file: one binary column per arc, one balance row per
+    # node with right-hand side 1 at src and -1 at dest (indices into the node list)
+    num_arcs = 0
+    with open(path, "w") as f:
+        f.write("NAME network_solver\nROWS\n N obj\n")
+        for start in range(0, num_nodes, CHUNK_NONZEROS):
+            f.write("".join(f" E node[{v}]\n" for v in range(start, min(num_nodes, start + CHUNK_NONZEROS))))
+        f.write("COLUMNS\n")
+        for tails, heads, weights in chunks:
+            arcs = range(num_arcs, num_arcs + len(tails))
+            f.write("".join(f"    e[{a}] obj {w!r} node[{t}] 1\n    e[{a}] node[{h}] -1\n"
+                            for a, t, h, w in zip(arcs, tails.tolist(), heads.tolist(), weights.tolist())))
+            num_arcs += len(tails)
+        # the BV bounds make the columns binary
+        f.write("RHS\n")
+        if src != dest:
+            f.write(f"    RHS node[{src}] 1\n    RHS node[{dest}] -1\n")
+        f.write("BOUNDS\n")
+        for start in range(0, num_arcs, CHUNK_NONZEROS):
+            f.write("".join(f" BV BND e[{a}]\n" for a in range(start, min(num_arcs, start + CHUNK_NONZEROS))))
+        f.write("ENDATA\n")
+    return num_arcs
+
+
+def network_model(num_nodes, chunks, src, dest, workdir=None):
+    # pl6 path model through a temporary MPS file read back by Gurobi. Its variables are the arcs
+    # in chunk order, so model.getAttr("X") gives the arc values.
+    import gurobipy as gp
+    fd, path = tempfile.mkstemp(suffix=".mps", dir=workdir)
+    os.close(fd)
+    try:
+        write_network_mps(path, num_nodes, chunks, src, dest)
+        model = gp.read(path)
+    finally:
+        os.remove(path)
+    return model
@@ -0,0 +1,100 @@
+import os
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+
+import numpy as np
+
+# LP_TEMPLATES=0 rebuilds every model from scratch, as before templates existed
+ENABLED = os.environ.get("LP_TEMPLATES", "1") not in ("", "0")
+# Compiled skeletons kept alive, least recently used ones are disposed first
+CACHE_SIZE = 32
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+class ModelTemplate:
+    # A model skeleton built once per problem shape. Subclasses create the variables and
+    # constraints in build() from self.key, overwrite objective, bounds, RHS and coefficients
+    # in place in patch(*data), and read the solution back in results().
+    def __init__(self, key):
+        self.key = key
+        self.lock = threading.Lock()
+        self.model = None
+        self.solves = 0
+        self.build()
+
+    def build(self):
+        raise NotImplementedError
+
+    def patch(self, *args, **kwargs):
+        raise NotImplementedError
+
+    def results(self):
+        raise NotImplementedError
+
+    def dispose(self):
+        if self.model is not None:
+            self.model.dispose()
+            self.model = None
+
+
+def change_coeffs(model, constrs, variables, old, new):
+    # chgCoeff only where the coefficient actually changed; old and new are (rows x columns)
+    # arrays over constrs x variables. Returns the new coefficients as the reference for next time.
+    new = np.asarray(new, dtype=float)
+    rows, cols = np.nonzero(old != new)
+    for r, c in zip(rows.tolist(), cols.tolist()):
+        model.chgCoeff(constrs[r], variables[c], new[r, c])
+    return new
+
+
+def get(cls, key):
+    with _lock:
+        cache_key = (cls.__name__, key)
+        template = _cache.get(cache_key)
+        if template is None:
+            template = cls(key)
+            _cache[cache_key] = template
+            while len(_cache) > CACHE_SIZE:
+                _, evicted = _cache.popitem(last=False)
+                with evicted.lock:
+                    evicted.dispose()
+        else:
+            _cache.move_to_end(cache_key)
+        return template
+
+
+def clear():
+    with _lock:
+        while _cache:
+            _, template = _cache.popitem()
+            with template.lock:
+                template.dispose()
+
+
+def solve(cls, key, metrics, *args, **kwargs):
+    # Patches the cached template for key with the instance data and re-optimizes it
+    phase = metrics.phase if metrics is not None else (lambda _: nullcontext())
+    with phase("build"):
+        template = get(cls, key)
+        template.lock.acquire()
+        try:
+            if template.model is None:
+                # disposed by an eviction between get() and acquire()
+                template.build()
+            template.patch(*args, **kwargs)
+        except BaseException:
+            template.lock.release()
+            raise
+    try:
+        if metrics is not None:
+            metrics.optimize(template.model)
+        else:
+            template.model.optimize()
+        template.solves += 1
+        with phase("extract"):
+            return template.results()
+    finally:
+        template.lock.release()
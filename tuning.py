@@ -0,0 +1,167 @@
+import json
+import os
+import threading
+
+from gurobipy import GRB
+
+import capture
+
+# Stored Gurobi parameter profiles, one per exercise and size class, applied by
+# SolveMetrics.optimize before every solve. LP_TUNING=0 solves with the defaults.
+ENABLED = os.environ.get("LP_TUNING", "1") not in ("", "0")
+PROFILES_PATH = os.environ.get("LP_TUNING_PROFILES",
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), "tuning_profiles.json"))
+
+# Size classes by number of variables, the same split as the benchmark scales
+SIZE_CLASSES = [(1_000, "small"), (100_000, "medium")]
+LARGEST_CLASS = "large"
+
+# Candidates of the grid search, tried on top of the captured parameters; {} is the baseline
+PARAMETER_GRID = [
+    {},
+    {"MIPFocus": 1},
+    {"MIPFocus": 2},
+    {"MIPFocus": 3},
+    {"Presolve": 2},
+    {"Cuts": 2},
+    {"Cuts": 0},
+    {"Heuristics": 0.2},
+    {"Method": 1},
+    {"Symmetry": 2},
+]
+# A candidate must beat the baseline by this share of its work to be stored
+MIN_IMPROVEMENT = 0.05
+
+_profiles = None
+_profiles_mtime = None
+_lock = threading.Lock()
+
+
+def size_class(num_vars):
+    for limit, name in SIZE_CLASSES:
+        if num_vars < limit:
+            return name
+    return LARGEST_CLASS
+
+
+def profiles(path=None):
+    # {exercise: {size class: {parameter: value}}}, reloaded when the file changes
+    global _profiles, _profiles_mtime
+    path = path or PROFILES_PATH
+    with _lock:
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return {}
+        if path != PROFILES_PATH:
+            with open(path) as f:
+                return json.load(f)
+        if _profiles is None or mtime != _profiles_mtime:
+            with open(path) as f:
+                _profiles = json.load(f)
+            _profiles_mtime = mtime
+        return _profiles
+
+
+def profile_for(exercise, num_vars):
+    return profiles().get(exercise, {}).get(size_class(num_vars), {})
+
+
+def apply(exercise, model, num_vars):
+    # Sets the stored profile of (exercise, size class) on the model; returns it
+    if not ENABLED:
+        return {}
+    profile = profile_for(exercise, num_vars)
+    for name, value in profile.items():
+        model.setParam(name, value)
+    return profile
+
+
+def store(exercise, size, profile, path=None):
+    path = path or PROFILES_PATH
+    stored = dict(profiles(path))
+    stored.setdefault(exercise, {})[size] = profile
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(stored, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _by_class(corpus, exercise):
+    groups = {}
+    for instance in capture.instances(corpus, exercise):
+        num_vars = instance.get("captured", {}).get("model", {}).get("NumVars")
+        if num_vars is None:
+            continue
+        groups.setdefault(size_class(num_vars), []).append(instance)
+    return groups
+
+
+def grid_search(instances, time_limit=None, grid=None):
+    # (best candidate, {candidate index: total work}) over the instances. Work units rather than
+    # seconds make the comparison independent of machine load; an instance that hits the time
+    # limit counts double.
+    scores = {}
+    for k, candidate in enumerate(grid or PARAMETER_GRID):
+        total = 0.0
+        for instance in instances:
+            row = capture.solve_instance(instance["path"], candidate, time_limit)
+            total += row["work"] * (2 if row["status"] == GRB.TIME_LIMIT else 1)
+        scores[k] = total
+    best = min(scores, key=scores.get)
+    if scores[best] > (1 - MIN_IMPROVEMENT) * scores[0]:
+        best = 0
+    return (grid or PARAMETER_GRID)[best], scores
+
+
+def gurobi_tune(instances, time_limit=None):
+    # Gurobi's tuning tool on the largest instance of the class; returns its best parameter set
+    import gurobipy as gp
+    instance = max(instances, key=lambda i: i.get("captured", {}).get("model", {}).get("NumVars", 0))
+    model = gp.read(os.path.join(instance["path"], "model.mps"))
+    try:
+        model.Params.OutputFlag = 0
+        if time_limit is not None:
+            model.Params.TuneTimeLimit = time_limit
+        model.tune()
+        if model.TuneResultCount == 0:
+            return {}
+        model.getTuneResult(0)
+        tuned = os.path.join(instance["path"], "tuned.prm")
+        model.write(tuned)
+    finally:
+        model.dispose()
+    profile = capture.read_params(tuned)
+    os.remove(tuned)
+    for name in ("OutputFlag", "TuneTimeLimit", "TimeLimit", "LogFile"):
+        profile.pop(name, None)
+    return profile
+
+
+def tune(corpus, exercise, method="grid", time_limit=None, path=None):
+    # Tunes every size class of the exercise found in the corpus and stores the profiles
+    tuned = {}
+    for size, instances in sorted(_by_class(corpus, exercise).items()):
+        if method == "gurobi":
+            profile = gurobi_tune(instances, time_limit)
+        else:
+            profile, _ = grid_search(instances, time_limit)
+        store(exercise, size, profile, path)
+        tuned[size] = profile
+    return tuned
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tune solver parameters on a corpus of captured models")
+    parser.add_argument("corpus")
+    parser.add_argument("exercise")
+    parser.add_argument("--method", choices=("grid", "gurobi"), default="grid")
+    parser.add_argument("--time-limit", type=float, help="per solve (grid) or per tuning run (gurobi), in seconds")
+    parser.add_argument("--profiles", default=PROFILES_PATH)
+    args = parser.parse_args()
+    import gurobipy as gp
+    gp.setParam("OutputFlag", 0)
+    for size, profile in tune(args.corpus, args.exercise, args.method, args.time_limit, args.profiles).items():
+        print(f"{args.exercise} {size}: {profile or 'defaults'}")
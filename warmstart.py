@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from gurobipy import GRB
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# Library of solved pl4/pl5 instances, used as MIP starts when a similar instance is solved later.
+# Every solution is stored with a fingerprint of its instance structure (regions and neighbour
+# pairs, or zones and covering sites). A new instance looks up the closest stored one; the
+# exercise maps that solution onto its own variables (by region or site index), repairs it and
+# sets it as the Start of the model. The library is opt-in (LP_WARMSTART=1) and lives in the
+# user data directory, so that solves neither read nor rewrite a shared file unless asked to.
+ENABLED = os.environ.get("LP_WARMSTART", "0") not in ("", "0")
+LIBRARY_PATH = os.environ.get("LP_WARMSTART_LIBRARY",
+                              os.path.join(os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share"),
+                                           "roproject", "warm_starts.json"))
+
+# Solutions kept per exercise, the oldest stored ones are dropped first
+LIBRARY_SIZE = 50
+# Structure items kept in the sketch of a fingerprint
+SKETCH_SIZE = 128
+# Stored instances sharing less of their structure than this (estimated Jaccard index) are not used
+MIN_SIMILARITY = 0.5
+
+_library = None
+_library_mtime = None
+_lock = threading.Lock()
+_store_lock = threading.Lock()
+
+
+def _mix(keys):
+    # splitmix64 finalizer: spreads the uint64 structure items uniformly over 64 bits
+    z = np.asarray(keys, dtype=np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def fingerprint(items):
+    # items are uint64 keys of the instance structure, built by the exercise. The digest identifies
+    # the exact structure; the sketch, the SKETCH_SIZE smallest item hashes (a bottom-k MinHash),
+    # estimates how much structure two instances share without keeping all their items.
+    hashes = np.unique(_mix(items))
+    return {"digest": hashlib.sha1(hashes.tobytes()).hexdigest(), "size": int(len(hashes)),
+            "sketch": hashes[:SKETCH_SIZE].tolist()}
+
+
+def similarity(a, b):
+    # Estimated Jaccard index of the two structures: the share of the smallest hashes of the
+    # union that both sketches hold
+    if a["digest"] == b["digest"]:
+        return 1.0
+    first, second = set(a["sketch"]), set(b["sketch"])
+    union = sorted(first | second)[:SKETCH_SIZE]
+    if not union:
+        return 0.0
+    return sum(1 for h in union if h in first and h in second) / len(union)
+
+
+def library(path=None):
+    # {exercise: [{"fingerprint", "solution", "stored"}, ...]}, reloaded when the file changes
+    global _library, _library_mtime
+    path = path or LIBRARY_PATH
+    with _lock:
+        try:
+            stamp = (path, os.path.getmtime(path))
+        except OSError:
+            return {}
+        if _library is None or stamp != _library_mtime:
+            with open(path) as f:
+                _library = json.load(f)
+            _library_mtime = stamp
+        return _library
+
+
+def closest(exercise, fp):
+    # (stored entry, similarity) of the stored instance closest to fp, (None, 0.0) below MIN_SIMILARITY
+    best, score = None, 0.0
+    for entry in library().get(exercise, []):
+        s = similarity(fp, entry["fingerprint"])
+        if s > score:
+            best, score = entry, s
+    if score < MIN_SIMILARITY:
+        return None, 0.0
+    return best, score
+
+
+@contextmanager
+def _file_lock(path):
+    # Exclusive lock on path + ".lock", held across processes (jobs.py and pl3_batch workers)
+    with open(path + ".lock", "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def store(exercise, fp, solution, path=None):
+    # Adds (or refreshes) the solution of the instance with fingerprint fp. The file is read again
+    # under the lock, so entries other processes stored in the meantime are kept.
+    path = path or LIBRARY_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with _store_lock, _file_lock(path):
+        try:
+            with open(path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            stored = {}
+        entries = [e for e in stored.get(exercise, []) if e["fingerprint"]["digest"] != fp["digest"]]
+        entries.append({"fingerprint": fp, "solution": solution, "stored": time.time()})
+        entries.sort(key=lambda e: e["stored"])
+        stored[exercise] = entries[-LIBRARY_SIZE:]
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(stored, f)
+        os.replace(tmp, path)
+
+
+def lookup(exercise, items, metrics=None):
+    # (fingerprint of the instance, closest stored solution or None); the match is recorded on
+    # metrics.warm_start
+    if not ENABLED:
+        return None, None
+    fp = fingerprint(items)
+    entry, score = closest(exercise, fp)
+    if entry is None:
+        return fp, None
+    if metrics is not None:
+        metrics.warm_start = {"similarity": score, "source": entry["fingerprint"]["digest"],
+                              "exact": entry["fingerprint"]["digest"] == fp["digest"]}
+    return fp, entry["solution"]
+
+
+def remember(exercise, fp, solution, metrics=None):
+    # Stores the solution of a solve that found one; fp is None when the library is off
+    if fp is None or solution is None:
+        return
+    if metrics is not None and not metrics.solve_stats.get("SolCount"):
+        return
+    store(exercise, fp, solution)
+
+
+def set_start(model, group, values):
+    # Start of a variable group (MVar, tupledict or list) from values in group order; None clears
+    # it, which matters for template models solved again with other data
+    if hasattr(group, "shape"):
+        group.Start = np.full(group.shape, GRB.UNDEFINED) if values is None else np.asarray(values, dtype=float)
+        return
+    variables = list(group.values()) if isinstance(group, dict) else list(group)
+    if values is None:
+        values = [GRB.UNDEFINED] * len(variables)
+    model.setAttr("Start", variables, [float(v) for v in values])